@@ -0,0 +1,7 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Stress tests and benchmarks for the MyPL lexer, parser and printer. 
+#   Run the modules from the repository root, e.g. python3 -m benchmarks.stress
+#----------------------------------------------------------------------
@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Measures how much memory the AST (with its tokens) of a generated 
+#   MyPL corpus takes, in total and per node, using tracemalloc
+#----------------------------------------------------------------------
+import argparse
+import io
+import json
+import sys
+import tracemalloc
+
+import mypl_ast as ast
+import mypl_lexer as lexer
+import mypl_parser as parser
+from benchmarks import stress
+
+def measure(source):
+    tracemalloc.start()
+    stmt_list = parser.Parser(lexer.make_lexer(io.StringIO(source), 'regex')).parse()
+    traced, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = 0
+    by_class = {}
+    for node in ast.nodes(stmt_list):
+        count += 1
+        name = type(node).__name__
+        by_class[name] = by_class.get(name, 0) + 1
+    return {'source_mb': round(len(source) / 1e6, 3), 'nodes': count, 
+        'traced_bytes': traced, 'peak_bytes': peak, 
+        'traced_bytes_per_node': round(traced / count, 1), 'nodes_by_class': by_class}
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description='Measure AST memory use on a generated MyPL corpus')
+    arg_parser.add_argument('--lines', type=int, default=200000, help='lines in the corpus')
+    arg_parser.add_argument('--json', metavar='FILE', help='also write the result as JSON')
+    args = arg_parser.parse_args(argv)
+    result = measure(stress.program(args.lines))
+    print('corpus          %10.2f MB' % result['source_mb'])
+    print('nodes           %10i' % result['nodes'])
+    print('AST + tokens    %10i bytes (%.1f per node)' % (result['traced_bytes'], 
+        result['traced_bytes_per_node']))
+    print('parse peak      %10i bytes' % result['peak_bytes'])
+    if args.json:
+        with open(args.json, 'w') as out:
+            json.dump(result, out, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Times the lexer, the parser and the pretty printer on a generated
+#   corpus and reports tokens, MB and AST nodes per second
+#----------------------------------------------------------------------
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+
+import mypl_ast as ast
+import mypl_lexer as lexer
+import mypl_parser as parser
+import mypl_print_visitor as ast_printer
+import mypl_token as token
+from benchmarks import generator
+
+BENCHMARKS = ('lexer', 'parser', 'printer')
+
+def lex_all(source, engine):
+    '''Calls next_token until EOS and returns the number of tokens'''
+    the_lexer = lexer.make_lexer(io.StringIO(source), engine)
+    count = 1
+    while the_lexer.next_token().tokentype != token.EOS:
+        count += 1
+    return count
+
+def parse_all(source, engine, parser_engine='descent'):
+    return parser.make_parser(lexer.make_lexer(io.StringIO(source), engine),
+        parser_engine).parse()
+
+def print_all(stmt_list):
+    printer = ast_printer.PrintWalker()
+    ast.walk(stmt_list, printer)
+    return printer.to_string()
+
+def time_runs(run, warmup, repeat):
+    '''Calls run warmup times untimed, then repeat times, and returns the
+    seconds each timed call took'''
+    for i in range(warmup):
+        run()
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return times
+
+def benchmark(name, source, engine, warmup, repeat, parser_engine='descent'):
+    '''Times one benchmark on source; rates use the fastest run'''
+    size_mb = len(source.encode('utf-8')) / 1e6
+    tokens = lex_all(source, engine)
+    stmt_list = parse_all(source, engine)
+    nodes = sum(1 for node in ast.nodes(stmt_list))
+    if name == 'lexer':
+        run = lambda: lex_all(source, engine)
+    elif name == 'parser':
+        run = lambda: parse_all(source, engine, parser_engine)
+    else:
+        run = lambda: print_all(stmt_list)
+    times = time_runs(run, warmup, repeat)
+    best = min(times)
+    return {
+        'benchmark': name,
+        'engine': engine if name != 'printer' else None,
+        'parser': parser_engine if name == 'parser' else None,
+        'mb': round(size_mb, 3),
+        'tokens': tokens,
+        'nodes': nodes,
+        'times': [round(t, 4) for t in times],
+        'best_seconds': round(best, 4),
+        'median_seconds': round(statistics.median(times), 4),
+        'tokens_per_second': round(tokens / best),
+        'mb_per_second': round(size_mb / best, 3),
+        'nodes_per_second': round(nodes / best),
+    }
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description='Benchmark the lexer, parser and pretty printer on a generated corpus')
+    generator.add_arguments(arg_parser)
+    arg_parser.add_argument('--benchmark', action='append', choices=BENCHMARKS,
+        help='benchmark to run (repeatable, default all)')
+    arg_parser.add_argument('--engine', action='append', choices=sorted(lexer.ENGINES),
+        help='lexer engine for the lexer and parser benchmarks (repeatable, default all)')
+    arg_parser.add_argument('--parser', action='append', choices=parser.ENGINES,
+        help='parser engine for the parser benchmark (repeatable, default all)')
+    arg_parser.add_argument('--warmup', type=int, default=1, help='untimed runs first')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='timed runs')
+    arg_parser.add_argument('--json', metavar='FILE', help='also write the results as JSON')
+    args = arg_parser.parse_args(argv)
+    source = generator.from_args(args).program(args.size)
+    engines = args.engine or sorted(lexer.ENGINES)
+    parser_engines = args.parser or parser.ENGINES
+    results = []
+    for name in args.benchmark or BENCHMARKS:
+        for engine in (engines if name != 'printer' else engines[:1]):
+            for parser_engine in (parser_engines if name == 'parser' else parser_engines[:1]):
+                result = benchmark(name, source, engine, args.warmup, args.repeat,
+                    parser_engine)
+                results.append(result)
+                print('%-8s %-6s %-7s %8.3f s %12i tokens/s %8.3f MB/s %12i nodes/s' % (
+                    name, result['engine'] or '-', result['parser'] or '-',
+                    result['best_seconds'], result['tokens_per_second'],
+                    result['mb_per_second'], result['nodes_per_second']))
+    if args.json:
+        report = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'corpus': {'seed': args.seed, 'size': args.size, 'mix': args.mix or
+                generator.DEFAULT_MIX, 'depth': args.depth, 'expr_length': args.expr_length,
+                'comment_density': args.comment_density},
+            'warmup': args.warmup,
+            'repeat': args.repeat,
+            'results': results,
+        }
+        with open(args.json, 'w') as out:
+            json.dump(report, out, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
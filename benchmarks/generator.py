@@ -0,0 +1,197 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Generates random but valid MyPL programs from a seed, with knobs
+#   for the statement mix, nesting depth, expression length, comment
+#   density and size, to use as a benchmark corpus
+#----------------------------------------------------------------------
+import argparse
+import random
+import sys
+
+# relative weight of each statement kind in a block
+DEFAULT_MIX = {
+    'var': 4,
+    'set': 4,
+    'call': 2,
+    'while': 1,
+    'if': 1,
+    'fun': 1,       # top level only
+    'struct': 1,    # top level only
+}
+
+NAMES = ['x', 'y', 'z', 'count', 'total', 'node', 'item', 'value', 'index', 'result']
+FIELDS = ['val', 'next', 'left', 'right', 'size']
+TYPES = ['int', 'float', 'bool', 'string']
+MATHRELS = ['+', '-', '*', '/', '%']
+BOOLRELS = ['==', '!=', '<', '<=', '>', '>=']
+WORDS = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit']
+
+class Generator(object):
+    """Writes MyPL source. The same seed and knobs always give the same
+    program; size is a target in bytes that is exceeded by at most one
+    top-level statement"""
+
+    def __init__(self, seed=0, mix=None, depth=3, expr_length=4, comment_density=0.1):
+        self.random = random.Random(seed)
+        self.mix = dict(DEFAULT_MIX if mix is None else mix)
+        self.depth = depth                      # deepest nesting of while and if
+        self.expr_length = expr_length          # most operands in an expression
+        self.comment_density = comment_density  # chance of a comment before a statement
+        self.functions = 0
+        self.structs = 0
+
+    def program(self, size):
+        '''Returns a program of about size bytes'''
+        parts = []
+        length = 0
+        while length < size:
+            part = self.__stmt(0, top=True)
+            parts.append(part)
+            length += len(part)
+        return ''.join(parts)
+
+    def __stmt(self, level, top=False):
+        kinds = [kind for kind in self.mix if top or kind not in ('fun', 'struct')]
+        if level >= self.depth:
+            kinds = [kind for kind in kinds if kind not in ('while', 'if')]
+        kinds = [kind for kind in kinds if self.mix[kind] > 0] or ['var']
+        kind = self.random.choices(kinds, [self.mix.get(kind, 1) for kind in kinds])[0]
+        indent = '    ' * level
+        text = ''
+        if self.random.random() < self.comment_density:
+            text = indent + '# ' + ' '.join(self.random.sample(WORDS, 3)) + '\n'
+        if kind == 'var':
+            text += '%svar %s%s = %s;\n' % (indent, self.__name(), self.__type_decl(),
+                self.__expr())
+        elif kind == 'set':
+            text += '%sset %s = %s;\n' % (indent, self.__path(), self.__expr())
+        elif kind == 'call':
+            text += '%s%s;\n' % (indent, self.__call())
+        elif kind == 'while':
+            text += '%swhile %s do\n%s%send\n' % (indent, self.__bool_expr(),
+                self.__block(level + 1), indent)
+        elif kind == 'if':
+            text += '%sif %s then\n%s' % (indent, self.__bool_expr(), self.__block(level + 1))
+            for i in range(self.random.randint(0, 2)):
+                text += '%selif %s then\n%s' % (indent, self.__bool_expr(),
+                    self.__block(level + 1))
+            if self.random.random() < 0.5:
+                text += '%selse\n%s' % (indent, self.__block(level + 1))
+            text += indent + 'end\n'
+        elif kind == 'fun':
+            self.functions += 1
+            # at least one parameter: the pretty printer needs one
+            params = ', '.join('%s: %s' % (name, self.random.choice(TYPES)) for name in
+                self.random.sample(NAMES, self.random.randint(1, 3)))
+            text += 'fun %s f%i(%s)\n%s    return %s;\nend\n' % (self.random.choice(TYPES),
+                self.functions, params, self.__block(1), self.__expr())
+        else:
+            self.structs += 1
+            text += 'struct S%i\n' % self.structs
+            for field in self.random.sample(FIELDS, self.random.randint(1, 4)):
+                text += '    var %s%s = %s;\n' % (field, self.__type_decl(), self.__expr())
+            text += 'end\n'
+        return text
+
+    def __block(self, level):
+        return ''.join(self.__stmt(level) for i in range(self.random.randint(1, 3)))
+
+    def __name(self):
+        return self.random.choice(NAMES)
+
+    def __path(self):
+        path = [self.__name()]
+        while self.random.random() < 0.2:
+            path.append(self.random.choice(FIELDS))
+        return '.'.join(path)
+
+    def __type_decl(self):
+        if self.random.random() < 0.3:
+            return ': ' + self.random.choice(TYPES)
+        return ''
+
+    def __call(self):
+        if self.functions and self.random.random() < 0.5:
+            name = 'f%i' % self.random.randint(1, self.functions)
+        else:
+            name = self.random.choice(['print', 'itos', 'length', 'get'])
+        args = ', '.join(self.__expr(2) for i in range(self.random.randint(1, 3)))
+        return '%s(%s)' % (name, args)
+
+    def __expr(self, longest=None, parens=True):
+        '''parens=False keeps the expression from starting with "(", which at
+        the start of a condition would be read as a parenthesized condition'''
+        operands = self.random.randint(1, longest or self.expr_length)
+        parts = [self.__operand(parens)]
+        for i in range(operands - 1):
+            parts.append(self.random.choice(MATHRELS))
+            parts.append(self.__operand())
+        return ' '.join(parts)
+
+    def __operand(self, parens=True):
+        choice = self.random.random()
+        if choice < 0.3:
+            return str(self.random.randint(0, 1000))
+        elif choice < 0.4:
+            return '%i.%i' % (self.random.randint(0, 100), self.random.randint(0, 99))
+        elif choice < 0.5:
+            return '"%s"' % ' '.join(self.random.sample(WORDS, 2))
+        elif choice < 0.55:
+            return self.random.choice(['true', 'false', 'nil'])
+        elif choice < 0.6 and self.structs:
+            return 'new S%i' % self.random.randint(1, self.structs)
+        elif choice < 0.65:
+            return self.__call()
+        elif choice < 0.7 and parens:
+            return '(' + self.__expr(3) + ')'
+        return self.__path()
+
+    def __bool_expr(self):
+        parts = []
+        for i in range(self.random.randint(1, 3)):
+            if parts:
+                parts.append(self.random.choice(['and', 'or']))
+            term = '%s %s %s' % (self.__expr(2, False), self.random.choice(BOOLRELS),
+                self.__expr(2))
+            if self.random.random() < 0.2:
+                term = 'not ' + term
+            parts.append(term)
+        return ' '.join(parts)
+
+
+def parse_mix(text):
+    '''Reads a statement mix written as kind=weight,kind=weight'''
+    mix = {}
+    for item in text.split(','):
+        kind, weight = item.split('=')
+        if kind not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError('unknown statement kind ' + kind)
+        mix[kind] = float(weight)
+    return mix
+
+def add_arguments(arg_parser):
+    '''Adds the generator knobs to an ArgumentParser'''
+    arg_parser.add_argument('--seed', type=int, default=0, help='random seed')
+    arg_parser.add_argument('--size', type=int, default=1000000, help='bytes to generate')
+    arg_parser.add_argument('--mix', type=parse_mix,
+        help='statement weights, e.g. var=4,set=4,call=2,while=1,if=1,fun=1,struct=1')
+    arg_parser.add_argument('--depth', type=int, default=3, help='deepest block nesting')
+    arg_parser.add_argument('--expr-length', type=int, default=4,
+        help='most operands in an expression')
+    arg_parser.add_argument('--comment-density', type=float, default=0.1,
+        help='chance of a comment line before each statement')
+
+def from_args(args):
+    return Generator(args.seed, args.mix, args.depth, args.expr_length, args.comment_density)
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Write a generated MyPL program to stdout')
+    add_arguments(arg_parser)
+    args = arg_parser.parse_args(argv)
+    sys.stdout.write(from_args(args).program(args.size))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
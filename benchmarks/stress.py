@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Lexes and parses generated worst-case sources (huge programs, long 
+#   runs of blank lines and comments, long elif, operator and and/or 
+#   chains) under a small recursion limit, proving that stack depth does 
+#   not grow with input length, and records the time taken per MB
+#----------------------------------------------------------------------
+import argparse
+import io
+import json
+import sys
+import time
+
+import mypl_lexer as lexer
+import mypl_parser as parser
+
+# far below what any of the generated inputs would need if the lexer or 
+# parser recursed once per line, statement or operator
+RECURSION_LIMIT = 200
+
+STATEMENTS = [
+    'var x = 1;\n',
+    'set x = x + 1;\n',
+    'f(x, 2);\n',
+    'while x < 10 do set x = x + 1; end\n',
+    'if x == 1 then set x = 2; elif x == 2 then set x = 3; else set x = 1; end\n',
+    '# a comment\n',
+    '\n',
+]
+
+def program(lines):
+    '''lines top-level statements of mixed kinds, one per line'''
+    return ''.join(STATEMENTS[i % len(STATEMENTS)] for i in range(lines))
+
+def blank_lines(lines):
+    return '\n' * lines + 'var x = 1;\n'
+
+def comment_block(lines):
+    return '# a long comment block\n' * lines + 'var x = 1;\n'
+
+def elif_chain(branches):
+    parts = ['if x == 0 then\n    set y = 0;\n']
+    for i in range(1, branches):
+        parts.append('elif x == %d then\n    set y = %d;\n' % (i, i))
+    parts.append('else\n    set y = 0;\nend\n')
+    return ''.join(parts)
+
+def operator_chain(operands):
+    return 'var x = 1' + ' + 1' * (operands - 1) + ';\n'
+
+def condition_chain(terms):
+    return 'while x < 1' + ' and x < 1' * (terms - 1) + ' do\nend\n'
+
+def cases(lines):
+    '''(name, source) pairs for a stress run scaled to the given line count'''
+    return [
+        ('program', program(lines)),
+        ('blank_lines', blank_lines(lines)),
+        ('comment_block', comment_block(lines)),
+        ('elif_chain', elif_chain(lines // 10)),
+        ('operator_chain', operator_chain(lines // 10)),
+        ('condition_chain', condition_chain(lines // 10)),
+    ]
+
+def run_case(name, source, engine):
+    '''Lexes and parses source with the recursion limit lowered and returns a 
+    result dict; a RecursionError is reported as a failure, not raised'''
+    size_mb = len(source.encode('utf-8')) / 1e6
+    result = {'case': name, 'engine': engine, 'mb': round(size_mb, 3)}
+    old_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(RECURSION_LIMIT)
+    try:
+        start = time.perf_counter()
+        the_lexer = lexer.make_lexer(io.StringIO(source), engine)
+        stmt_list = parser.Parser(the_lexer).parse()
+        seconds = time.perf_counter() - start
+    except RecursionError:
+        result['ok'] = False
+        return result
+    finally:
+        sys.setrecursionlimit(old_limit)
+    result['ok'] = True
+    result['stmts'] = len(stmt_list.stmts)
+    result['seconds'] = round(seconds, 3)
+    result['seconds_per_mb'] = round(seconds / size_mb, 3) if size_mb else 0.0
+    return result
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description='Lex and parse generated worst-case MyPL sources under a low recursion limit')
+    arg_parser.add_argument('--lines', type=int, default=1000000, 
+        help='lines in the program, blank and comment cases; chains get a tenth')
+    arg_parser.add_argument('--engine', action='append', choices=sorted(lexer.ENGINES), 
+        help='lexer engine to run (repeatable, default all)')
+    arg_parser.add_argument('--json', metavar='FILE', help='also write the results as JSON')
+    args = arg_parser.parse_args(argv)
+    engines = args.engine or sorted(lexer.ENGINES)
+    results = []
+    failed = False
+    for name, source in cases(args.lines):
+        for engine in engines:
+            result = run_case(name, source, engine)
+            results.append(result)
+            if result['ok']:
+                print('%-16s %-6s %8.2f MB %8.2f s %8.2f s/MB' % (name, engine, 
+                    result['mb'], result['seconds'], result['seconds_per_mb']))
+            else:
+                failed = True
+                print('%-16s %-6s %8.2f MB  RecursionError' % (name, engine, result['mb']))
+    if args.json:
+        with open(args.json, 'w') as out:
+            json.dump(results, out, indent=2)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
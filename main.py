@@ -3,7 +3,8 @@
 # Author: Caterina Valdovinos
 # Description:
 #   Takes a source file written in MyPL and executes the parser and 
-#   pretty printer
+#   pretty printer, or runs the program with a chosen backend, or 
+#   pretty prints many files in batch mode
 #----------------------------------------------------------------------
 
 import mypl_error as error 
@@ -12,27 +13,187 @@ import mypl_token as token
 import mypl_parser as parser
 import mypl_ast as ast 
 import mypl_print_visitor as ast_printer 
+import mypl_batch as batch
+import mypl_cache as cache
+import mypl_stats
+import mypl_closure_compiler
+import mypl_transpiler
+import mypl_vm
+import argparse
+import glob
+import os
+import stat
 import sys
 
-def main(filename):
+# --run choices: the module whose run() executes a parsed program
+BACKENDS = {
+    'closure': mypl_closure_compiler,
+    'vm': mypl_vm,
+    'python': mypl_transpiler,
+}
+
+def main(filename, cache_dir=None, stats=None, precedence=False, engine='descent', 
+        recover=False, backend=None):
     try:
         file_stream = open(filename, 'r') 
-        my_py(file_stream) 
+        if recover:
+            my_py_recover(file_stream, precedence)
+        elif backend is not None:
+            my_py_run(file_stream, backend, cache_dir, precedence, engine)
+        elif stats is None:
+            my_py(file_stream, cache_dir, precedence, engine) 
+        else:
+            my_py_stats(file_stream, stats, cache_dir, precedence, engine)
         file_stream.close()
     except FileNotFoundError: 
         sys.exit('invalid filename %s' % filename)
+    except UnicodeDecodeError as e: 
+        file_stream.close() 
+        sys.exit('cannot decode %s: %s' % (filename, e))
     except error.MyPLError as e: 
         file_stream.close() 
         sys.exit(e)
         
-def my_py(file_stream):
-    the_lexer = lexer.Lexer(file_stream) 
-    the_parser = parser.Parser(the_lexer) 
+def my_py(file_stream, cache_dir=None, precedence=False, engine='descent'):
+    stmt_list = parse(file_stream, cache_dir, precedence, engine)
+    printer = ast_printer.PrintWalker(sys.stdout)
+    ast.walk(stmt_list, printer)
+
+def my_py_run(file_stream, backend, cache_dir=None, precedence=False, engine='descent'):
+    '''Runs the program with one of the BACKENDS instead of printing it'''
+    stmt_list = parse(file_stream, cache_dir, precedence, engine)
+    try:
+        BACKENDS[backend].run(stmt_list)
+    finally:
+        sys.stdout.flush()
+
+def parse(file_stream, cache_dir=None, precedence=False, engine='descent'):
+    if cache_dir is not None:
+        return cache.ParseCache(cache_dir, precedence=precedence, 
+            engine=engine).parse(file_stream.read())
+    the_lexer = lexer.Lexer(file_stream, is_regular_file(file_stream)) 
+    the_parser = parser.make_parser(the_lexer, engine, precedence) 
+    return the_parser.parse() 
+
+def my_py_stats(file_stream, stats, cache_dir=None, precedence=False, engine='descent'):
+    '''Does what my_py does, recording each phase in stats. The tokens are 
+    all lexed before parsing starts so the two phases can be told apart'''
+    if cache_dir is not None:
+        parse_cache = cache.ParseCache(cache_dir, precedence=precedence, engine=engine)
+        with stats.phase('parse'):
+            stmt_list = parse_cache.parse(file_stream.read())
+        stats.extra['cache'] = 'hit' if parse_cache.hits else 'miss'
+    else:
+        with stats.phase('lex'):
+            the_lexer = lexer.Lexer(file_stream, is_regular_file(file_stream)) 
+            tokens = stats.count_tokens(the_lexer.tokens())
+        with stats.phase('parse'):
+            stmt_list = parser.make_parser(mypl_stats.TokenList(tokens), engine, 
+                precedence).parse()
+    stats.count_nodes(stmt_list)
+    output = stats.counting_stream(sys.stdout)
+    with stats.phase('print'):
+        ast.walk(stmt_list, ast_printer.PrintWalker(output))
+
+def my_py_recover(file_stream, precedence=False):
+    '''Prints what could be parsed, with each statement that could not as a 
+    comment, then writes every error to stderr and exits with status 1 if 
+    there were any'''
+    the_lexer = lexer.Lexer(file_stream, is_regular_file(file_stream)) 
+    the_parser = parser.Parser(the_lexer, precedence, recover=True) 
     stmt_list = the_parser.parse() 
-    print_visitor = ast_printer.PrintVisitor(sys.stdout) 
-    stmt_list.accept(print_visitor)
+    ast.walk(stmt_list, ast_printer.PrintWalker(sys.stdout))
+    sys.stdout.flush()
+    for e in the_parser.errors:
+        sys.stderr.write(str(e) + '\n')
+    if the_parser.errors:
+        file_stream.close()
+        sys.exit(1)
+
+def is_regular_file(file_stream):
+    '''True if the stream is backed by a regular file, which the lexer can 
+    read whole instead of seeking through it one character at a time'''
+    try:
+        return stat.S_ISREG(os.fstat(file_stream.fileno()).st_mode)
+    except (AttributeError, OSError):
+        return False
+    
+def parse_args(argv):
+    arg_parser = argparse.ArgumentParser(
+        description='Pretty print MyPL programs. Given several files, directories '
+        'or glob patterns, runs in batch mode over a pool of worker processes')
+    arg_parser.add_argument('paths', nargs='+', metavar='path', 
+        help='MyPL file, directory (searched for *.mypl files) or glob pattern')
+    arg_parser.add_argument('-j', '--jobs', type=positive_int, 
+        help='worker processes in batch mode (default: one per CPU)')
+    arg_parser.add_argument('--chunksize', type=positive_int, 
+        help='files handed to a worker at a time in batch mode')
+    arg_parser.add_argument('-o', '--output-dir', 
+        help='write each output to a file of the same name under this directory '
+        'instead of one combined stream on stdout')
+    arg_parser.add_argument('--cache-dir', 
+        help='reuse the ASTs of unchanged files from a parse cache in this directory')
+    arg_parser.add_argument('--precedence', action='store_true', 
+        help='parse *, / and %% as binding tighter than + and - instead of grouping '
+        'every chain of math operators to the right')
+    arg_parser.add_argument('--parser', choices=parser.ENGINES, default='descent', 
+        help='recursive descent, or the LL(1) table built from its grammar')
+    arg_parser.add_argument('--recover', action='store_true', 
+        help='report every syntax error instead of stopping at the first '
+        '(single file only, recursive descent parser, no cache)')
+    arg_parser.add_argument('--run', choices=sorted(BACKENDS), 
+        help='run the program instead of printing it: compiled to closures, to '
+        'bytecode for a stack VM, or to Python (single file only)')
+    arg_parser.add_argument('--stats', action='store_true', 
+        help='write the time, memory, tokens and nodes of each phase to stderr '
+        '(single file only)')
+    arg_parser.add_argument('--stats-json', metavar='FILE', 
+        help='write the same measurements as JSON to FILE (single file only)')
+    arg_parser.add_argument('--stats-memory', action='store_true', 
+        help='also trace the peak memory of each phase, which slows the phases down')
+    args = arg_parser.parse_args(argv)
+    if (args.stats or args.stats_json) and is_batch(args):
+        arg_parser.error('--stats and --stats-json work on a single file')
+    if args.recover and (is_batch(args) or args.stats or args.stats_json or 
+            args.cache_dir or args.parser != 'descent'):
+        arg_parser.error('--recover works on a single file with the descent parser, '
+            'without --cache-dir or --stats')
+    if args.run and (is_batch(args) or args.recover or args.stats or args.stats_json):
+        arg_parser.error('--run works on a single file, without --recover or --stats')
+    return args
+
+def positive_int(text):
+    '''argparse type for counts of at least 1'''
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid int value: %r' % text)
+    if value < 1:
+        raise argparse.ArgumentTypeError('must be at least 1: %r' % text)
+    return value
+
+def is_batch(args):
+    '''Batch mode is used unless given a single plain file and no batch options'''
+    return (len(args.paths) > 1 or os.path.isdir(args.paths[0]) or 
+        glob.has_magic(args.paths[0]) or args.jobs is not None or 
+        args.chunksize is not None or args.output_dir is not None)
     
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        sys.exit('Usage: %s file' % sys.argv[0]) 
-    main(sys.argv[1])
\ No newline at end of file
+    args = parse_args(sys.argv[1:])
+    if not is_batch(args):
+        stats = None
+        if args.stats or args.stats_json:
+            stats = mypl_stats.Stats(args.stats_memory)
+        try:
+            main(args.paths[0], args.cache_dir, stats, args.precedence, args.parser, 
+                args.recover, args.run)
+        finally:
+            if args.stats:
+                stats.write_summary(sys.stderr)
+            if args.stats_json:
+                stats.write_json(args.stats_json)
+    else:
+        results = batch.run_batch(args.paths, args.jobs, args.chunksize, args.output_dir,
+            cache_dir=args.cache_dir, precedence=args.precedence, engine=args.parser)
+        if any(result.error is not None for result in results):
+            sys.exit(1)
\ No newline at end of file
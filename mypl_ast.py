@@ -8,14 +8,17 @@ import mypl_token as token
 
 class ASTNode(object): 
     """The base class for the abstract syntax tree.""" 
+    __slots__ = ()
     def accept(self, visitor): pass
     
 class Stmt(ASTNode): 
     """The base class for all statement nodes."""
+    __slots__ = ()
     def accept(self, visitor): pass
 
 class StmtList(ASTNode): 
     """A statement list consists of a list of statements.""" 
+    __slots__ = ('stmts',)
     def __init__(self): 
         self.stmts = [] # list of Stmt 
     def accept(self, visitor): 
@@ -23,10 +26,22 @@ class StmtList(ASTNode):
         
 class Expr(ASTNode): 
     """The base class for all expression nodes.""" 
+    __slots__ = ()
     def accept(self, visitor): pass
 
+class ErrorStmt(Stmt): 
+    """Stands in for a statement that could not be parsed when the parser 
+    recovers from errors. """ 
+    __slots__ = ('error', 'first_token')
+    def __init__(self): 
+        self.error = None # MyPLError 
+        self.first_token = None # Token where the statement began 
+    def accept(self, visitor): 
+        visitor.visit_error_stmt(self)
+
 class ExprStmt(Stmt): 
     """A simple statement that is just an expression.""" 
+    __slots__ = ('expr',)
     def __init__(self): 
         self.expr = None # Expr node 
     def accept(self, visitor): 
@@ -35,15 +50,18 @@ class ExprStmt(Stmt):
 class VarDeclStmt(Stmt): 
     """A variable declaration statement consists of a variable identifier, 
     an (optional) type, and an initial value. """ 
+    __slots__ = ('var_id', 'var_type', 'var_expr', 'symbol')
     def __init__(self): 
         self.var_id = None # Token (ID) 
         self.var_type = None # Token (STRINGTYPE, ..., ID) 
         self.var_expr = None # Expr node 
+        self.symbol = None # Symbol, set by the type checker 
     def accept(self, visitor): 
         visitor.visit_var_decl_stmt(self)
 
 class AssignStmt(Stmt): 
     """An assignment statement consists of an identifier and an expression. """ 
+    __slots__ = ('lhs', 'rhs')
     def __init__(self): 
         self.lhs = None # LValue node 
         self.rhs = None # Expr node 
@@ -52,9 +70,11 @@ class AssignStmt(Stmt):
 
 class StructDeclStmt(Stmt): 
     """A struct declaration statement consists of an identifier, and a list of variable declarations. """ 
+    __slots__ = ('struct_id', 'var_decls', 'symbol')
     def __init__(self):
         self.struct_id = None # Token (id) 
         self.var_decls = [] # [VarDeclStmt] 
+        self.symbol = None # Symbol, set by the type checker 
     def accept(self, visitor): 
         visitor.visit_struct_decl_stmt(self)
 
@@ -62,17 +82,20 @@ class FunDeclStmt(Stmt):
     """A function declaration statement consists of an identifer, a list 
     of parameters (identifiers with types), a return type, and a list 
     of function body statements. """ 
+    __slots__ = ('fun_name', 'params', 'return_type', 'stmt_list', 'symbol')
     def __init__(self): 
         self.fun_name = None # Token (id) 
         self.params = [] # List of FunParam 
         self.return_type = None # Token 
-        self.stmt_list = StmtList() # StmtList 
+        self.stmt_list = None # StmtList 
+        self.symbol = None # Symbol, set by the type checker 
     def accept(self, visitor): 
         visitor.visit_fun_decl_stmt(self)
 
 class ReturnStmt(Stmt): 
     """A return statement consist of a return expression and the 
     corresponding return token (for printing line and column numbers). """ 
+    __slots__ = ('return_expr', 'return_token')
     def __init__(self): 
         self.return_expr = None # Expr 
         self.return_token = None # to keep track of location (e.g., return;) 
@@ -81,26 +104,30 @@ class ReturnStmt(Stmt):
 class WhileStmt(Stmt): 
     """A while statement consists of a condition (Boolean expression) and 
     a statement list (the body of the while). """ 
+    __slots__ = ('bool_expr', 'stmt_list')
     def __init__(self): 
         self.bool_expr = None # a BoolExpr node 
-        self.stmt_list = StmtList() 
+        self.stmt_list = None # StmtList 
     def accept(self, visitor): 
         visitor.visit_while_stmt(self)
 
 class IfStmt(Stmt): 
     """An if stmt consists of a basic if part, a (possibly empty) list of else ifs, and an optional else part (represented as a statement list). """ 
+    __slots__ = ('if_part', 'elseifs', 'has_else', 'else_stmts')
     def __init__(self): 
-        self.if_part = BasicIf() 
+        self.if_part = None # BasicIf 
         self.elseifs = [] # list of BasicIf 
         self.has_else = False 
-        self.else_stmts = StmtList() 
+        self.else_stmts = None # StmtList, when has_else 
     def accept(self, visitor): 
         visitor.visit_if_stmt(self)
 
 class SimpleExpr(Expr): 
     """A simple expression consists of an RValue. """
+    __slots__ = ('term', 'type')
     def __init__(self): 
         self.term = None # RValue 
+        self.type = None # type name, set by the type checker 
     def accept(self, visitor): 
         visitor.visit_simple_expr(self)
         
@@ -108,10 +135,12 @@ class ComplexExpr(Expr):
     """A complex expression consist of an expression, followed by a 
     mathematical operator (+, -, *, etc.), followed by another 
     (possibly complex) expression. """ 
+    __slots__ = ('first_operand', 'math_rel', 'rest', 'type')
     def __init__(self): 
         self.first_operand = None # Expr node 
         self.math_rel = None # Token (+, -, *, etc.) 
         self.rest = None # Expr node 
+        self.type = None # type name, set by the type checker 
     def accept(self, visitor): 
         visitor.visit_complex_expr(self)
         
@@ -120,6 +149,8 @@ class BoolExpr(ASTNode):
     (==, <=, !=, etc.), another expression, and possibly an 'and' or 
     'or' followed by additional boolean expressions. An entire boolean 
     expression can also be negated. Note that only the first_expr is required. """ 
+    __slots__ = ('first_expr', 'bool_rel', 'second_expr', 'bool_connector', 'rest', 'negated',
+        'type')
     def __init__(self): 
         self.first_expr = None # Expr node 
         self.bool_rel = None # Token (==, <=, !=, etc.) 
@@ -127,60 +158,80 @@ class BoolExpr(ASTNode):
         self.bool_connector = None # Token (AND or OR) 
         self.rest = None # BoolExpr node 
         self.negated = False # Bool 
+        self.type = None # type name, set by the type checker 
     def accept(self, visitor): 
         visitor.visit_bool_expr(self)
         
 class LValue(ASTNode): 
     """A lvalue consist of a simple id or a path expression. """ 
+    __slots__ = ('path', 'type', 'symbol')
     def __init__(self): 
         self.path = [] # [Token (ID)] ... one implies simple var 
+        self.type = None # type name, set by the type checker 
+        self.symbol = None # Symbol, set by the type checker 
     def accept(self, visitor): 
         visitor.visit_lvalue(self)
     
 class FunParam(Stmt): 
     """A function declaration parameter consists of a variable name (id) and a type.""" 
+    __slots__ = ('param_name', 'param_type', 'symbol')
     def __init__(self): 
         self.param_name = None # Token (id) 
         self.param_type = None # Token (id) 
+        self.symbol = None # Symbol, set by the type checker 
     def accept(self, visitor): 
         visitor.visit_fun_param(self)
         
 class BasicIf(object): 
     """A basic if holds a condition (Boolean expression) and a list of statements (the body of the if).""" 
+    __slots__ = ('bool_expr', 'stmt_list')
     def __init__(self): 
         self.bool_expr = None # BoolExpr node 
-        self.stmt_list = StmtList()
+        self.stmt_list = None # StmtList
         
 class RValue(ASTNode): 
     """The base class for rvalue nodes.""" 
+    __slots__ = ()
     def accept(self, visitor): pass
     
 class SimpleRValue(RValue): 
     """A simple rvalue consists of a single primitive value. """ 
+    __slots__ = ('val', 'type', 'symbol')
     def __init__(self): 
         self.val = None # Token 
+        self.type = None # type name, set by the type checker 
+        self.symbol = None # Symbol, set by the type checker 
     def accept(self, visitor): 
         visitor.visit_simple_rvalue(self)
         
 class NewRValue(RValue): 
     """A new rvalue consists of a struct name (id) """ 
+    __slots__ = ('struct_type', 'type', 'symbol')
     def __init__(self): 
         self.struct_type = None # Token (id) 
+        self.type = None # type name, set by the type checker 
+        self.symbol = None # Symbol, set by the type checker 
     def accept(self, visitor): 
         visitor.visit_new_rvalue(self)
         
 class CallRValue(RValue): 
     """A function call rvalue consists of a function name (id) and a list of arguments (expressions) """ 
+    __slots__ = ('fun', 'args', 'type', 'symbol')
     def __init__(self): 
         self.fun = None # Token (id) 
         self.args = [] # list of Expr 
+        self.type = None # type name, set by the type checker 
+        self.symbol = None # Symbol, set by the type checker 
     def accept(self, visitor): 
         visitor.visit_call_rvalue(self)
         
 class IDRvalue(RValue): 
     """An identifier rvalue consists of a path of one or more identifiers. """ 
+    __slots__ = ('path', 'type', 'symbol')
     def __init__(self): 
         self.path = [] # List of Token (id) 
+        self.type = None # type name, set by the type checker 
+        self.symbol = None # Symbol, set by the type checker 
     def accept(self, visitor): 
         visitor.visit_id_rvalue(self)
         
@@ -204,3 +255,188 @@ class Visitor(object):
     def visit_new_rvalue(self, new_rvalue): pass 
     def visit_call_rvalue(self, call_rvalue): pass 
     def visit_id_rvalue(self, id_rvalue): pass
+    def visit_error_stmt(self, error_stmt): pass
+
+
+class Walker(object):
+    """The base class for walkers run by walk(). A walker defines only the
+    hooks it needs: visit_<name>(node) is called before a node's children,
+    leave_<name>(node) after them, where name is the one used by Visitor
+    (basic_if for BasicIf). A visit_ hook may return PRUNE to skip the
+    children, or a plan: a list run in their place, in order, whose items
+    are nodes to walk and (function, argument) pairs to call """
+
+
+#------------------GENERIC WALKER-----------------
+PRUNE = 'prune'   # returned by a visit_ hook to skip the node's children
+
+# node class -> (hook name, child fields in source order)
+NODE_TYPES = {
+    StmtList: ('stmt_list', ('stmts',)),
+    ErrorStmt: ('error_stmt', ()),
+    ExprStmt: ('expr_stmt', ('expr',)),
+    VarDeclStmt: ('var_decl_stmt', ('var_expr',)),
+    AssignStmt: ('assign_stmt', ('lhs', 'rhs')),
+    StructDeclStmt: ('struct_decl_stmt', ('var_decls',)),
+    FunDeclStmt: ('fun_decl_stmt', ('params', 'stmt_list')),
+    ReturnStmt: ('return_stmt', ('return_expr',)),
+    WhileStmt: ('while_stmt', ('bool_expr', 'stmt_list')),
+    IfStmt: ('if_stmt', ('if_part', 'elseifs', 'else_stmts')),
+    BasicIf: ('basic_if', ('bool_expr', 'stmt_list')),
+    SimpleExpr: ('simple_expr', ('term',)),
+    ComplexExpr: ('complex_expr', ('first_operand', 'rest')),
+    BoolExpr: ('bool_expr', ('first_expr', 'second_expr', 'rest')),
+    LValue: ('lvalue', ()),
+    FunParam: ('fun_param', ()),
+    SimpleRValue: ('simple_rvalue', ()),
+    NewRValue: ('new_rvalue', ()),
+    CallRValue: ('call_rvalue', ('args',)),
+    IDRvalue: ('id_rvalue', ()),
+}
+
+_dispatch_tables = {} # Walker class -> {node class: (visit, leave, fields)}
+
+def walk(node, walker):
+    '''Runs walker over the tree under node. The walk is driven from an
+    explicit stack, so any depth of nesting works. A Visitor is run too:
+    its visit_ hook is found the same way, and it visits the children
+    itself through accept()'''
+    visitor = isinstance(walker, Visitor)
+    table = _dispatch_tables.get(type(walker))
+    if table is None:
+        table = _dispatch_tables[type(walker)] = {}
+    bound = {}      # node class -> its entry, with the hooks bound to walker
+    stack = [node]
+    pop, push, extend = stack.pop, stack.append, stack.extend
+    while stack:
+        node = pop()
+        if type(node) is tuple: # (function, argument), e.g. (leave hook, node)
+            node[0](node[1])
+            continue
+        try:
+            visit, leave, fields = bound[type(node)]
+        except KeyError:
+            entry = table.get(type(node))
+            if entry is None:
+                entry = table[type(node)] = dispatch_entry(type(walker), type(node))
+            visit, leave, fields = entry
+            visit = visit and visit.__get__(walker)
+            leave = leave and leave.__get__(walker)
+            fields = () if visitor else fields[::-1]
+            bound[type(node)] = (visit, leave, fields)
+        plan = visit(node) if visit is not None else None
+        if leave is not None:
+            push((leave, node))
+        if plan is None:
+            for name in fields:     # last first, to come off the stack first
+                child = getattr(node, name)
+                if type(child) is list:
+                    extend(reversed(child))
+                elif child is not None:
+                    push(child)
+        elif plan is not PRUNE and not visitor:
+            extend(reversed(plan))
+
+def dispatch_entry(walker_class, node_class):
+    '''Returns the hooks walker_class has for node_class and the fields
+    to descend into; subclasses (e.g. lazily loaded nodes) use their base'''
+    for cls in node_class.__mro__:
+        if cls in NODE_TYPES:
+            name, fields = NODE_TYPES[cls]
+            return (getattr(walker_class, 'visit_' + name, None),
+                getattr(walker_class, 'leave_' + name, None), fields)
+    raise TypeError('not an AST node: ' + node_class.__name__)
+
+#------------------HELPERS-----------------
+_node_fields = {}     # node class -> (class it stands for, slot names)
+
+def node_fields(node_class):
+    '''Returns the AST class node_class stands for (itself, or the base of
+    e.g. a lazily loaded node) and the names of its slots, base class first'''
+    if node_class not in _node_fields:
+        base = next((cls for cls in node_class.__mro__ if cls in NODE_TYPES), None)
+        if base is None:
+            raise TypeError('not an AST node: ' + node_class.__name__)
+        names = []
+        for cls in reversed(base.__mro__):
+            names.extend(getattr(cls, '__slots__', ()))
+        _node_fields[node_class] = (base, tuple(names))
+    return _node_fields[node_class]
+
+def nodes(node):
+    '''Yields every node (and BasicIf) under node, node first, in source
+    order'''
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        for name in reversed(NODE_TYPES[node_fields(type(node))[0]][1]):
+            child = getattr(node, name)
+            if type(child) is list:
+                stack.extend(reversed(child))
+            elif child is not None:
+                stack.append(child)
+
+def first_token(node):
+    '''Returns the leftmost token of an expression, or the token a statement
+    is reported at, for positions'''
+    while True:
+        if isinstance(node, SimpleExpr):
+            node = node.term
+        elif isinstance(node, ComplexExpr):
+            node = node.first_operand
+        elif isinstance(node, BoolExpr):
+            node = node.first_expr
+        elif isinstance(node, SimpleRValue):
+            return node.val
+        elif isinstance(node, NewRValue):
+            return node.struct_type
+        elif isinstance(node, CallRValue):
+            return node.fun
+        elif isinstance(node, (IDRvalue, LValue)):
+            return node.path[0]
+        elif isinstance(node, ExprStmt):
+            node = node.expr
+        elif isinstance(node, AssignStmt):
+            node = node.lhs
+        elif isinstance(node, (WhileStmt, BasicIf)):
+            node = node.bool_expr
+        elif isinstance(node, IfStmt):
+            node = node.if_part
+        elif isinstance(node, VarDeclStmt):
+            return node.var_id
+        elif isinstance(node, StructDeclStmt):
+            return node.struct_id
+        elif isinstance(node, FunDeclStmt):
+            return node.fun_name
+        elif isinstance(node, FunParam):
+            return node.param_name
+        elif isinstance(node, ReturnStmt):
+            return node.return_token
+        elif isinstance(node, ErrorStmt):
+            return node.first_token
+        else:
+            raise TypeError('no token for ' + type(node).__name__)
+
+def right_chain(complex_expr):
+    '''Returns the links of a chain nested to the right, a op (b op (c op d)),
+    as [(a, op), (b, op), (c, op), (d, None)]'''
+    links = []
+    node = complex_expr
+    while isinstance(node, ComplexExpr):
+        links.append((node.first_operand, node.math_rel))
+        node = node.rest
+    links.append((node, None))
+    return links
+
+def left_chain(complex_expr):
+    '''Returns the links of a chain nested to the left, ((a op b) op c) op d,
+    as [(None, a), (op, b), (op, c), (op, d)]'''
+    links = []
+    node = complex_expr
+    while isinstance(node, ComplexExpr):
+        links.append((node.math_rel, node.rest))
+        node = node.first_operand
+    links.append((None, node))
+    links.reverse()
+    return links
@@ -0,0 +1,170 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Pretty prints many MyPL files in one run, spreading the files over
+#   a pool of worker processes and collecting the errors per file
+#----------------------------------------------------------------------
+import concurrent.futures
+import functools
+import glob
+import io
+import os
+import sys
+
+import mypl_ast as ast
+import mypl_cache as cache
+import mypl_error as error
+import mypl_lexer as lexer
+import mypl_parser as parser
+import mypl_print_visitor as ast_printer
+
+EXTENSION = '.mypl'
+
+_caches = {}    # (cache directory, precedence, engine) -> ParseCache of this process
+_symbols = lexer.SymbolTable()  # names interned across the files of this process
+
+class FileResult(object):
+    """The pretty printed program of one file, or the error it stopped at"""
+    __slots__ = ('path', 'output', 'error', 'cached')
+
+    def __init__(self, path, output, error, cached=False):
+        self.path = path
+        self.output = output
+        self.error = error
+        self.cached = cached    # the AST came from the parse cache
+
+
+def expand_paths(paths, extension=EXTENSION):
+    '''Returns the files named by paths, in order and without repeats.
+    Directories are searched recursively for files ending in extension and
+    patterns with wildcards are expanded'''
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names)
+                    if name.endswith(extension))
+        elif glob.has_magic(path):
+            files.extend(sorted(glob.glob(path, recursive=True)))
+        else:
+            files.append(path)
+    return list(dict.fromkeys(files))
+
+def format_file(path, cache_dir=None, precedence=False, engine='descent'):
+    '''Lexes, parses and pretty prints one file, taking the AST from the
+    parse cache in cache_dir when one is given. Any error is kept in the
+    result, so one bad file does not stop the batch'''
+    try:
+        with open(path, 'r') as file_stream:
+            source = file_stream.read()
+    except OSError:
+        return FileResult(path, None, 'invalid filename %s' % path)
+    except UnicodeDecodeError as e:
+        return FileResult(path, None, 'cannot decode %s: %s' % (path, e))
+    cached = False
+    try:
+        if cache_dir is None:
+            stmt_list = parser.make_parser(lexer.Lexer(io.StringIO(source), True, _symbols),
+                engine, precedence).parse()
+        else:
+            if (cache_dir, precedence, engine) not in _caches:
+                _caches[cache_dir, precedence, engine] = cache.ParseCache(cache_dir, 
+                    precedence=precedence, engine=engine)
+            parse_cache = _caches[cache_dir, precedence, engine]
+            hits = parse_cache.hits
+            stmt_list = parse_cache.parse(source)
+            cached = parse_cache.hits > hits
+        printer = ast_printer.PrintWalker()
+        ast.walk(stmt_list, printer)
+    except error.MyPLError as e:
+        return FileResult(path, None, str(e))
+    except Exception as e:
+        return FileResult(path, None, 'internal error: %s: %s' % (type(e).__name__, e))
+    return FileResult(path, printer.to_string(), None, cached)
+
+def output_path(path, output_dir):
+    '''Returns where the output for path goes under output_dir, keeping its
+    place relative to the current directory when it is below it'''
+    relative = os.path.relpath(path)
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        relative = os.path.basename(path)
+    return os.path.join(output_dir, relative)
+
+def output_collisions(files, output_dir):
+    '''Returns an error for each file whose output under output_dir would
+    overwrite that of an earlier file, such as /a/x.mypl and /b/x.mypl'''
+    owners = {}     # output path -> the file writing it
+    collisions = {}
+    for path in files:
+        target = os.path.normcase(os.path.abspath(output_path(path, output_dir)))
+        if target in owners:
+            collisions[path] = 'output %s would overwrite that of %s' % (
+                output_path(path, output_dir), owners[target])
+        else:
+            owners[target] = path
+    return collisions
+
+def run_batch(paths, jobs=None, chunksize=None, output_dir=None, output_stream=None,
+        error_stream=None, cache_dir=None, precedence=False, engine='descent'):
+    '''Pretty prints every file named by paths with jobs worker processes
+    (one per CPU by default; 1 runs in this process). Each output goes to
+    a file of the same name under output_dir, or to output_stream after a
+    comment naming the file, in the order the files were given (stdout by
+    default). A file whose output would overwrite an earlier one's under
+    output_dir is not formatted but reported as an error. Errors are
+    written to error_stream (stderr by default) once all files are done.
+    With cache_dir, ASTs are kept in a ParseCache there. precedence and
+    the parser engine are passed on to make_parser. Returns the list of
+    FileResults'''
+    if jobs is not None and jobs < 1:
+        raise ValueError('jobs must be at least 1')
+    if chunksize is not None and chunksize < 1:
+        raise ValueError('chunksize must be at least 1')
+    output_stream = output_stream or sys.stdout
+    error_stream = error_stream or sys.stderr
+    files = expand_paths(paths)
+    collisions = output_collisions(files, output_dir) if output_dir is not None else {}
+    if collisions:
+        given, files = files, [path for path in files if path not in collisions]
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(files) // (jobs * 4))
+    format_one = functools.partial(format_file, cache_dir=cache_dir, 
+        precedence=precedence, engine=engine)
+    results = []
+    if jobs == 1 or len(files) < 2:
+        for result in map(format_one, files):
+            write_result(result, output_dir, output_stream)
+            results.append(result)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            for result in pool.map(format_one, files, chunksize=chunksize):
+                write_result(result, output_dir, output_stream)
+                results.append(result)
+    if collisions:
+        formatted = iter(results)
+        results = [FileResult(path, None, collisions[path]) if path in collisions
+            else next(formatted) for path in given]
+    failed = [result for result in results if result.error is not None]
+    for result in failed:
+        error_stream.write('%s: %s\n' % (result.path, result.error))
+    summary = '%i files, %i errors' % (len(results), len(failed))
+    if cache_dir is not None:
+        summary += ', %i cache hits' % sum(1 for result in results if result.cached)
+    error_stream.write(summary + '\n')
+    return results
+
+def write_result(result, output_dir, output_stream):
+    if result.output is None:
+        return
+    if output_dir is None:
+        output_stream.write('# ' + result.path + '\n')
+        output_stream.write(result.output)
+        return
+    path = output_path(result.path, output_dir)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as out:
+        out.write(result.output)
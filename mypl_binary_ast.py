@@ -0,0 +1,297 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   A compact binary format for MyPL ASTs. Loading maps the file into
+#   memory and only builds a node when one of its fields is first read
+#----------------------------------------------------------------------
+import collections
+import mmap
+import struct
+
+import mypl_ast as ast
+import mypl_error as error
+import mypl_token as token
+
+MAGIC = b'MYPLAST\0'
+FORMAT_VERSION = 2
+
+# magic, version, counts of strings, tokens and nodes, then the byte
+# offsets of the string offsets, string data, tokens, node offsets and nodes
+HEADER = struct.Struct('<8sIIIIIIIII')
+# token type, lexeme (string index + 1, 0 for None), line, column
+TOKEN = struct.Struct('<BIII')
+WORD = struct.Struct('<I')
+
+# an ERROR field is a MyPLError stored as message (string index + 1, 0 for
+# None), line and column
+NODE, NODES, TOKEN_FIELD, TOKENS, BOOL, ERROR = range(6)
+
+# node kinds by number: the class and how each of its fields is stored
+KINDS = (
+    (ast.StmtList, (('stmts', NODES),)),
+    (ast.ExprStmt, (('expr', NODE),)),
+    (ast.VarDeclStmt, (('var_id', TOKEN_FIELD), ('var_type', TOKEN_FIELD),
+        ('var_expr', NODE))),
+    (ast.AssignStmt, (('lhs', NODE), ('rhs', NODE))),
+    (ast.StructDeclStmt, (('struct_id', TOKEN_FIELD), ('var_decls', NODES))),
+    (ast.FunDeclStmt, (('fun_name', TOKEN_FIELD), ('params', NODES),
+        ('return_type', TOKEN_FIELD), ('stmt_list', NODE))),
+    (ast.ReturnStmt, (('return_expr', NODE), ('return_token', TOKEN_FIELD))),
+    (ast.WhileStmt, (('bool_expr', NODE), ('stmt_list', NODE))),
+    (ast.IfStmt, (('if_part', NODE), ('elseifs', NODES), ('has_else', BOOL),
+        ('else_stmts', NODE))),
+    (ast.SimpleExpr, (('term', NODE),)),
+    (ast.ComplexExpr, (('first_operand', NODE), ('math_rel', TOKEN_FIELD),
+        ('rest', NODE))),
+    (ast.BoolExpr, (('first_expr', NODE), ('bool_rel', TOKEN_FIELD),
+        ('second_expr', NODE), ('bool_connector', TOKEN_FIELD), ('rest', NODE),
+        ('negated', BOOL))),
+    (ast.LValue, (('path', TOKENS),)),
+    (ast.FunParam, (('param_name', TOKEN_FIELD), ('param_type', TOKEN_FIELD))),
+    (ast.BasicIf, (('bool_expr', NODE), ('stmt_list', NODE))),
+    (ast.SimpleRValue, (('val', TOKEN_FIELD),)),
+    (ast.NewRValue, (('struct_type', TOKEN_FIELD),)),
+    (ast.CallRValue, (('fun', TOKEN_FIELD), ('args', NODES))),
+    (ast.IDRvalue, (('path', TOKENS),)),
+    (ast.ErrorStmt, (('error', ERROR), ('first_token', TOKEN_FIELD))),
+)
+
+KIND_OF = {cls: kind for kind, (cls, fields) in enumerate(KINDS)}
+
+class FormatError(Exception):
+    """The data is not a binary AST this version can read"""
+    pass
+
+
+#------------------WRITING-----------------
+class Writer(object):
+    """Numbers the nodes of a tree breadth first and encodes each as its
+    kind followed by one word per field (two or more for lists). Nodes,
+    tokens and lexemes reached more than once are stored once"""
+
+    def __init__(self):
+        self.strings = {}       # lexeme -> index
+        self.tokens = {}        # id(Token) -> index
+        self.token_list = []    # keeps the tokens alive while ids are in use
+        self.nodes = {}         # id(node) -> index
+        self.queue = collections.deque()
+        self.words = []         # the node area
+        self.offsets = []       # word offset of each node
+
+    def dumps(self, stmt_list):
+        '''Returns the binary form of stmt_list'''
+        self.__node_ref(stmt_list)
+        while self.queue:
+            self.__encode(self.queue.popleft())
+        return self.__layout()
+
+    def __encode(self, node):
+        kind = KIND_OF.get(type(node))
+        if kind is None:
+            kind = next((KIND_OF[cls] for cls in type(node).__mro__ if cls in KIND_OF), None)
+            if kind is None:
+                raise FormatError('cannot store a ' + type(node).__name__)
+        self.offsets.append(len(self.words))
+        words = self.words
+        words.append(kind)
+        for name, field_type in KINDS[kind][1]:
+            value = getattr(node, name, None)
+            if field_type == NODE:
+                words.append(self.__node_ref(value))
+            elif field_type == TOKEN_FIELD:
+                words.append(self.__token_ref(value))
+            elif field_type == BOOL:
+                words.append(1 if value else 0)
+            elif field_type == ERROR:
+                if value is None:
+                    words.extend((0, 0, 0))
+                else:
+                    words.extend((self.__string_ref(value.message), value.line, value.column))
+            else:
+                items = value or []
+                words.append(len(items))
+                ref = self.__node_ref if field_type == NODES else self.__token_ref
+                words.extend(ref(item) for item in items)
+
+    def __node_ref(self, node):
+        '''Returns the index of node plus one (0 for None), queueing it the
+        first time it is seen'''
+        if node is None:
+            return 0
+        index = self.nodes.get(id(node))
+        if index is None:
+            index = self.nodes[id(node)] = len(self.nodes)
+            self.queue.append(node)
+        return index + 1
+
+    def __token_ref(self, tok):
+        if tok is None:
+            return 0
+        index = self.tokens.get(id(tok))
+        if index is None:
+            index = self.tokens[id(tok)] = len(self.token_list)
+            self.token_list.append(tok)
+        return index + 1
+
+    def __string_ref(self, lexeme):
+        if lexeme is None:
+            return 0
+        index = self.strings.get(lexeme)
+        if index is None:
+            index = self.strings[lexeme] = len(self.strings)
+        return index + 1
+
+    def __layout(self):
+        token_data = b''.join(TOKEN.pack(int(tok.tokentype), self.__string_ref(tok.lexeme),
+            tok.line, tok.column) for tok in self.token_list)
+        encoded = [lexeme.encode('utf-8') for lexeme in self.strings]
+        string_offsets = [0]
+        for data in encoded:
+            string_offsets.append(string_offsets[-1] + len(data))
+        sections = [
+            struct.pack('<%iI' % len(string_offsets), *string_offsets),
+            b''.join(encoded),
+            token_data,
+            struct.pack('<%iI' % len(self.offsets), *self.offsets),
+            struct.pack('<%iI' % len(self.words), *self.words),
+        ]
+        starts = []
+        position = HEADER.size
+        for i in range(len(sections)):
+            # keep the word sections aligned
+            padding = -position % 4
+            sections[i] = b'\0' * padding + sections[i]
+            starts.append(position + padding)
+            position += len(sections[i])
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, len(self.strings), len(self.token_list),
+            len(self.offsets), *starts)
+        return header + b''.join(sections)
+
+
+def dumps(stmt_list):
+    return Writer().dumps(stmt_list)
+
+def dump(stmt_list, path):
+    with open(path, 'wb') as out:
+        out.write(dumps(stmt_list))
+
+#------------------READING-----------------
+class Reader(object):
+    """Decodes nodes from the binary data on demand. Nodes are created as
+    empty lazy subclasses of their AST class; reading a field of one fills
+    in all its fields, creating its children in turn as empty nodes"""
+
+    def __init__(self, data):
+        self.data = data
+        if len(data) < HEADER.size:
+            raise FormatError('truncated header')
+        (magic, version, self.string_count, self.token_count, self.node_count,
+            self.string_offsets_at, self.strings_at, self.tokens_at,
+            self.node_offsets_at, self.nodes_at) = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise FormatError('not a binary MyPL AST')
+        if version != FORMAT_VERSION:
+            raise FormatError('unsupported format version %i' % version)
+        self.strings = {}       # index -> lexeme
+        self.tokens = {}        # index -> Token
+        self.nodes = {}         # index -> node
+
+    def root(self):
+        return self.node(0)
+
+    def node(self, index):
+        '''Returns the (possibly still empty) node with this index'''
+        node = self.nodes.get(index)
+        if node is None:
+            if not 0 <= index < self.node_count:
+                raise FormatError('node %i out of range' % index)
+            offset = WORD.unpack_from(self.data, self.node_offsets_at + 4 * index)[0]
+            kind = WORD.unpack_from(self.data, self.nodes_at + 4 * offset)[0]
+            if kind >= len(KINDS):
+                raise FormatError('node %i has unknown kind %i' % (index, kind))
+            node = LAZY_CLASSES[kind].__new__(LAZY_CLASSES[kind])
+            node._reader = self
+            node._index = index
+            self.nodes[index] = node
+        return node
+
+    def token(self, index):
+        tok = self.tokens.get(index)
+        if tok is None:
+            tokentype, string, line, column = TOKEN.unpack_from(self.data,
+                self.tokens_at + TOKEN.size * index)
+            tok = token.Token(token.TokenType(tokentype), self.string(string - 1) if string
+                else None, line, column)
+            self.tokens[index] = tok
+        return tok
+
+    def string(self, index):
+        lexeme = self.strings.get(index)
+        if lexeme is None:
+            start, end = struct.unpack_from('<2I', self.data,
+                self.string_offsets_at + 4 * index)
+            start += self.strings_at
+            lexeme = bytes(self.data[start:self.strings_at + end]).decode('utf-8')
+            self.strings[index] = lexeme
+        return lexeme
+
+    def materialize(self, node):
+        '''Fills in the fields of an empty node'''
+        data = self.data
+        offset = WORD.unpack_from(data, self.node_offsets_at + 4 * node._index)[0]
+        position = self.nodes_at + 4 * offset
+        kind = WORD.unpack_from(data, position)[0]
+        for name, field_type in KINDS[kind][1]:
+            position += 4
+            word = WORD.unpack_from(data, position)[0]
+            if field_type == NODE:
+                value = self.node(word - 1) if word else None
+            elif field_type == TOKEN_FIELD:
+                value = self.token(word - 1) if word else None
+            elif field_type == BOOL:
+                value = bool(word)
+            elif field_type == ERROR:
+                line, column = struct.unpack_from('<2I', data, position + 4)
+                position += 8
+                value = error.MyPLError(self.string(word - 1), line, column) if word else None
+            else:
+                refs = struct.unpack_from('<%iI' % word, data, position + 4)
+                position += 4 * word
+                ref = self.node if field_type == NODES else self.token
+                value = [ref(r - 1) for r in refs]
+            object.__setattr__(node, name, value)
+        for name in UNSTORED[kind]:
+            object.__setattr__(node, name, None)
+        node._reader = None
+
+
+def lazy_class(cls):
+    '''Returns a subclass of an AST class whose instances fill themselves in
+    from their Reader the first time a field is missing'''
+    def __getattr__(self, name):
+        reader = object.__getattribute__(self, '_reader')
+        if reader is None or name.startswith('_'):
+            raise AttributeError(name)
+        reader.materialize(self)
+        return object.__getattribute__(self, name)
+    return type('Lazy' + cls.__name__, (cls,), {'__slots__': ('_reader', '_index'),
+        '__getattr__': __getattr__})
+
+LAZY_CLASSES = tuple(lazy_class(cls) for cls, fields in KINDS)
+
+# the fields of each kind that are not stored, such as the type checker's
+# annotations; they start out as None
+UNSTORED = tuple(tuple(name for name in ast.node_fields(cls)[1]
+    if name not in dict(fields)) for cls, fields in KINDS)
+
+def loads(data):
+    '''Returns the lazily decoded StmtList of binary data'''
+    return Reader(data).root()
+
+def load(path):
+    '''Maps the file at path into memory and returns its lazily decoded
+    StmtList; the mapping lives as long as nodes from it do'''
+    with open(path, 'rb') as source:
+        data = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+    return loads(data)
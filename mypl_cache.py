@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   An on-disk cache of parsed MyPL programs, keyed by the hash of the
+#   source and of the parser code, so unchanged files are not lexed or
+#   parsed again
+#----------------------------------------------------------------------
+import hashlib
+import io
+import os
+import struct
+import tempfile
+import time
+
+import mypl_ast as ast
+import mypl_binary_ast as binary_ast
+import mypl_lexer as lexer
+import mypl_parser as parser
+
+# the sources that decide what AST a program parses to, and is read back as
+PARSER_FILES = ('mypl_token.py', 'mypl_lexer.py', 'mypl_parser.py', 'mypl_ll1.py', 
+    'mypl_ast.py', 'mypl_binary_ast.py')
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+EXTENSION = '.ast'
+TEMP_SUFFIX = '.tmp'
+# a temporary file this old was left by a writer that died before renaming it
+ORPHAN_SECONDS = 60 * 60
+
+# what a damaged or truncated entry may raise while it is decoded
+DECODE_ERRORS = (binary_ast.FormatError, struct.error, ValueError, IndexError)
+
+_parser_version = None
+
+def parser_version():
+    '''Returns a hash of the parser sources, so editing them invalidates
+    every cached entry'''
+    global _parser_version
+    if _parser_version is None:
+        digest = hashlib.sha256()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in PARSER_FILES:
+            with open(os.path.join(directory, name), 'rb') as source:
+                digest.update(source.read())
+        _parser_version = digest.hexdigest()
+    return _parser_version
+
+
+class ParseCache(object):
+    """StmtLists in the binary AST format, in a directory that several
+    processes may share. The format holds only data, so an entry planted
+    in the directory cannot run code when it is loaded. Entries are written
+    to a temporary file and renamed into place, so a reader never sees a
+    partial entry. Reading an entry refreshes its modification time, and
+    once the directory holds more than max_bytes the entries used least
+    recently are removed. ASTs parsed with precedence are kept under
+    different keys from those parsed without"""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, precedence=False,
+            engine='descent'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.precedence = precedence
+        self.engine = engine    # parser engine for misses; all build the same AST
+        self.version = parser_version()
+        self.hits = 0
+        self.misses = 0
+        self.written = 0        # bytes written since the size was last checked
+        os.makedirs(directory, exist_ok=True)
+
+    def parse(self, source):
+        '''Returns the StmtList for source (str or bytes), from the cache if
+        it is there; otherwise parses it and stores the result. Errors are
+        raised as usual and not cached'''
+        if isinstance(source, str):
+            source = source.encode('utf-8')
+        key = self.key(source)
+        stmt_list = self.get(key)
+        if stmt_list is not None:
+            self.hits += 1
+            return stmt_list
+        self.misses += 1
+        text = io.StringIO(source.decode('utf-8'))
+        stmt_list = parser.make_parser(lexer.Lexer(text, True), self.engine,
+            self.precedence).parse()
+        self.put(key, stmt_list)
+        return stmt_list
+
+    def key(self, source):
+        digest = hashlib.sha256(self.version.encode('ascii'))
+        digest.update(b'\0format %i' % binary_ast.FORMAT_VERSION)
+        digest.update(b'\0precedence\0' if self.precedence else b'\0')
+        digest.update(source)
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + EXTENSION)
+
+    def get(self, key):
+        '''Returns the cached StmtList for key, or None'''
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as entry:
+                data = entry.read()
+            stmt_list = binary_ast.loads(data)
+            # decode every node now, so a damaged entry is a miss rather
+            # than an error in whoever walks the tree
+            for node in ast.nodes(stmt_list):
+                pass
+            os.utime(path)
+        except (OSError,) + DECODE_ERRORS:
+            return None
+        return stmt_list
+
+    def put(self, key, stmt_list):
+        '''Stores stmt_list under key; ASTs the format cannot hold are skipped'''
+        try:
+            data = binary_ast.dumps(stmt_list)
+        except binary_ast.FormatError:
+            return
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=TEMP_SUFFIX)
+        try:
+            with os.fdopen(fd, 'wb') as entry:
+                entry.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            return
+        self.written += len(data)
+        if self.written > self.max_bytes // 10:
+            self.evict()
+
+    def evict(self):
+        '''Removes temporary files orphaned by writers that died, then the
+        least recently used entries until the cache holds at most nine
+        tenths of max_bytes'''
+        self.written = 0
+        entries = []
+        total = 0
+        orphaned = time.time() - ORPHAN_SECONDS
+        for root, dirs, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith((EXTENSION, TEMP_SUFFIX)):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    info = os.stat(path)
+                    if name.endswith(TEMP_SUFFIX):
+                        if info.st_mtime < orphaned:
+                            os.unlink(path)
+                        continue
+                except OSError:
+                    continue        # removed by another process
+                entries.append((info.st_mtime, info.st_size, path))
+                total += info.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes * 9 // 10:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
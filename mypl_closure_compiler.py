@@ -0,0 +1,467 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Executes MyPL programs by compiling the AST once into nested Python
+#   closures, with every variable resolved to a slot of its function's
+#   frame, so running a program does no AST inspection at all
+#----------------------------------------------------------------------
+import mypl_ast as ast
+import mypl_error as error
+import mypl_runtime as runtime
+import mypl_token as token
+
+class FunctionInfo(object):
+    """A compiled function. The body is filled in when its declaration is
+    compiled, so calls compiled earlier already refer to it"""
+    __slots__ = ('name', 'arity', 'nslots', 'body')
+
+    def __init__(self, name, arity):
+        self.name = name
+        self.arity = arity
+        self.nslots = 1         # frame size; slot 0 holds the return value
+        self.body = None        # block closure taking the frame
+
+
+class StructInfo(object):
+    """A compiled struct declaration; new() runs the field initializers"""
+    __slots__ = ('name', 'fields', 'init')
+
+    def __init__(self, name):
+        self.name = name
+        self.fields = []        # field names, field i in slot i of the init frame
+        self.init = None        # block closure initializing the fields
+
+    def new(self):
+        frame = [None] * len(self.fields)
+        self.init(frame)
+        return dict(zip(self.fields, frame))
+
+
+class ClosureCompiler(ast.Visitor):
+    """Compiles a StmtList into a Python function that runs the program.
+    Statement closures take the frame (a list) and return True once a
+    return statement ran; expression closures take the frame and return
+    the value"""
+
+    def __init__(self):
+        self.functions = {}     # name -> FunctionInfo
+        self.structs = {}       # name -> StructInfo
+        self.scopes = []        # [{name: slot}] innermost last
+        self.next_slot = 1      # next free slot in the current frame
+        self.max_slots = 1      # frame size needed so far
+        self.code = None        # closure of the node just compiled
+
+    def compile(self, stmt_list):
+        '''Returns a function of no arguments that runs the program'''
+        self.__declare_globals(stmt_list)
+        self.scopes = []
+        self.next_slot = self.max_slots = 1
+        body = self.__block(stmt_list)
+        nslots = self.max_slots
+        def program():
+            body([None] * nslots)
+        return program
+
+    #------------------STATEMENTS-----------------
+    def visit_stmt_list(self, stmt_list):
+        self.code = self.__block(stmt_list)
+
+    def visit_expr_stmt(self, expr_stmt):
+        expr = self.__compile(expr_stmt.expr)
+        def stmt(frame):
+            expr(frame)
+        self.code = stmt
+
+    def visit_var_decl_stmt(self, var_decl):
+        expr = self.__compile(var_decl.var_expr)
+        slot = self.__declare(var_decl.var_id)
+        def stmt(frame):
+            frame[slot] = expr(frame)
+        self.code = stmt
+
+    def visit_assign_stmt(self, assign_stmt):
+        rhs = self.__compile(assign_stmt.rhs)
+        path = assign_stmt.lhs.path
+        slot = self.__lookup(path[0])
+        if len(path) == 1:
+            def stmt(frame):
+                frame[slot] = rhs(frame)
+        else:
+            target = self.__path(slot, path[1:-1])
+            field = path[-1]
+            name = field.lexeme
+            def stmt(frame):
+                value = rhs(frame)
+                obj = target(frame)
+                if type(obj) is not dict or name not in obj:
+                    raise field_error(obj, field)
+                obj[name] = value
+        self.code = stmt
+
+    def visit_struct_decl_stmt(self, struct_decl):
+        info = self.structs[struct_decl.struct_id.lexeme]
+        saved = self.__enter_frame(0)
+        inits = []
+        for var_decl in struct_decl.var_decls:
+            var_decl.accept(self)
+            inits.append(self.code)
+            info.fields.append(var_decl.var_id.lexeme)
+        self.__leave_frame(saved)
+        info.init = make_block(inits)
+        self.code = None
+
+    def visit_fun_decl_stmt(self, fun_decl):
+        info = self.functions[fun_decl.fun_name.lexeme]
+        saved = self.__enter_frame(1)
+        for param in fun_decl.params:
+            self.__declare(param.param_name)
+        info.body = self.__block(fun_decl.stmt_list)
+        info.nslots = self.max_slots
+        self.__leave_frame(saved)
+        self.code = None
+
+    def visit_return_stmt(self, return_stmt):
+        if return_stmt.return_expr is None:
+            def stmt(frame):
+                frame[0] = None
+                return True
+        else:
+            expr = self.__compile(return_stmt.return_expr)
+            def stmt(frame):
+                frame[0] = expr(frame)
+                return True
+        self.code = stmt
+
+    def visit_while_stmt(self, while_stmt):
+        cond = self.__compile(while_stmt.bool_expr)
+        body = self.__block(while_stmt.stmt_list)
+        def stmt(frame):
+            while cond(frame):
+                if body(frame):
+                    return True
+        self.code = stmt
+
+    def visit_if_stmt(self, if_stmt):
+        branches = []
+        for basic_if in [if_stmt.if_part] + if_stmt.elseifs:
+            cond = self.__compile(basic_if.bool_expr)
+            branches.append((cond, self.__block(basic_if.stmt_list)))
+        else_body = None
+        if if_stmt.has_else:
+            else_body = self.__block(if_stmt.else_stmts)
+        branches = tuple(branches)
+        def stmt(frame):
+            for cond, body in branches:
+                if cond(frame):
+                    return body(frame)
+            if else_body is not None:
+                return else_body(frame)
+        self.code = stmt
+
+    #------------------EXPRESSIONS-----------------
+    def visit_simple_expr(self, simple_expr):
+        simple_expr.term.accept(self)
+
+    def visit_complex_expr(self, complex_expr):
+        if isinstance(complex_expr.rest, ast.ComplexExpr):
+            links = ast.right_chain(complex_expr)
+            if len(links) > runtime.LONG_CHAIN:
+                self.code = self.__right_chain(links)
+                return
+        elif isinstance(complex_expr.first_operand, ast.ComplexExpr):
+            links = ast.left_chain(complex_expr)
+            if len(links) > runtime.LONG_CHAIN:
+                self.code = self.__left_chain(links)
+                return
+        first = self.__compile(complex_expr.first_operand)
+        rest = self.__compile(complex_expr.rest)
+        op = complex_expr.math_rel
+        if op.tokentype == token.PLUS:
+            def expr(frame):
+                try:
+                    return first(frame) + rest(frame)
+                except runtime.FAULTS as e:
+                    raise operator_error(e, op)
+        elif op.tokentype == token.MINUS:
+            def expr(frame):
+                try:
+                    return first(frame) - rest(frame)
+                except runtime.FAULTS as e:
+                    raise operator_error(e, op)
+        elif op.tokentype == token.MULTIPLY:
+            def expr(frame):
+                try:
+                    return first(frame) * rest(frame)
+                except runtime.FAULTS as e:
+                    raise operator_error(e, op)
+        else:
+            math = runtime.MATH[op.tokentype]
+            def expr(frame):
+                try:
+                    return math(first(frame), rest(frame))
+                except runtime.FAULTS as e:
+                    raise operator_error(e, op)
+        self.code = expr
+
+    def visit_bool_expr(self, bool_expr):
+        # the links of a chain of and/or are compiled in order, then joined
+        links = []
+        connectors = []
+        while True:
+            links.append(self.__bool_link(bool_expr))
+            if bool_expr.bool_connector is None:
+                break
+            connectors.append(bool_expr.bool_connector.tokentype == token.AND)
+            bool_expr = bool_expr.rest
+        if len(links) > runtime.LONG_CHAIN:
+            steps = tuple(zip(links, connectors + [None]))
+            def value(frame):
+                for link, is_and in steps:
+                    result = link(frame)
+                    if is_and is None or (not result if is_and else result):
+                        return result
+            self.code = value
+            return
+        value = links.pop()
+        while links:
+            value = connect(links.pop(), connectors.pop(), value)
+        self.code = value
+
+    def __bool_link(self, bool_expr):
+        '''Returns the closure of one link of a chain of and/or: a value or
+        a relation, possibly negated'''
+        first = self.__compile(bool_expr.first_expr)
+        if bool_expr.bool_rel is not None:
+            second = self.__compile(bool_expr.second_expr)
+            rel = bool_expr.bool_rel
+            compare = runtime.COMPARE[rel.tokentype]
+            def value(frame):
+                try:
+                    return compare(first(frame), second(frame))
+                except runtime.FAULTS as e:
+                    raise operator_error(e, rel)
+        else:
+            value = first
+        if bool_expr.negated:
+            positive = value
+            def value(frame):
+                return not positive(frame)
+        return value
+
+    def visit_simple_rvalue(self, simple_rvalue):
+        tok = simple_rvalue.val
+        if tok.tokentype == token.ID:
+            slot = self.__lookup(tok)
+            def expr(frame):
+                return frame[slot]
+        else:
+            value = runtime.literal(tok)
+            def expr(frame):
+                return value
+        self.code = expr
+
+    def visit_new_rvalue(self, new_rvalue):
+        struct_type = new_rvalue.struct_type
+        info = self.structs.get(struct_type.lexeme)
+        if info is None:
+            raise error.MyPLError("undefined struct '" + struct_type.lexeme + "'",
+                struct_type.line, struct_type.column)
+        def expr(frame):
+            return info.new()
+        self.code = expr
+
+    def visit_call_rvalue(self, call_rvalue):
+        fun = call_rvalue.fun
+        args = tuple(self.__compile(arg) for arg in call_rvalue.args)
+        info = self.functions.get(fun.lexeme)
+        if info is None:
+            self.code = self.__builtin_call(fun, args)
+            return
+        check_arity(fun, info.arity, len(args))
+        def expr(frame):
+            new_frame = [None] * info.nslots
+            new_frame[1:len(args) + 1] = [arg(frame) for arg in args]
+            try:
+                info.body(new_frame)
+            except RecursionError:
+                raise error.MyPLError('call stack overflow', fun.line, fun.column)
+            return new_frame[0]
+        self.code = expr
+
+    def visit_id_rvalue(self, id_rvalue):
+        path = id_rvalue.path
+        self.code = self.__path(self.__lookup(path[0]), path[1:])
+
+    #------------------HELPER FUNCTIONS-----------------
+    def __compile(self, node):
+        '''Compiles node and returns its closure'''
+        node.accept(self)
+        return self.code
+
+    def __block(self, stmt_list):
+        '''Compiles a statement list in a new scope'''
+        self.scopes.append({})
+        saved_slot = self.next_slot
+        stmts = []
+        for stmt in stmt_list.stmts:
+            code = self.__compile(stmt)
+            if code is not None:
+                stmts.append(code)
+        self.scopes.pop()
+        self.next_slot = saved_slot
+        return make_block(stmts)
+
+    def __declare_globals(self, stmt_list):
+        '''Registers every function and struct before any body is compiled, so
+        they can be used before their declaration'''
+        for stmt in stmt_list.stmts:
+            if isinstance(stmt, ast.FunDeclStmt):
+                name = stmt.fun_name
+                table, info = self.functions, FunctionInfo(name.lexeme, len(stmt.params))
+            elif isinstance(stmt, ast.StructDeclStmt):
+                name = stmt.struct_id
+                table, info = self.structs, StructInfo(name.lexeme)
+            else:
+                continue
+            if name.lexeme in table:
+                raise error.MyPLError("redefinition of '" + name.lexeme + "'",
+                    name.line, name.column)
+            table[name.lexeme] = info
+
+    def __enter_frame(self, first_slot):
+        '''Starts compiling a new frame and returns the state to restore'''
+        saved = (self.scopes, self.next_slot, self.max_slots)
+        self.scopes = [{}]
+        self.next_slot = self.max_slots = first_slot
+        return saved
+
+    def __leave_frame(self, saved):
+        self.scopes, self.next_slot, self.max_slots = saved
+
+    def __declare(self, id_token):
+        '''Gives the variable a slot in the innermost scope'''
+        slot = self.next_slot
+        self.scopes[-1][id_token.lexeme] = slot
+        self.next_slot += 1
+        if self.next_slot > self.max_slots:
+            self.max_slots = self.next_slot
+        return slot
+
+    def __lookup(self, id_token):
+        '''Returns the slot of the variable visible under id_token's name'''
+        name = id_token.lexeme
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        raise error.MyPLError("undefined variable '" + name + "'",
+            id_token.line, id_token.column)
+
+    def __path(self, slot, fields):
+        '''Returns a closure reading the variable in slot followed by fields'''
+        if not fields:
+            def expr(frame):
+                return frame[slot]
+            return expr
+        fields = tuple(fields)
+        def expr(frame):
+            obj = frame[slot]
+            for field in fields:
+                try:
+                    obj = obj[field.lexeme]
+                except (TypeError, KeyError):
+                    raise field_error(obj, field)
+            return obj
+        return expr
+
+    def __right_chain(self, links):
+        '''Returns a closure evaluating the operands of a right chain in
+        order, then applying the operators from the right'''
+        operands = tuple(self.__compile(operand) for operand, op in links)
+        ops = tuple((runtime.MATH[op.tokentype], op) for operand, op in links[:-1])
+        def expr(frame):
+            values = [operand(frame) for operand in operands]
+            value = values.pop()
+            i = len(ops) - 1
+            try:
+                while i >= 0:
+                    value = ops[i][0](values[i], value)
+                    i -= 1
+            except runtime.FAULTS as e:
+                raise operator_error(e, ops[i][1])
+            return value
+        return expr
+
+    def __left_chain(self, links):
+        '''Returns a closure applying the operators of a left chain as it
+        evaluates the operands'''
+        first = self.__compile(links[0][1])
+        steps = tuple((runtime.MATH[op.tokentype], op, self.__compile(operand))
+            for op, operand in links[1:])
+        def expr(frame):
+            value = first(frame)
+            for math, op, operand in steps:
+                try:
+                    value = math(value, operand(frame))
+                except runtime.FAULTS as e:
+                    raise operator_error(e, op)
+            return value
+        return expr
+
+    def __builtin_call(self, fun, args):
+        if fun.lexeme not in runtime.BUILTINS:
+            raise error.MyPLError("undefined function '" + fun.lexeme + "'",
+                fun.line, fun.column)
+        function, arity, return_type = runtime.BUILTINS[fun.lexeme]
+        check_arity(fun, arity, len(args))
+        def expr(frame):
+            try:
+                return function(*[arg(frame) for arg in args])
+            except runtime.FAULTS as e:
+                raise operator_error(e, fun)
+        return expr
+
+
+def make_block(stmts):
+    '''Returns one closure running stmts in order until one returns True'''
+    if not stmts:
+        def block(frame):
+            return None
+        return block
+    if len(stmts) == 1:
+        return stmts[0]
+    stmts = tuple(stmts)
+    def block(frame):
+        for stmt in stmts:
+            if stmt(frame):
+                return True
+    return block
+
+def connect(left, is_and, rest):
+    '''Returns the closure of left and rest, or of left or rest'''
+    if is_and:
+        def value(frame):
+            return left(frame) and rest(frame)
+    else:
+        def value(frame):
+            return left(frame) or rest(frame)
+    return value
+
+def check_arity(fun, arity, count):
+    if arity != count:
+        raise error.MyPLError("'%s' takes %i arguments, %i given" % (fun.lexeme, arity,
+            count), fun.line, fun.column)
+
+def operator_error(exc, tok):
+    return error.MyPLError(runtime.fault_message(exc), tok.line, tok.column)
+
+def field_error(obj, field):
+    if obj is None:
+        msg = "nil reference reading field '" + field.lexeme + "'"
+    else:
+        msg = "no field '" + field.lexeme + "'"
+    return error.MyPLError(msg, field.line, field.column)
+
+def run(stmt_list):
+    '''Compiles and runs a parsed program'''
+    ClosureCompiler().compile(stmt_list)()
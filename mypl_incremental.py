@@ -0,0 +1,216 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Keeps the tokens and AST of a MyPL source up to date across text
+#   edits, re-lexing only the changed region and re-parsing only the
+#   top-level statements that contain it
+#----------------------------------------------------------------------
+import bisect
+
+import mypl_ast as ast
+import mypl_error as error
+import mypl_lexer as lexer
+import mypl_parser as parser
+import mypl_token as token
+
+class TokenSlice(object):
+    """Feeds a Parser the tokens of a list from index start on, keeping the
+    index of the last token handed out"""
+
+    def __init__(self, tokens, start):
+        self.token_list = tokens
+        self.start = start
+        self.index = start - 1
+
+    def tokens(self):
+        token_list = self.token_list
+        for i in range(self.start, len(token_list)):
+            self.index = i
+            yield token_list[i]
+
+
+class Document(object):
+    """A MyPL source together with its tokens and AST.
+
+    apply_edit() replaces deleted characters at an offset with inserted text
+    and brings the tokens and AST up to date. Tokens after the edit are reused
+    and have their line and column shifted in place, so the reused AST
+    subtrees that hold them report the new positions. If lexing or parsing
+    fails the error is raised and the document keeps the new source; the next
+    edit then rebuilds whatever is missing"""
+
+    def __init__(self, source):
+        self.source = source
+        self.line_starts = line_starts(source)  # index of each line's first char
+        self.symbols = lexer.SymbolTable()      # names shared by every re-lex
+        self.tokens = None                      # [Token] ending with EOS
+        self.stmt_list = None                   # StmtList
+        self.spans = None                       # [(first, end)] token indices per stmt
+        self.relexed_tokens = 0                 # work done by the last update
+        self.reparsed_stmts = 0
+        self.__relex_all()
+        self.__reparse_all()
+
+    def apply_edit(self, offset, deleted, inserted):
+        '''Replaces the deleted characters starting at offset with inserted and
+        returns the updated StmtList'''
+        if not 0 <= offset <= offset + deleted <= len(self.source):
+            raise ValueError('edit outside the source')
+        old_source = self.source
+        old_line_starts = self.line_starts
+        self.source = old_source[:offset] + inserted + old_source[offset + deleted:]
+        self.line_starts = shift_line_starts(old_line_starts, offset, deleted, inserted)
+        if self.tokens is None:
+            self.__relex_all()
+            self.__reparse_all()
+            return self.stmt_list
+        try:
+            first, end, added = self.__relex(old_line_starts, offset, deleted, inserted)
+        except error.MyPLError:
+            self.stmt_list = None   # it no longer matches the source
+            raise
+        if self.stmt_list is None:
+            self.__reparse_all()
+        else:
+            self.__reparse(first, end, added)
+        return self.stmt_list
+
+    def __relex_all(self):
+        self.tokens = None
+        self.stmt_list = None
+        the_lexer = lexer.RegexLexer(None, self.symbols)
+        the_lexer.reset(self.source)
+        self.tokens = list(the_lexer.tokens())
+        self.relexed_tokens = len(self.tokens)
+
+    def __reparse_all(self):
+        self.stmt_list = None
+        self.spans = None
+        stmts, spans, resume = parse_from(self.tokens, 0)
+        self.stmt_list = ast.StmtList()
+        self.stmt_list.stmts = stmts
+        self.spans = spans
+        self.reparsed_stmts = len(stmts)
+
+    def __relex(self, old_line_starts, offset, deleted, inserted):
+        '''Re-lexes from the start of the edited line until the new tokens line
+        up with old ones again. Returns the index of the first replaced old
+        token, the index just past the last one and the number of new tokens'''
+        old_tokens = self.tokens
+        self.tokens = None
+        delta = len(inserted) - deleted
+        line = bisect.bisect_right(old_line_starts, offset)
+        line_start = old_line_starts[line - 1]
+        first = bisect.bisect_left(old_tokens, line, 0, len(old_tokens) - 1,
+            key=lambda tok: tok.line)
+        the_lexer = lexer.RegexLexer(None, self.symbols)
+        the_lexer.reset(self.source, line_start, line, line_start)
+        # old tokens at or after the end of the edit are the resync candidates
+        resync = first
+        resync_offset = -1
+        new_tokens = []
+        while True:
+            tok = the_lexer.next_token()
+            if tok.tokentype == token.EOS:
+                new_tokens.append(tok)
+                end = len(old_tokens)
+                break
+            new_offset = the_lexer.line_start + tok.column - 1
+            if new_offset >= offset + len(inserted):
+                old_offset = new_offset - delta
+                while resync_offset < old_offset and resync < len(old_tokens) - 1:
+                    resync_offset = token_offset(old_line_starts, old_tokens[resync])
+                    if resync_offset < old_offset:
+                        resync += 1
+                old = old_tokens[resync]
+                if (resync_offset == old_offset and old.tokentype != token.EOS and
+                        old.tokentype == tok.tokentype and old.lexeme == tok.lexeme):
+                    shift_tokens(old_tokens, resync, tok.line - old.line,
+                        old.line, tok.column - old.column)
+                    end = resync
+                    break
+            new_tokens.append(tok)
+        self.tokens = old_tokens[:first] + new_tokens + old_tokens[end:]
+        self.relexed_tokens = len(new_tokens)
+        return first, end, len(new_tokens)
+
+    def __reparse(self, first, end, added):
+        '''Re-parses the top-level statements covering the old tokens first to
+        end, which were replaced by added new tokens, and reuses the rest'''
+        old_stmts = self.stmt_list.stmts
+        old_spans = self.spans
+        self.stmt_list = None
+        self.spans = None
+        shift = added - (end - first)
+        k = bisect.bisect_right(old_spans, first, key=lambda span: span[1])
+        start = old_spans[k - 1][1] if k else 0
+        # statements starting at or after end are unchanged apart from shifting
+        starts = [span[0] for span in old_spans]
+        reuse = bisect.bisect_left(starts, end)
+        stmts, spans, resume = parse_from(self.tokens, start, shift, starts, reuse)
+        self.reparsed_stmts = len(stmts)
+        stmt_list = ast.StmtList()
+        stmt_list.stmts = old_stmts[:k] + stmts + old_stmts[resume:]
+        self.stmt_list = stmt_list
+        self.spans = (old_spans[:k] + spans +
+            [(s + shift, e + shift) for s, e in old_spans[resume:]])
+
+
+def parse_from(tokens, start, shift=0, old_starts=(), reuse=0):
+    '''Parses top-level statements from token index start. Stops early once a
+    statement ends where one of old_starts[reuse:] begins after adding shift.
+    Returns the statements, their (first, end) token indices and the index
+    in old_starts parsing stopped at (len(old_starts) at the end of file)'''
+    source = TokenSlice(tokens, start)
+    stmts = []
+    spans = []
+    stmt_start = start
+    for stmt in parser.Parser(source).statements():
+        stmt_end = source.index
+        stmts.append(stmt)
+        spans.append((stmt_start, stmt_end))
+        stmt_start = stmt_end
+        while reuse < len(old_starts) and old_starts[reuse] + shift < stmt_end:
+            reuse += 1
+        if reuse < len(old_starts) and old_starts[reuse] + shift == stmt_end:
+            return stmts, spans, reuse
+    return stmts, spans, len(old_starts)
+
+def line_starts(source):
+    '''Returns the index of the first character of every line in source'''
+    starts = [0]
+    i = source.find('\n')
+    while i != -1:
+        starts.append(i + 1)
+        i = source.find('\n', i + 1)
+    return starts
+
+def shift_line_starts(starts, offset, deleted, inserted):
+    '''Returns the line starts after replacing deleted characters at offset
+    with inserted'''
+    delta = len(inserted) - deleted
+    new_starts = starts[:bisect.bisect_right(starts, offset)]
+    i = inserted.find('\n')
+    while i != -1:
+        new_starts.append(offset + i + 1)
+        i = inserted.find('\n', i + 1)
+    tail = bisect.bisect_right(starts, offset + deleted)
+    new_starts.extend(start + delta for start in starts[tail:])
+    return new_starts
+
+def token_offset(starts, tok):
+    '''Returns the index in the source of the first character of tok'''
+    return starts[tok.line - 1] + tok.column - 1
+
+def shift_tokens(tokens, first, line_delta, column_line, column_delta):
+    '''Moves tokens[first:] down by line_delta lines, and those on line
+    column_line right by column_delta columns'''
+    if column_delta:
+        i = first
+        while i < len(tokens) and tokens[i].line == column_line:
+            tokens[i].column += column_delta
+            i += 1
+    if line_delta:
+        for i in range(first, len(tokens)):
+            tokens[i].line += line_delta
@@ -6,265 +6,296 @@
 #----------------------------------------------------------------------
 import mypl_token as token
 import mypl_error as error
+import codecs
+import io
+import re
+
+class SymbolTable(object):
+    """Interns lexemes: every identifier and keyword with the same spelling 
+    gets the same string object, however many tokens carry it. Share one 
+    table between the lexers of several files to share their names too; 
+    equal names can then be told apart by identity"""
+    __slots__ = ('strings',)
+
+    def __init__(self):
+        self.strings = {}       # lexeme -> its one copy
+
+    def intern(self, s):
+        return self.strings.setdefault(s, s)
+
+    def __len__(self):
+        return len(self.strings)
+
 
 class Lexer(object):
-    def __init__(self, input_stream):
+    def __init__(self, input_stream, buffered=False, symbols=None):
         self.line = 1
         self.column = 0
         self.input_stream = input_stream
+        self.buffer = None                      # whole source when buffered
+        self.pos = 0                            # index of next char in buffer
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        if buffered:
+            self.buffer = input_stream.read()
     
     def __peek(self):
         """Returns next character keeping it in the stream"""
+        if self.buffer is not None:
+            return self.buffer[self.pos:self.pos + 1]
         pos = self.input_stream.tell()
         symbol = self.input_stream.read(1)
         self.input_stream.seek(pos)
         return symbol
     
     def __read(self):
+        if self.buffer is not None:
+            symbol = self.buffer[self.pos:self.pos + 1]
+            self.pos += 1
+            self.__add_to_corr(symbol)
+            return symbol
         self.__add_to_corr(self.__peek())
         return self.input_stream.read(1)
     
     # returns the next token in the stream
     def next_token(self):
-        symbol = self.__peek() # for efficiency purposes
-        s = ""
-        col = self.column
-        line = self.line
-        #EOS
-        if symbol == "":
-            if self.line == 1 and self.column == 0:
-                None
-            else:
-                self.line += 1
-                self.column = 0
-            return token.Token(token.EOS, "", self.line, self.column)
-        elif self.line == 1 and self.column == 0:
-            self.column += 1
-            col += 1
-        #NEWLINE
-        if symbol == "\n":
-            self.__read()
-            return self.next_token()
-        #SINGLE LINE COMMENTS  
-        elif symbol == "#" :
-            while (symbol != '\n' and symbol != ""):
+        # newlines, whitespace and comments loop back for the next symbol 
+        # rather than recursing, so long runs of them cannot exhaust the stack
+        while True:
+            symbol = self.__peek() # for efficiency purposes
+            s = ""
+            col = self.column
+            line = self.line
+            #EOS
+            if symbol == "":
+                if self.line == 1 and self.column == 0:
+                    None
+                else:
+                    self.line += 1
+                    self.column = 0
+                return token.Token(token.EOS, "", self.line, self.column)
+            elif self.line == 1 and self.column == 0:
+                self.column += 1
+                col += 1
+            #NEWLINE
+            if symbol == "\n":
                 self.__read()
-                symbol = self.__peek()
-            return self.next_token()
-        #WHITESPACE 
-        elif symbol.isspace():  
-            self.__read()        
-            return self.next_token()   
-        #STRINGVAL    
-        elif symbol == "'" or symbol == '"':
-            return self.__stringval(symbol)   
-        #SIGNS
-        elif self.__isSign() != 0:  
-            goldNum = self.__isSign()
-            s += symbol
-            #COMPARISON
-            if goldNum == 1:
-                if symbol == '=':
-                    #EQUAL
-                    if self.__isSecondEqual():
-                        s+= "="
-                        errorNum = self.__isSign()
-                        if errorNum == 4 or errorNum == 0: #() or not sign
-                            return token.Token(token.EQUAL, s, line, col)
+                continue
+            #SINGLE LINE COMMENTS  
+            elif symbol == "#" :
+                while (symbol != '\n' and symbol != ""):
+                    self.__read()
+                    symbol = self.__peek()
+                continue
+            #WHITESPACE 
+            elif symbol.isspace():  
+                self.__read()        
+                continue
+            #STRINGVAL    
+            elif symbol == "'" or symbol == '"':
+                return self.__stringval(symbol)   
+            #SIGNS
+            elif self.__isSign() != 0:  
+                goldNum = self.__isSign()
+                s += symbol
+                #COMPARISON
+                if goldNum == 1:
+                    if symbol == '=':
+                        #EQUAL
+                        if self.__isSecondEqual():
+                            s+= "="
+                            errorNum = self.__isSign()
+                            if errorNum == 4 or errorNum == 0: #() or not sign
+                                return token.Token(token.EQUAL, s, line, col)
+                            else:
+                                raise error.MyPLError("unexpected symbol '" + self.__peek()+"'", self.line, self.column)
+                        #ASSIGN
                         else:
-                            raise error.MyPLError("unexpected symbol '" + self.__peek()+"'", self.line, self.column)
-                    #ASSIGN
-                    else:
-                        #ERROR: more signs post '='
-                        errorNum = self.__isSign()
-                        if errorNum == 4 or errorNum == 0: #() or not sign
-                            return token.Token(token.ASSIGN, s, line, col)
+                            #ERROR: more signs post '='
+                            errorNum = self.__isSign()
+                            if errorNum == 4 or errorNum == 0: #() or not sign
+                                return token.Token(token.ASSIGN, s, line, col)
+                            else:
+                                raise error.MyPLError("unexpected symbol'" + self.__peek()+"'", self.line, self.column)
+                    elif symbol == '<':
+                        #LESS_THAN_EQUAL
+                        if self.__isSecondEqual():
+                            s+= "="
+                            errorNum = self.__isSign()
+                            if errorNum == 4 or errorNum == 0: #() or not sign
+                                return token.Token(token.LESS_THAN_EQUAL, s, line, col)
+                            else:
+                                raise error.MyPLError("unexpected symbol '" + self.__peek()+"'", self.line, self.column)
+                        #LESS_THAN
                         else:
-                            raise error.MyPLError("unexpected symbol'" + self.__peek()+"'", self.line, self.column)
-                elif symbol == '<':
-                    #LESS_THAN_EQUAL
-                    if self.__isSecondEqual():
-                        s+= "="
-                        errorNum = self.__isSign()
-                        if errorNum == 4 or errorNum == 0: #() or not sign
-                            return token.Token(token.LESS_THAN_EQUAL, s, line, col)
+                            errorNum = self.__isSign()
+                            if errorNum == 4 or errorNum == 0: #() or not sign
+                                return token.Token(token.LESS_THAN, symbol, line, col)
+                            else:
+                                raise error.MyPLError("unexpected symbol '" + self.__peek()+"'", self.line, self.column)
+                    elif symbol == '>':
+                        #GREATER_THAN_EQUAL
+                        if self.__isSecondEqual():
+                            s+= "="
+                            errorNum = self.__isSign()
+                            if errorNum == 4 or errorNum == 0: #() or not sign
+                                return token.Token(token.GREATER_THAN_EQUAL, s, line, col)
+                            else:
+                                raise error.MyPLError("unexpected symbol '" + self.__peek()+"'", self.line, self.column)
+                        #GREATER_THAN
                         else:
-                            raise error.MyPLError("unexpected symbol '" + self.__peek()+"'", self.line, self.column)
-                    #LESS_THAN
+                            errorNum = self.__isSign()
+                            if errorNum == 4 or errorNum == 0: #() or not sign
+                                return token.Token(token.GREATER_THAN, symbol, line, col)
+                            else:
+                                raise error.MyPLError("unexpected symbol '" +self.__peek()+"'", self.line, self.column)
+                    #NOT_EQUAL
                     else:
-                        errorNum = self.__isSign()
-                        if errorNum == 4 or errorNum == 0: #() or not sign
-                            return token.Token(token.LESS_THAN, symbol, line, col)
+                        if self.__isSecondEqual():
+                            s+= "="
+                            return token.Token(token.NOT_EQUAL, s, line, col)
                         else:
                             raise error.MyPLError("unexpected symbol '" + self.__peek()+"'", self.line, self.column)
-                elif symbol == '>':
-                    #GREATER_THAN_EQUAL
-                    if self.__isSecondEqual():
-                        s+= "="
-                        errorNum = self.__isSign()
-                        if errorNum == 4 or errorNum == 0: #() or not sign
-                            return token.Token(token.GREATER_THAN_EQUAL, s, line, col)
-                        else:
-                            raise error.MyPLError("unexpected symbol '" + self.__peek()+"'", self.line, self.column)
-                    #GREATER_THAN
+                #OPERATOR
+                elif goldNum == 2:
+                    self.__read()
+                    #MINUS
+                    if symbol == '-':
+                        return token.Token(token.MINUS, symbol, line, col)
+                    #MODULO
+                    elif symbol == '%':
+                        return token.Token(token.MODULO, symbol, line, col)
+                    #MULTIPLY
+                    elif symbol == '*':
+                        return token.Token(token.MULTIPLY, symbol, line, col)
+                    #PLUS
+                    elif symbol == '+':
+                        return token.Token(token.PLUS, symbol, line, col)
+                    #DIVIDE
                     else:
-                        errorNum = self.__isSign()
-                        if errorNum == 4 or errorNum == 0: #() or not sign
-                            return token.Token(token.GREATER_THAN, symbol, line, col)
-                        else:
-                            raise error.MyPLError("unexpected symbol '" +self.__peek()+"'", self.line, self.column)
-                #NOT_EQUAL
-                else:
-                    if self.__isSecondEqual():
-                        s+= "="
-                        return token.Token(token.NOT_EQUAL, s, line, col)
+                        return token.Token(token.DIVIDE, symbol, line, col)
+                #PUNCTUATION 
+                elif goldNum == 3:
+                    self.__read()
+                    #COLON
+                    if symbol == ':':
+                        return token.Token(token.COLON, symbol, line, col)
+                    #SEMICOLON
+                    elif symbol == ';':
+                        return token.Token(token.SEMICOLON, symbol, line, col)
+                    #COMMA
+                    elif symbol == ',':
+                        return token.Token(token.COMMA, symbol, line, col)
+                    #DOT
                     else:
-                        raise error.MyPLError("unexpected symbol '" + self.__peek()+"'", self.line, self.column)
-            #OPERATOR
-            elif goldNum == 2:
-                self.__read()
-                #MINUS
-                if symbol == '-':
-                    return token.Token(token.MINUS, symbol, line, col)
-                #MODULO
-                elif symbol == '%':
-                    return token.Token(token.MODULO, symbol, line, col)
-                #MULTIPLY
-                elif symbol == '*':
-                    return token.Token(token.MULTIPLY, symbol, line, col)
-                #PLUS
-                elif symbol == '+':
-                    return token.Token(token.PLUS, symbol, line, col)
-                #DIVIDE
+                        return token.Token(token.DOT, symbol, line, col)
+                #PAREN
                 else:
-                    return token.Token(token.DIVIDE, symbol, line, col)
-            #PUNCTUATION 
-            elif goldNum == 3:
+                    self.__read()
+                    if symbol == "(":
+                        return token.Token(token.LPAREN, symbol, line, col)
+                    else:
+                        return token.Token(token.RPAREN, symbol, line, col)
+            #NUMBER            
+            elif symbol.isdigit():    
+                start = self.__tell()
                 self.__read()
-                #COLON
-                if symbol == ':':
-                    return token.Token(token.COLON, symbol, line, col)
-                #SEMICOLON
-                elif symbol == ';':
-                    return token.Token(token.SEMICOLON, symbol, line, col)
-                #COMMA
-                elif symbol == ',':
-                    return token.Token(token.COMMA, symbol, line, col)
-                #DOT
-                else:
-                    return token.Token(token.DOT, symbol, line, col)
-            #PAREN
-            else:
+                symbol=self.__peek()
+                while self.__peek() not in ";,=+-*/%<>()" and not (self.__peek().isspace()):
+                    self.__read()
+                    symbol = self.__peek()
+                s = self.__lexeme(start, self.column - col)
+                return number_token(s, line, col)
+            #LETTER    
+            elif symbol.isalpha():    
+                start = self.__tell()
                 self.__read()
-                if symbol == "(":
-                    return token.Token(token.LPAREN, symbol, line, col)
-                else:
-                    return token.Token(token.RPAREN, symbol, line, col)
-        #NUMBER            
-        elif symbol.isdigit():    
-            s += self.__read()
-            symbol=self.__peek()
-            decFlag = False
-            while self.__peek() not in ";,=+-*/%<>()" and not (self.__peek().isspace()):
-                s += self.__read()
-                symbol = self.__peek()
-            if len(s)==3 and s =="0.0":
-                return token.Token(token.FLOATVAL, s, line, col)
-            for i in range(0,len(s)):
-                if int(s[0]) == 0 :
-                    if len(s) > 1 and s[1].isdigit():
-                        raise error.MyPLError("unexpected symbol '" + s[1] + "'", line, col)
-                    elif len(s) == 1:
-                        return token.Token(token.INTVAL, s, line, col)
-                elif s[i].isalpha():
-                    raise error.MyPLError("unexpected symbol '" + s[i] + "'", line, col)
-                elif s[i] == ".":
-                    decFlag = True
-                    if i+1 == len(s):
-                        raise error.MyPLError("missing digit in float value ", line, col+i+1)
-                    elif s[len(s)-1] == 0 and s != "0.0":
-                        raise error.MyPLError("incorrect formatting '" + s + "'", line, col)
-            if decFlag == True:
-                return token.Token(token.FLOATVAL, s, line, col)
-            else:
-                return token.Token(token.INTVAL, s, line, col)
-        #LETTER    
-        elif symbol.isalpha():    
-            s+=self.__read()
-            symbol= self.__peek()
-            while symbol == "_" or symbol.isalpha() or symbol.isdigit():
-                s += self.__read()
                 symbol= self.__peek()
-            length = len(s)
-            if length == 2:
-                if s == 'do':
-                    return token.Token(token.DO, s, line, col)
-                elif s == 'or':
-                    return token.Token(token.OR, s, line, col)
-                elif s == 'if':
-                    return token.Token(token.IF, s, line, col)
-                else:
-                    return token.Token(token.ID, s, line, col)
-            elif length == 3:
-                if s == 'and':
-                    return token.Token(token.AND, s, line, col)
-                elif s == 'end':
-                    return token.Token(token.END, s, line, col)
-                elif s == 'fun':
-                    return token.Token(token.FUN, s, line, col)
-                elif s == 'int':
-                    return token.Token(token.INTTYPE, s, line, col)
-                elif s == 'new':
-                    return token.Token(token.NEW, s, line, col)
-                elif s == 'nil':
-                    return token.Token(token.NIL, s, line, col)
-                elif s == 'not':
-                    return token.Token(token.NOT, s, line, col)
-                elif s == 'set':
-                    return token.Token(token.SET, s, line, col)
-                elif s == 'var':
-                    return token.Token(token.VAR, s, line, col)
-                else:
-                    return token.Token(token.ID, s, line, col)
-            elif length == 4:
-                if s == 'then':
-                    return token.Token(token.THEN, s, line, col)
-                elif s == 'elif':
-                    return token.Token(token.ELIF, s, line, col)
-                elif s == 'else':
-                    return token.Token(token.ELSE, s, line, col)
-                elif s == 'bool':
-                    return token.Token(token.BOOLTYPE, s, line, col)
-                elif s == 'true':
-                    return token.Token(token.BOOLVAL, s, line, col)
-                elif s == 'plus':
-                    return token.Token(token.PLUS, s, line, col)
-                else:
-                    return token.Token(token.ID, s, line, col)
-            elif length == 5:
-                if s == 'false':
-                    return token.Token(token.BOOLVAL, s, line, col)
-                elif s == 'float':
-                    return token.Token(token.FLOATTYPE, s, line, col)
-                elif s == 'while':
-                    return token.Token(token.WHILE, s, line, col)
-                else:
-                    return token.Token(token.ID, s, line, col)
-            elif length == 6:
-                if s == 'return':
-                    return token.Token(token.RETURN, s, line, col)
-                elif s == 'string':
-                    return token.Token(token.STRINGTYPE, s, line, col)
-                elif s == 'struct':
-                    return token.Token(token.STRUCTTYPE, s, line, col)
+                while symbol == "_" or symbol.isalpha() or symbol.isdigit():
+                    self.__read()
+                    symbol= self.__peek()
+                s = self.symbols.intern(self.__lexeme(start, self.column - col))
+                length = len(s)
+                if length == 2:
+                    if s == 'do':
+                        return token.Token(token.DO, s, line, col)
+                    elif s == 'or':
+                        return token.Token(token.OR, s, line, col)
+                    elif s == 'if':
+                        return token.Token(token.IF, s, line, col)
+                    else:
+                        return token.Token(token.ID, s, line, col)
+                elif length == 3:
+                    if s == 'and':
+                        return token.Token(token.AND, s, line, col)
+                    elif s == 'end':
+                        return token.Token(token.END, s, line, col)
+                    elif s == 'fun':
+                        return token.Token(token.FUN, s, line, col)
+                    elif s == 'int':
+                        return token.Token(token.INTTYPE, s, line, col)
+                    elif s == 'new':
+                        return token.Token(token.NEW, s, line, col)
+                    elif s == 'nil':
+                        return token.Token(token.NIL, s, line, col)
+                    elif s == 'not':
+                        return token.Token(token.NOT, s, line, col)
+                    elif s == 'set':
+                        return token.Token(token.SET, s, line, col)
+                    elif s == 'var':
+                        return token.Token(token.VAR, s, line, col)
+                    else:
+                        return token.Token(token.ID, s, line, col)
+                elif length == 4:
+                    if s == 'then':
+                        return token.Token(token.THEN, s, line, col)
+                    elif s == 'elif':
+                        return token.Token(token.ELIF, s, line, col)
+                    elif s == 'else':
+                        return token.Token(token.ELSE, s, line, col)
+                    elif s == 'bool':
+                        return token.Token(token.BOOLTYPE, s, line, col)
+                    elif s == 'true':
+                        return token.Token(token.BOOLVAL, s, line, col)
+                    elif s == 'plus':
+                        return token.Token(token.PLUS, s, line, col)
+                    else:
+                        return token.Token(token.ID, s, line, col)
+                elif length == 5:
+                    if s == 'false':
+                        return token.Token(token.BOOLVAL, s, line, col)
+                    elif s == 'float':
+                        return token.Token(token.FLOATTYPE, s, line, col)
+                    elif s == 'while':
+                        return token.Token(token.WHILE, s, line, col)
+                    else:
+                        return token.Token(token.ID, s, line, col)
+                elif length == 6:
+                    if s == 'return':
+                        return token.Token(token.RETURN, s, line, col)
+                    elif s == 'string':
+                        return token.Token(token.STRINGTYPE, s, line, col)
+                    elif s == 'struct':
+                        return token.Token(token.STRUCTTYPE, s, line, col)
+                    else:
+                        return token.Token(token.ID, s, line, col)
                 else:
                     return token.Token(token.ID, s, line, col)
             else:
-                return token.Token(token.ID, s, line, col)
-        else:
-            raise error.MyPLError('unexpected symbol "' + symbol + '"', (
-                self.line), self.column)
-          
+                # consumed first, so a caller that carries on starts after it
+                line = self.line
+                col = self.column
+                self.__read()
+                raise error.MyPLError('unexpected symbol "' + symbol + '"', line, col)
+
+    def tokens(self):
+        '''Yields the tokens of the stream lazily, ending with the EOS token'''
+        next_token = self.next_token
+        while True:
+            tok = next_token()
+            yield tok
+            if tok.tokentype == token.EOS:
+                return
+
 #------------------HELPER FUNCTIONS-----------------
     def __isSecondEqual(self):
         '''if next read symbol is equal it adjust line and column then returns true
@@ -297,25 +328,327 @@ class Lexer(object):
             
     def __stringval(self, quote):
         ''' Creates a string to be returned as a token STRINGVAL '''
-        s = ""
         col = self.column
         line = self.line
         self.__read()
+        start = self.__tell()
         symbol = self.__peek()
         while symbol != quote:
-            s+= self.__read()
+            self.__read()
             if symbol == "\n":
                 raise error.MyPLError("reached newline reading string ", self.line, self.column)
             elif symbol == "":
                 raise error.MyPLError("no accompaining " + quote, self.line, self.column)
             symbol = self.__peek()
+        s = self.__lexeme(start, self.column - col - 1)
         self.__read()
         return token.Token(token.STRINGVAL, s, line, col)
     
+    def __tell(self):
+        '''Returns where the next character is, to pass to __lexeme'''
+        if self.buffer is not None:
+            return self.pos
+        return self.input_stream.tell()
+    
+    def __lexeme(self, start, length):
+        '''Returns the length characters read from start in one slice, 
+        rather than adding them up one at a time. Lexemes never span lines, 
+        so length is the number of columns read'''
+        if self.buffer is not None:
+            return self.buffer[start:start + length]
+        end = self.input_stream.tell()
+        self.input_stream.seek(start)
+        s = self.input_stream.read(length)
+        self.input_stream.seek(end)
+        return s
+    
     def __add_to_corr(self, symbol):
         '''Adjusts the self.column and self.line accordingly to the symbol'''
         if symbol == "\n":
             self.column = 1
             self.line += 1
         else:
-            self.column += 1         
\ No newline at end of file
+            self.column += 1
+
+
+
+class RegexLexer(object):
+    """A table-driven alternative to Lexer. Reads the whole source once and 
+    classifies each token with one compiled master pattern and a keyword 
+    table, producing exactly the same tokens and errors as Lexer"""
+
+    BLANK = re.compile(r'(?:\s+|#[^\n]*)+')
+    MASTER = re.compile(r"""
+        (?P<word>[A-Za-z][A-Za-z0-9_]*)
+      | (?P<number>[0-9][^;,=+\-*/%<>()\s]*)
+      | (?P<string>"[^"\n]*"|'[^'\n]*')
+      | (?P<sign>[=<>!]=?|[-%*+/:;,.()])
+    """, re.VERBOSE)
+    NUMBER_TAIL = re.compile(r'[^;,=+\-*/%<>()\s]*')
+    KEYWORDS = {
+        'and': token.AND, 'bool': token.BOOLTYPE, 'do': token.DO, 
+        'elif': token.ELIF, 'else': token.ELSE, 'end': token.END, 
+        'false': token.BOOLVAL, 'float': token.FLOATTYPE, 'fun': token.FUN, 
+        'if': token.IF, 'int': token.INTTYPE, 'new': token.NEW, 
+        'nil': token.NIL, 'not': token.NOT, 'or': token.OR, 
+        'plus': token.PLUS, 'return': token.RETURN, 'set': token.SET, 
+        'string': token.STRINGTYPE, 'struct': token.STRUCTTYPE, 
+        'then': token.THEN, 'true': token.BOOLVAL, 'var': token.VAR, 
+        'while': token.WHILE}
+    SIGNS = {
+        '=': token.ASSIGN, '==': token.EQUAL, '<': token.LESS_THAN, 
+        '<=': token.LESS_THAN_EQUAL, '>': token.GREATER_THAN, 
+        '>=': token.GREATER_THAN_EQUAL, '!=': token.NOT_EQUAL, 
+        '-': token.MINUS, '%': token.MODULO, '*': token.MULTIPLY, 
+        '+': token.PLUS, '/': token.DIVIDE, ':': token.COLON, 
+        ';': token.SEMICOLON, ',': token.COMMA, '.': token.DOT, 
+        '(': token.LPAREN, ')': token.RPAREN}
+    # signs that may not directly follow a comparison or assignment
+    FOLLOW_ERRORS = '=<>!-%*+/:;,.'
+
+    def __init__(self, input_stream, symbols=None):
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.reset(input_stream.read() if input_stream is not None else "")
+
+    def reset(self, text, pos=0, line=1, line_start=0):
+        '''Restarts scanning text at index pos, which lies on the given line 
+        whose first character is at index line_start'''
+        self.text = text
+        self.pos = pos                          # index of next char in text
+        self.line = line
+        self.line_start = line_start            # index of first char of line
+
+    def next_token(self):
+        text = self.text
+        pos = self.pos
+        #WHITESPACE, NEWLINES AND COMMENTS
+        m = self.BLANK.match(text, pos)
+        if m:
+            end = m.end()
+            newlines = text.count('\n', pos, end)
+            if newlines:
+                self.line += newlines
+                self.line_start = text.rfind('\n', pos, end) + 1
+            pos = self.pos = end
+        line = self.line
+        col = pos - self.line_start + 1
+        #EOS
+        if pos >= len(text):
+            if pos == 0 and line == 1:
+                return token.Token(token.EOS, "", 1, 0)
+            self.line += 1
+            return token.Token(token.EOS, "", self.line, 0)
+        m = self.MASTER.match(text, pos)
+        if m is None:
+            return self.__irregular(text[pos], line, col)
+        kind = m.lastgroup
+        s = m.group()
+        end = self.pos = m.end()
+        #ID AND KEYWORDS
+        if kind == 'word':
+            if end < len(text) and text[end] >= '\x80':
+                s = self.__word(s)
+            s = self.symbols.intern(s)
+            return token.Token(self.KEYWORDS.get(s, token.ID), s, line, col)
+        #NUMBER
+        elif kind == 'number':
+            return number_token(s, line, col)
+        #STRINGVAL
+        elif kind == 'string':
+            return token.Token(token.STRINGVAL, s[1:-1], line, col)
+        #SIGNS
+        tokentype = self.SIGNS.get(s)
+        follow = text[end:end + 1]
+        if s == '!':
+            raise error.MyPLError("unexpected symbol '" + follow + "'", line, col + 1)
+        elif s[0] in '=<>' and follow and follow in self.FOLLOW_ERRORS:
+            if s == '=':
+                raise error.MyPLError("unexpected symbol'" + follow + "'", line, col + 1)
+            raise error.MyPLError("unexpected symbol '" + follow + "'", line, col + len(s))
+        return token.Token(tokentype, s, line, col)
+
+    def tokens(self):
+        '''Yields the tokens of the stream lazily, ending with the EOS token'''
+        next_token = self.next_token
+        while True:
+            tok = next_token()
+            yield tok
+            if tok.tokentype == token.EOS:
+                return
+
+#------------------HELPER FUNCTIONS-----------------
+    def __irregular(self, symbol, line, col):
+        '''Handles the symbols the master pattern does not cover: unterminated 
+        strings and non-ASCII letters and digits'''
+        text = self.text
+        if symbol == "'" or symbol == '"':
+            newline = text.find('\n', self.pos)
+            if newline == -1:
+                self.pos = len(text)
+                raise error.MyPLError("no accompaining " + symbol, line, 
+                    len(text) - self.line_start + 2)
+            self.pos = self.line_start = newline + 1
+            self.line += 1
+            raise error.MyPLError("reached newline reading string ", self.line, 1)
+        elif symbol.isdigit():
+            end = self.NUMBER_TAIL.match(text, self.pos + 1).end()
+            s = text[self.pos:end]
+            self.pos = end
+            return number_token(s, line, col)
+        elif symbol.isalpha():
+            self.pos += 1
+            s = self.symbols.intern(self.__word(symbol))
+            return token.Token(self.KEYWORDS.get(s, token.ID), s, line, col)
+        # consumed first, so a caller that carries on starts after it
+        self.pos += 1
+        raise error.MyPLError('unexpected symbol "' + symbol + '"', line, col)
+
+    def __word(self, s):
+        '''Extends the identifier s with the (possibly non-ASCII) letters, digits 
+        and underscores that follow it'''
+        text = self.text
+        end = self.pos
+        while end < len(text) and (text[end] == "_" or text[end].isalpha() or text[end].isdigit()):
+            end += 1
+        s += text[self.pos:end]
+        self.pos = end
+        return s
+
+
+class PushLexer(RegexLexer):
+    """Lexes a source handed over in chunks instead of read from a stream. 
+    feed() takes the next chunk, str or bytes (decoded incrementally, with 
+    newlines translated as for a file opened in text mode), and returns the 
+    tokens completed by it; close() returns the rest, ending with EOS. A 
+    token is complete once a character follows it, since no token looks 
+    further ahead, so only the unfinished tail is kept and lexed again. The 
+    tokens, positions and errors are those RegexLexer gives for the whole 
+    source. An error is raised by the call after the one returning the 
+    tokens before it, and lexing may go on after it"""
+
+    # tokens the next character cannot change, complete even at the end
+    ENDS_COMPLETE = {token.STRINGVAL, token.NOT_EQUAL} | {tokentype for s, tokentype 
+        in RegexLexer.SIGNS.items() if s[0] not in '=<>!'}
+    WORD_END = re.compile(r'\w')
+
+    def __init__(self, encoding='utf-8', symbols=None):
+        RegexLexer.__init__(self, None, symbols)
+        self.encoding = encoding
+        self.decoder = None     # IncrementalNewlineDecoder, once bytes are fed
+        self.error = None       # MyPLError to raise on the next call
+        self.closed = False
+        self.finished = False   # EOS was returned
+
+    def feed(self, chunk):
+        '''Adds the next chunk of source and returns the tokens it completes'''
+        if self.closed:
+            raise ValueError('feed() after close()')
+        if isinstance(chunk, (bytes, bytearray)):
+            if self.decoder is None:
+                self.decoder = io.IncrementalNewlineDecoder(
+                    codecs.getincrementaldecoder(self.encoding)(), True)
+            chunk = self.decoder.decode(chunk)
+        self.__append(chunk)
+        return self.__drain(False)
+
+    def close(self):
+        '''Ends the source and returns the remaining tokens, ending with EOS. 
+        After an error, call it again for the tokens that follow'''
+        if self.finished:
+            return []
+        if not self.closed:
+            if self.decoder is not None:
+                self.__append(self.decoder.decode(b'', True))
+            self.closed = True
+        return self.__drain(True)
+
+#------------------HELPER FUNCTIONS-----------------
+    def __append(self, chunk):
+        '''Adds chunk to the unfinished tail, dropping what was lexed but 
+        the last character, so the text never looks empty from the start'''
+        cut = self.pos - 1
+        if cut > 0:
+            self.reset(self.text[cut:] + chunk, 1, self.line, self.line_start - cut)
+        else:
+            self.text += chunk
+
+    def __drain(self, final):
+        '''Returns the complete tokens of the text, stopping at EOS'''
+        if self.error is not None:
+            e, self.error = self.error, None
+            raise e
+        tokens = []
+        next_token = RegexLexer.next_token
+        while True:
+            state = (self.pos, self.line, self.line_start)
+            try:
+                tok = next_token(self)
+            except error.MyPLError as e:
+                if not final and self.pos >= len(self.text):
+                    self.reset(self.text, *state)
+                    return tokens
+                if not tokens:
+                    raise
+                self.error = e
+                return tokens
+            # the keyword plus is a PLUS too, but may still grow into a name
+            if not final and self.pos >= len(self.text) and (tok.tokentype == token.EOS 
+                    or tok.tokentype not in self.ENDS_COMPLETE or 
+                    self.WORD_END.match(self.text, self.pos - 1)):
+                self.reset(self.text, *state)
+                return tokens
+            tokens.append(tok)
+            if tok.tokentype == token.EOS:
+                self.finished = True
+                return tokens
+
+
+ENGINES = {'scan': Lexer, 'regex': RegexLexer}
+
+def make_lexer(input_stream, engine='scan', buffered=True, symbols=None):
+    '''Creates a lexer over input_stream using the named engine from ENGINES. 
+    buffered only applies to the scanning engine; the regex engine always 
+    reads the whole source. symbols is the SymbolTable to intern names in, 
+    a new one by default'''
+    if engine not in ENGINES:
+        raise ValueError('unknown lexer engine %r' % engine)
+    if engine == 'scan':
+        return Lexer(input_stream, buffered, symbols)
+    return ENGINES[engine](input_stream, symbols)
+
+def lex_chunks(chunks, encoding='utf-8', symbols=None):
+    '''Yields the tokens of a source arriving as an iterable of str or bytes 
+    chunks, e.g. reads from a socket or a queue, each as soon as it is 
+    complete. Wrap it in a TokenList to parse it'''
+    push_lexer = PushLexer(encoding, symbols)
+    for chunk in chunks:
+        for tok in push_lexer.feed(chunk):
+            yield tok
+    for tok in push_lexer.close():
+        yield tok
+
+def number_token(s, line, col):
+    '''Checks the formatting of the number lexeme s starting at line and col and 
+    returns it as an INTVAL or FLOATVAL token. Shared by every lexer engine so 
+    they all accept the same numbers and report the same errors'''
+    decFlag = False
+    if len(s)==3 and s =="0.0":
+        return token.Token(token.FLOATVAL, s, line, col)
+    for i in range(0,len(s)):
+        if int(s[0]) == 0 :
+            if len(s) > 1 and s[1].isdigit():
+                raise error.MyPLError("unexpected symbol '" + s[1] + "'", line, col)
+            elif len(s) == 1:
+                return token.Token(token.INTVAL, s, line, col)
+        elif s[i].isalpha():
+            raise error.MyPLError("unexpected symbol '" + s[i] + "'", line, col)
+        elif s[i] == ".":
+            decFlag = True
+            if i+1 == len(s):
+                raise error.MyPLError("missing digit in float value ", line, col+i+1)
+            elif s[len(s)-1] == 0 and s != "0.0":
+                raise error.MyPLError("incorrect formatting '" + s + "'", line, col)
+    if decFlag == True:
+        return token.Token(token.FLOATVAL, s, line, col)
+    else:
+        return token.Token(token.INTVAL, s, line, col)
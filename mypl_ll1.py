@@ -0,0 +1,649 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   A table-driven LL(1) parser. The table is built from the grammar
+#   of the recursive descent Parser, as written in its docstrings, and 
+#   the parse runs on an explicit stack, so nesting costs no recursion
+#----------------------------------------------------------------------
+import collections
+import functools
+import re
+
+import mypl_ast as ast
+import mypl_error as error
+import mypl_parser as parser
+import mypl_token as token
+
+START = 'stmts'
+EPSILON = 'e'
+# terminals named differently in the grammar than in mypl_token
+ALIASES = {'STRUCT': 'STRUCTTYPE'}
+SYMBOL = re.compile(r'\s*(?:<(\w+)>|([A-Z][A-Z_]*)|(\)\*|[()|])|(e)\b)')
+
+# the grammar of the recursive descent Parser, as written in the
+# docstrings of its methods; kept here as data so it is there under
+# python -OO, which strips docstrings (tests check the two agree)
+GRAMMAR = (
+    '<stmts> ::= <stmt> <stmts> | e',
+    '<bstmts> ::= <bstmt> <bstmts> | e',
+    '<stmt> ::= <sdecl> | <fdecl> | <bstmt>',
+    '<bstmt> ::= <vdecl> | <assign> | <cond> | <while> | <expr> SEMICOLON | <exit>',
+    '<sdecl> ::= STRUCT ID <vdecls> END',
+    '<vdecls> ::= <vdecl> <vdecls> | e',
+    '<fdecl> ::= FUN ( <type> | NIL ) ID LPAREN <params> RPAREN <bstmts> END',
+    '<params> ::= ID COLON <type> ( COMMA ID COLON <type>)* | e',
+    '<type> ::= ID | INTTYPE | FLOATTYPE | BOOLTYPE | STRINGTYPE',
+    '<exit> ::= RETURN ( <expr> | e ) SEMICOLON',
+    '<vdecl> ::= VAR ID <tdecl> ASSIGN <expr> SEMICOLON',
+    '<tdecl> ::= COLON <type> | e',
+    '<assign> ::= SET <lvalue> ASSIGN <expr> SEMICOLON',
+    '<lvalue> ::= ID ( DOT ID )*',
+    '<cond> ::= IF <bexpr> THEN <bstmts> <condt> END',
+    '<condt> ::= ELIF <bexpr> THEN <bstmts> <condt> | ELSE <bstmts> | e',
+    '<while> ::= WHILE <bexpr> DO <bstmts> END',
+    '<expr> ::= ( <rvalue> | LPAREN <expr> RPAREN ) ( <mathrel> <expr> | e )',
+    '<mathrel> ::= PLUS | MINUS | DIVIDE | MULTIPLY | MODULO',
+    '<rvalue> ::= STRINGVAL | INTVAL | BOOLVAL | FLOATVAL | NIL | NEW ID | <idrval>',
+    '<idrval> ::= ID ( DOT ID )* | ID LPAREN <exprlist> RPAREN',
+    '<exprlist> ::= <expr> ( COMMA <expr> )* | e',
+    '<bexpr> ::= <expr> <bexprt> | NOT <bexpr> <bexprt> | '
+        'LPAREN <bexpr> RPAREN <bconnct>',
+    '<bexprt> ::= <boolrel> <expr> <bconnct> | <bconnct>',
+    '<bconnct> ::= AND <bexpr> | OR <bexpr> | e',
+    '<boolrel> ::= EQUAL | LESS_THAN | GREATER_THAN | LESS_THAN_EQUAL | '
+        'GREATER_THAN_EQUAL | NOT_EQUAL',
+)
+
+# what a production leaves on the value stack when it is reduced
+RULE = 0        # the value built by the LL1Parser method for its nonterminal
+GROUP = 1       # a tuple of the values of its symbols
+REPEAT = 2      # a deque of tuples, one per repetition
+REPEAT_END = 3  # the empty deque that ends a repetition
+
+class GrammarError(Exception):
+    """The grammar cannot be read or is not LL(1)"""
+    pass
+
+
+class Production(object):
+    """One alternative of a nonterminal. push holds the right side
+    reversed, ready to go on the parse stack. A left-factored production
+    ends with a nonterminal holding the rest of the alternatives it
+    replaces, whose values are spliced back in when it is reduced, so the
+    value built is the same as before factoring"""
+    __slots__ = ('lhs', 'rhs', 'kind', 'factored', 'size', 'push')
+
+    def __init__(self, lhs, rhs, kind, factored=False):
+        self.lhs = lhs
+        self.rhs = tuple(rhs)
+        self.kind = kind
+        self.factored = factored
+        self.size = len(self.rhs)
+        self.push = tuple(reversed(self.rhs))
+
+    def __str__(self):
+        return '<%s> ::= %s' % (self.lhs, ' '.join(symbol_name(symbol) for symbol in
+            self.rhs) or EPSILON)
+
+
+class Group(object):
+    """A parenthesized part of a grammar rule, possibly repeated"""
+
+    def __init__(self, alternatives, repeated):
+        self.alternatives = alternatives
+        self.repeated = repeated
+
+
+class Grammar(object):
+    """The BNF productions of the grammar with its LL(1) table.
+    Groups and repetitions become new nonterminals named after the rule
+    they appear in (expr_1, expr_2, ...), and alternatives that start the
+    same way are left-factored. Where two productions could be picked,
+    one that comes from FIRST beats one that comes from FOLLOW (an inner
+    'and' belongs to the innermost condition) and one that starts with
+    the token itself beats one that only derives it (a condition starting
+    with '(' is parenthesized), as in Parser; each such choice is kept in
+    conflicts"""
+
+    def __init__(self, rules, start=START):
+        self.start = start
+        self.rules = list(rules)                    # nonterminals that have actions
+        self.productions = collections.OrderedDict()  # nonterminal -> [Production]
+        self.origin = {}                            # nonterminal -> rule it came from
+        self.counts = collections.Counter()
+        for name, alternatives in rules.items():
+            self.origin[name] = name
+            self.productions[name] = [Production(name, self.__expand(name, alternative),
+                RULE) for alternative in alternatives]
+        for name in list(self.productions):
+            self.__left_factor(name)
+        self.nullable = set()
+        self.first = {}
+        self.follow = {}
+        self.__first_sets()
+        self.__follow_sets()
+        self.conflicts = []                         # (nonterminal, token type, chosen)
+        self.table = {}                             # nonterminal -> {token type: Production}
+        self.empty = {}                             # nonterminal -> its empty production
+        self.__build_table()
+
+    def __new_nonterminal(self, name):
+        root = self.origin[name]
+        self.counts[root] += 1
+        new_name = '%s_%i' % (root, self.counts[root])
+        self.origin[new_name] = root
+        return new_name
+
+    def __expand(self, name, items):
+        '''Returns items with every Group replaced by a new nonterminal'''
+        symbols = []
+        for item in items:
+            if not isinstance(item, Group):
+                symbols.append(item)
+                continue
+            new_name = self.__new_nonterminal(name)
+            productions = []
+            for alternative in item.alternatives:
+                rhs = self.__expand(new_name, alternative)
+                if item.repeated:
+                    productions.append(Production(new_name, rhs + [new_name], REPEAT))
+                else:
+                    productions.append(Production(new_name, rhs, GROUP))
+            if item.repeated:
+                productions.append(Production(new_name, [], REPEAT_END))
+            self.productions[new_name] = productions
+            symbols.append(new_name)
+        return symbols
+
+    def __left_factor(self, name):
+        '''Replaces alternatives of name that share a first symbol by one
+        production that ends in a new nonterminal for their remainders'''
+        pending = [name]
+        while pending:
+            name = pending.pop()
+            by_first = collections.OrderedDict()
+            for production in self.productions[name]:
+                key = production.rhs[0] if production.rhs else None
+                by_first.setdefault(key, []).append(production)
+            productions = []
+            for key, shared in by_first.items():
+                if key is None or len(shared) == 1:
+                    productions.extend(shared)
+                    continue
+                prefix = common_prefix([production.rhs for production in shared])
+                new_name = self.__new_nonterminal(name)
+                self.productions[new_name] = [Production(new_name,
+                    production.rhs[len(prefix):], GROUP) for production in shared]
+                kind = shared[0].kind
+                if any(production.kind != kind for production in shared):
+                    raise GrammarError('cannot left-factor <%s>' % name)
+                productions.append(Production(name, prefix + (new_name,), kind, True))
+                pending.append(new_name)
+            self.productions[name] = productions
+
+    def __first_of(self, symbols):
+        '''Returns FIRST of a sequence of symbols and whether it is nullable'''
+        first = set()
+        for symbol in symbols:
+            if isinstance(symbol, token.TokenType):
+                first.add(symbol)
+                return first, False
+            first |= self.first[symbol]
+            if symbol not in self.nullable:
+                return first, False
+        return first, True
+
+    def __first_sets(self):
+        for name in self.productions:
+            self.first[name] = set()
+        changed = True
+        while changed:
+            changed = False
+            for name, productions in self.productions.items():
+                for production in productions:
+                    first, nullable = self.__first_of(production.rhs)
+                    if not first <= self.first[name]:
+                        self.first[name] |= first
+                        changed = True
+                    if nullable and name not in self.nullable:
+                        self.nullable.add(name)
+                        changed = True
+
+    def __follow_sets(self):
+        for name in self.productions:
+            self.follow[name] = set()
+        self.follow[self.start].add(token.EOS)
+        changed = True
+        while changed:
+            changed = False
+            for name, productions in self.productions.items():
+                for production in productions:
+                    for i, symbol in enumerate(production.rhs):
+                        if isinstance(symbol, token.TokenType):
+                            continue
+                        follow, nullable = self.__first_of(production.rhs[i + 1:])
+                        if nullable:
+                            follow = follow | self.follow[name]
+                        if not follow <= self.follow[symbol]:
+                            self.follow[symbol] |= follow
+                            changed = True
+
+    def __build_table(self):
+        for name, productions in self.productions.items():
+            row = {}
+            from_first = {}
+            for production in productions:
+                first, nullable = self.__first_of(production.rhs)
+                for tokentype in first:
+                    self.__add(name, row, from_first, tokentype, production, True)
+                if nullable:
+                    self.empty.setdefault(name, production)
+                    for tokentype in self.follow[name]:
+                        self.__add(name, row, from_first, tokentype, production, False)
+            self.table[name] = row
+
+    def __add(self, name, row, from_first, tokentype, production, first):
+        chosen = row.get(tokentype)
+        if chosen is None:
+            row[tokentype] = production
+            from_first[tokentype] = first
+            return
+        if chosen is production:
+            return
+        if first != from_first[tokentype]:
+            if first:
+                row[tokentype] = production
+                from_first[tokentype] = True
+        elif first and (chosen.rhs[0] == tokentype) != (production.rhs[0] == tokentype):
+            if production.rhs[0] == tokentype:
+                row[tokentype] = production
+        else:
+            raise GrammarError('<%s> is not LL(1) on %s: %s or %s' % (name, tokentype,
+                chosen, production))
+        self.conflicts.append((name, tokentype, row[tokentype]))
+
+
+class Chain(object):
+    """The operands and operators of an expression, gathered right to left
+    until the whole chain is known and it can be made into a tree"""
+    __slots__ = ('operands', 'math_rels')
+
+    def __init__(self):
+        self.operands = collections.deque()
+        self.math_rels = collections.deque()
+
+
+class LL1Parser(object):
+    """Parses with the table of GRAMMAR, building the same AST as Parser.
+    Each rule has a build_ method that gets the values of the symbols of
+    the alternative that matched: a Token for a terminal, the built value
+    for a nonterminal, a tuple for a group and a deque of tuples for a
+    repetition"""
+
+    def __init__(self, lexer, precedence=False):
+        self.lexer = lexer
+        self.precedence = precedence
+        self.grammar = grammar()
+        self.actions = {}
+        for name in self.grammar.rules:
+            if not hasattr(self, 'build_' + name):
+                raise GrammarError('no build_%s for <%s>' % (name, name))
+            self.actions[name] = getattr(self, 'build_' + name)
+        if hasattr(lexer, 'tokens'):
+            self.tokens = lexer.tokens()
+        else:
+            self.tokens = iter(lexer.next_token, None)
+
+    def parse(self):
+        """succeeds if program is syntactically well-formed"""
+        table = self.grammar.table
+        actions = self.actions
+        stack = [token.EOS, self.grammar.start]
+        values = []
+        current_token = next(self.tokens)
+        while stack:
+            top = stack.pop()
+            if top.__class__ is str:
+                production = table[top].get(current_token.tokentype)
+                if production is None:
+                    # an unexpected token after something that may be empty is
+                    # reported by whatever has to come next, as Parser does
+                    production = self.grammar.empty.get(top)
+                    if production is None:
+                        self.__error('expecting <%s>' % self.grammar.origin[top], 
+                            current_token)
+                stack.append(production)
+                stack.extend(production.push)
+            elif top.__class__ is Production:
+                if top.size:
+                    children = values[-top.size:]
+                    del values[-top.size:]
+                else:
+                    children = []
+                if top.factored:
+                    children[-1:] = children[-1]
+                kind = top.kind
+                if kind == RULE:
+                    value = actions[top.lhs](children)
+                elif kind == GROUP:
+                    value = tuple(children)
+                elif kind == REPEAT:
+                    value = children.pop()
+                    value.appendleft(tuple(children))
+                else:
+                    value = collections.deque()
+                values.append(value)
+            elif top == current_token.tokentype:
+                values.append(current_token)
+                if top == token.EOS:
+                    break
+                current_token = next(self.tokens)
+            elif top == token.EOS:
+                self.__error('expecting end of file', current_token)
+            else:
+                self.__error("expecting '%s'" % top, current_token)
+        return self.__stmt_list(values[0])
+
+    def __error(self, error_msg, current_token):
+        s = error_msg + ', found "' + current_token.lexeme + '" in parser'
+        raise error.MyPLError(s, current_token.line, current_token.column)
+
+    #------------------HELPER FUNCTIONS-----------------
+
+    def __tree(self, chain):
+        '''Links a Chain as Parser would'''
+        if self.precedence:
+            return parser.precedence_tree(list(chain.operands), list(chain.math_rels))
+        return parser.chain_tree(list(chain.operands), list(chain.math_rels))
+
+    def __stmt_list(self, stmts):
+        stmt_list = ast.StmtList()
+        stmt_list.stmts = list(stmts)
+        return stmt_list
+
+    def __prepend(self, children):
+        '''<x> ::= <y> <x> | e, gathering the <y>s in a deque'''
+        if not children:
+            return collections.deque()
+        children[1].appendleft(children[0])
+        return children[1]
+
+    #------------------STATEMENTS-----------------
+
+    def build_stmts(self, children):
+        return self.__prepend(children)
+
+    def build_bstmts(self, children):
+        return self.__prepend(children)
+
+    def build_stmt(self, children):
+        return children[0]
+
+    def build_bstmt(self, children):
+        if len(children) == 2:
+            expr_stmt = ast.ExprStmt()
+            expr_stmt.expr = self.__tree(children[0])
+            return expr_stmt
+        return children[0]
+
+    def build_sdecl(self, children):
+        struct_decl_stmt = ast.StructDeclStmt()
+        struct_decl_stmt.struct_id = children[1]
+        struct_decl_stmt.var_decls = list(children[2])
+        return struct_decl_stmt
+
+    def build_vdecls(self, children):
+        return self.__prepend(children)
+
+    def build_fdecl(self, children):
+        fun_decl_stmt = ast.FunDeclStmt()
+        fun_decl_stmt.return_type = children[1][0]
+        fun_decl_stmt.fun_name = children[2]
+        fun_decl_stmt.params = children[4]
+        fun_decl_stmt.stmt_list = self.__stmt_list(children[6])
+        return fun_decl_stmt
+
+    def build_params(self, children):
+        fun_param_list = []
+        if children:
+            names = [(children[0], children[2])]
+            names.extend((param_name, param_type) for comma, param_name, colon, param_type
+                in children[3])
+            for param_name, param_type in names:
+                fun_param = ast.FunParam()
+                fun_param.param_name = param_name
+                fun_param.param_type = param_type
+                fun_param_list.append(fun_param)
+        return fun_param_list
+
+    def build_type(self, children):
+        return children[0]
+
+    def build_exit(self, children):
+        return_stmt = ast.ReturnStmt()
+        return_stmt.return_token = children[0]
+        if children[1]:
+            return_stmt.return_expr = self.__tree(children[1][0])
+        return return_stmt
+
+    def build_vdecl(self, children):
+        var_decl_stmt = ast.VarDeclStmt()
+        var_decl_stmt.var_id = children[1]
+        var_decl_stmt.var_type = children[2]
+        var_decl_stmt.var_expr = self.__tree(children[4])
+        return var_decl_stmt
+
+    def build_tdecl(self, children):
+        if children:
+            return children[1]
+
+    def build_assign(self, children):
+        assign_stmt = ast.AssignStmt()
+        assign_stmt.lhs = children[1]
+        assign_stmt.rhs = self.__tree(children[3])
+        return assign_stmt
+
+    def build_lvalue(self, children):
+        lvalue = ast.LValue()
+        lvalue.path.append(children[0])
+        lvalue.path.extend(id_token for dot, id_token in children[1])
+        return lvalue
+
+    def build_cond(self, children):
+        basic_if = ast.BasicIf()
+        basic_if.bool_expr = children[1]
+        basic_if.stmt_list = self.__stmt_list(children[3])
+        if_stmt = ast.IfStmt()
+        if_stmt.if_part = basic_if
+        elseifs, else_stmts = children[4]
+        if_stmt.elseifs = list(elseifs)
+        if else_stmts is not None:
+            if_stmt.has_else = True
+            if_stmt.else_stmts = self.__stmt_list(else_stmts)
+        return if_stmt
+
+    def build_condt(self, children):
+        '''Returns the elifs as a deque of BasicIfs and the else statements'''
+        if len(children) == 5:
+            basic_if = ast.BasicIf()
+            basic_if.bool_expr = children[1]
+            basic_if.stmt_list = self.__stmt_list(children[3])
+            elseifs, else_stmts = children[4]
+            elseifs.appendleft(basic_if)
+            return elseifs, else_stmts
+        if children:
+            return collections.deque(), children[1]
+        return collections.deque(), None
+
+    def build_while(self, children):
+        while_stmt = ast.WhileStmt()
+        while_stmt.bool_expr = children[1]
+        while_stmt.stmt_list = self.__stmt_list(children[3])
+        return while_stmt
+
+    #------------------EXPRESSIONS-----------------
+
+    def build_expr(self, children):
+        '''Returns a Chain, made into a tree where the expression is used'''
+        operand, rest = children
+        if len(operand) == 1:
+            operand = operand[0]
+        else:
+            operand = self.__tree(operand[1])
+        if rest:
+            chain = rest[1]
+            chain.math_rels.appendleft(rest[0])
+        else:
+            chain = Chain()
+        chain.operands.appendleft(operand)
+        return chain
+
+    def build_mathrel(self, children):
+        return children[0]
+
+    def build_rvalue(self, children):
+        if len(children) == 2:
+            new_rvalue = ast.NewRValue()
+            new_rvalue.struct_type = children[1]
+            return new_rvalue
+        if isinstance(children[0], token.Token):
+            simple_rvalue = ast.SimpleRValue()
+            simple_rvalue.val = children[0]
+            return simple_rvalue
+        return children[0]
+
+    def build_idrval(self, children):
+        if len(children) == 4:
+            call_rvalue = ast.CallRValue()
+            call_rvalue.fun = children[0]
+            call_rvalue.args = children[2]
+            return call_rvalue
+        if children[1]:
+            id_rvalue = ast.IDRvalue()
+            id_rvalue.path.append(children[0])
+            id_rvalue.path.extend(id_token for dot, id_token in children[1])
+            return id_rvalue
+        simple_rvalue = ast.SimpleRValue()
+        simple_rvalue.val = children[0]
+        return simple_rvalue
+
+    def build_exprlist(self, children):
+        exprlist = []
+        if children:
+            exprlist.append(self.__tree(children[0]))
+            exprlist.extend(self.__tree(chain) for comma, chain in children[1])
+        return exprlist
+
+    def build_bexpr(self, children):
+        bool_expr = ast.BoolExpr()
+        if len(children) == 2:
+            bool_expr.first_expr = self.__tree(children[0])
+            rest = children[1]
+        elif len(children) == 3:
+            bool_expr.negated = True
+            bool_expr.first_expr = children[1]
+            rest = children[2]
+        else:
+            bool_expr.first_expr = children[1]
+            rest = (None, None) + children[3]
+        (bool_expr.bool_rel, bool_expr.second_expr, bool_expr.bool_connector,
+            bool_expr.rest) = rest
+        return bool_expr
+
+    def build_bexprt(self, children):
+        '''Returns the relation, second expression, connector and rest'''
+        if len(children) == 3:
+            return (children[0], self.__tree(children[1])) + children[2]
+        return (None, None) + children[0]
+
+    def build_bconnct(self, children):
+        '''Returns the connector and the rest'''
+        if children:
+            return tuple(children)
+        return None, None
+
+    def build_boolrel(self, children):
+        return children[0]
+
+
+#------------------READING THE GRAMMAR-----------------
+
+@functools.lru_cache(maxsize=None)
+def grammar():
+    '''Returns the Grammar of the rules in GRAMMAR'''
+    return Grammar(read_rules(GRAMMAR))
+
+def docstring_rules(cls=parser.Parser):
+    '''Returns the rules written as "<name> ::= ..." in the method
+    docstrings of cls, in order, with their spacing normalized'''
+    return tuple(' '.join(value.__doc__.split()) for value in vars(cls).values()
+        if callable(value) and value.__doc__ and '::=' in value.__doc__)
+
+def read_rules(texts):
+    '''Returns the rules "<name> ::= ..." in texts, in order, each as a list
+    of alternatives'''
+    rules = collections.OrderedDict()
+    for text in texts:
+        lhs, rhs = text.split('::=', 1)
+        name = lhs.strip().strip('<>')
+        items = tokenize(rhs)
+        alternatives, i = read_alternatives(items, 0)
+        if i != len(items):
+            raise GrammarError('unbalanced ")" in <%s>' % name)
+        rules[name] = alternatives
+    return rules
+
+def tokenize(text):
+    items = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = SYMBOL.match(text, pos)
+        if match is None:
+            raise GrammarError('cannot read grammar at %r' % text[pos:])
+        nonterminal, terminal, punctuation, epsilon = match.groups()
+        if nonterminal:
+            items.append(nonterminal)
+        elif terminal:
+            terminal = ALIASES.get(terminal, terminal)
+            if not hasattr(token.TokenType, terminal):
+                raise GrammarError('unknown token %s' % terminal)
+            items.append(getattr(token.TokenType, terminal))
+        elif punctuation:
+            items.append(punctuation)
+        pos = match.end()
+    return items
+
+def read_alternatives(items, i):
+    '''Reads alternatives from items[i:] up to an unmatched ")" or ")*"
+    and returns them with the index where reading stopped'''
+    alternatives = [[]]
+    while i < len(items):
+        item = items[i]
+        if item == '|':
+            alternatives.append([])
+        elif item == '(':
+            inner, i = read_alternatives(items, i + 1)
+            if i == len(items):
+                raise GrammarError('unbalanced "("')
+            alternatives[-1].append(Group(inner, items[i] == ')*'))
+        elif item in (')', ')*'):
+            return alternatives, i
+        else:
+            alternatives[-1].append(item)
+        i += 1
+    return alternatives, i
+
+def common_prefix(sequences):
+    prefix = []
+    for symbols in zip(*sequences):
+        if any(symbol != symbols[0] for symbol in symbols):
+            break
+        prefix.append(symbols[0])
+    return tuple(prefix)
+
+def symbol_name(symbol):
+    if isinstance(symbol, token.TokenType):
+        return str(symbol)
+    return '<%s>' % symbol
@@ -0,0 +1,469 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Optimization passes over the MyPL AST: constant folding and
+#   algebraic simplification, removal of unreachable branches and
+#   common subexpression elimination. The result stays printable
+#----------------------------------------------------------------------
+import re
+
+import mypl_ast as ast
+import mypl_error as error
+import mypl_runtime as runtime
+import mypl_token as token
+import mypl_type_checker as type_checker
+
+NOT_CONSTANT = object()
+
+# float literals the lexer reads back to the same value
+FLOAT_LITERAL = re.compile(r'\d+\.\d+')
+
+class ConstantFolder(ast.Walker):
+    """Folds arithmetic and comparisons over literals, drops additions of 0
+    and multiplications by 1 of operands the type checker found numeric,
+    and simplifies BoolExprs with constant parts. A node is folded in its
+    leave_ hook, after its children; one that is replaced is mapped to its
+    replacement in self.replaced until its parent takes it"""
+
+    def __init__(self):
+        self.replaced = {}      # id(node) -> node replacing it
+
+    def run(self, stmt_list):
+        ast.walk(stmt_list, self)
+
+    def leave_expr_stmt(self, expr_stmt):
+        expr_stmt.expr = self.__folded(expr_stmt.expr)
+
+    def leave_var_decl_stmt(self, var_decl):
+        var_decl.var_expr = self.__folded(var_decl.var_expr)
+
+    def visit_assign_stmt(self, assign_stmt):
+        return [assign_stmt.rhs]
+
+    def leave_assign_stmt(self, assign_stmt):
+        assign_stmt.rhs = self.__folded(assign_stmt.rhs)
+
+    def leave_return_stmt(self, return_stmt):
+        return_stmt.return_expr = self.__folded(return_stmt.return_expr)
+
+    def leave_while_stmt(self, while_stmt):
+        while_stmt.bool_expr = self.__folded(while_stmt.bool_expr)
+
+    def leave_basic_if(self, basic_if):
+        basic_if.bool_expr = self.__folded(basic_if.bool_expr)
+
+    def leave_simple_expr(self, simple_expr):
+        term = self.__folded(simple_expr.term)
+        if isinstance(term, ast.Expr):
+            # parentheses around a whole expression are not printed anyway
+            self.replaced[id(simple_expr)] = term
+        else:
+            simple_expr.term = term
+
+    def leave_complex_expr(self, complex_expr):
+        first = self.__folded(complex_expr.first_operand)
+        if isinstance(first, ast.SimpleExpr):
+            first = first.term
+        rest = self.__folded(complex_expr.rest)
+        complex_expr.first_operand = first
+        complex_expr.rest = rest
+        op = complex_expr.math_rel
+        a = constant_value(first)
+        b = constant_value(rest)
+        if a is not NOT_CONSTANT and b is not NOT_CONSTANT:
+            if type(a) is type(b) and type(a) is not bool:
+                try:
+                    value = runtime.MATH[op.tokentype](a, b)
+                except runtime.FAULTS:
+                    return
+                tok = literal_token(value, op)
+                if tok is not None:
+                    self.replaced[id(complex_expr)] = simple_expr(tok)
+        elif complex_expr.type not in type_checker.NUMERIC:
+            # x + 0 is not x when x may be a string, or unchecked
+            return
+        elif is_identity(op.tokentype, b, right=True):
+            self.replaced[id(complex_expr)] = as_expr(first)
+        elif is_identity(op.tokentype, a, right=False):
+            self.replaced[id(complex_expr)] = rest
+
+    def leave_bool_expr(self, bool_expr):
+        bool_expr.first_expr = self.__folded(bool_expr.first_expr)
+        value = constant_value(bool_expr.first_expr)
+        if bool_expr.bool_rel is not None:
+            bool_expr.second_expr = self.__folded(bool_expr.second_expr)
+            second = constant_value(bool_expr.second_expr)
+            value = compare(bool_expr.bool_rel, value, second)
+        if bool_expr.negated and type(value) is bool:
+            value = not value
+        elif bool_expr.negated:
+            value = NOT_CONSTANT
+        if bool_expr.bool_connector is not None:
+            rest = self.__folded(bool_expr.rest)
+            bool_expr.rest = rest
+            connector = bool_expr.bool_connector
+            if type(value) is bool:
+                # the value of the connector is decided, or is that of rest
+                if value == (connector.tokentype == token.AND):
+                    self.replaced[id(bool_expr)] = rest
+                else:
+                    self.replaced[id(bool_expr)] = bool_constant_expr(value, connector)
+                return
+            if constant_value(rest) is (connector.tokentype == token.AND):
+                bool_expr.bool_connector = None
+                bool_expr.rest = None
+        if bool_expr.bool_connector is None and type(value) is bool:
+            self.replaced[id(bool_expr)] = bool_constant_expr(value,
+                ast.first_token(bool_expr.first_expr))
+
+    def leave_call_rvalue(self, call_rvalue):
+        call_rvalue.args = [self.__folded(arg) for arg in call_rvalue.args]
+
+    def __folded(self, node):
+        '''Returns the node replacing a child that was just walked'''
+        return self.replaced.pop(id(node), node)
+
+
+class BranchPruner(ast.Walker):
+    """Removes while loops and if branches whose condition is the constant
+    false, and the branches after one whose condition is the constant true.
+    A branch left as the only one that always runs is spliced into the
+    enclosing list, unless it declares variables of its own"""
+
+    def run(self, stmt_list):
+        ast.walk(stmt_list, self)
+
+    def visit_stmt_list(self, stmt_list):
+        stmts = []
+        pending = stmt_list.stmts[::-1]     # statements to look at, last first
+        while pending:
+            stmt = pending.pop()
+            if isinstance(stmt, ast.WhileStmt):
+                if bool_constant(stmt.bool_expr) is False:
+                    continue
+            elif isinstance(stmt, ast.IfStmt):
+                replacement = self.__prune_if(stmt)
+                if replacement is not stmt:
+                    # spliced statements are pruned as part of this list
+                    pending.extend(reversed(replacement))
+                    continue
+            stmts.append(stmt)
+        stmt_list.stmts = stmts
+        return [nested for stmt in stmts for nested in nested_lists(stmt)]
+
+    def __prune_if(self, if_stmt):
+        '''Returns if_stmt with its dead branches removed, or the list of
+        statements replacing it'''
+        branches = []
+        else_stmts = if_stmt.else_stmts if if_stmt.has_else else None
+        for basic_if in [if_stmt.if_part] + if_stmt.elseifs:
+            value = bool_constant(basic_if.bool_expr)
+            if value is True:
+                else_stmts = basic_if.stmt_list
+                break
+            elif value is not False:
+                branches.append(basic_if)
+        if branches:
+            if_stmt.if_part = branches[0]
+            if_stmt.elseifs = branches[1:]
+            if_stmt.has_else = else_stmts is not None
+            if_stmt.else_stmts = else_stmts
+            return if_stmt
+        if else_stmts is None:
+            return []
+        if not any(isinstance(stmt, ast.VarDeclStmt) for stmt in else_stmts.stmts):
+            return else_stmts.stmts
+        # keep the block for its scope
+        basic_if = ast.BasicIf()
+        basic_if.bool_expr = bool_constant_expr(True,
+            ast.first_token(if_stmt.if_part.bool_expr))
+        basic_if.stmt_list = else_stmts
+        if_stmt.if_part = basic_if
+        if_stmt.elseifs = []
+        if_stmt.has_else = False
+        if_stmt.else_stmts = None
+        return if_stmt
+
+
+class CommonSubexprEliminator(ast.Walker):
+    """Computes an arithmetic subexpression repeated within one statement
+    only once, in a new variable declared just before the statement. Only
+    subexpressions of literals and plain variables are shared, since a call
+    in the statement cannot change those, and only when that saves nodes.
+    Ahead of a call only checked numeric ones that cannot fault are moved,
+    so a call's side effects still come before an error. Conditions are
+    left alone as they may be evaluated many times"""
+
+    def __init__(self):
+        self.names = set()      # identifiers already used in the program
+        self.count = 0
+
+    def run(self, stmt_list):
+        self.names = identifiers(stmt_list)
+        ast.walk(stmt_list, self)
+
+    def visit_stmt_list(self, stmt_list):
+        # a statement's nested lists are done before the statement is
+        stmts = []
+        plan = []
+        for stmt in stmt_list.stmts:
+            plan.extend(nested_lists(stmt))
+            plan.append((self.__eliminate, (stmt, stmts)))
+        plan.append((self.__set_stmts, (stmt_list, stmts)))
+        return plan
+
+    def __set_stmts(self, list_stmts):
+        stmt_list, stmts = list_stmts
+        stmt_list.stmts = stmts
+
+    def __eliminate(self, stmt_stmts):
+        '''Adds the statement to stmts, preceded by the declarations hoisted
+        out of it, each preceded in turn by those hoisted out of it'''
+        stmt, stmts = stmt_stmts
+        frames = [(stmt, [])]   # (statement, the statements going before it)
+        while frames:
+            stmt, before = frames[-1]
+            slots = self.__best(stmt)
+            if slots is not None:
+                frames.append((self.__hoist(slots), []))
+                continue
+            frames.pop()
+            before.append(stmt)
+            (frames[-1][1] if frames else stmts).extend(before)
+
+    def __best(self, stmt):
+        '''Returns the slots of the repeated subexpression of stmt whose
+        hoisting saves the most nodes, or None'''
+        if isinstance(stmt, ast.ExprStmt):
+            attr = 'expr'
+        elif isinstance(stmt, ast.VarDeclStmt):
+            attr = 'var_expr'
+        elif isinstance(stmt, ast.AssignStmt):
+            attr = 'rhs'
+        elif isinstance(stmt, ast.ReturnStmt) and stmt.return_expr is not None:
+            attr = 'return_expr'
+        else:
+            return None
+        found, safe, has_call = collect(stmt, attr)
+        best = None
+        for key, (size, slots) in found.items():
+            if has_call and not safe[key]:
+                continue
+            saved = (len(slots) - 1) * size - 2 * len(slots) - 1
+            if saved > 0 and (best is None or saved > best[0]):
+                best = (saved, slots)
+        return best[1] if best is not None else None
+
+    def __hoist(self, slots):
+        '''Moves the first occurrence into a new declaration, points every
+        occurrence at it and returns the declaration'''
+        parent, attr, rvalue_ok = slots[0]
+        expr = getattr(parent, attr) if isinstance(attr, str) else parent[attr]
+        tok = ast.first_token(expr)
+        name = self.__new_name()
+        var_decl = ast.VarDeclStmt()
+        var_decl.var_id = token.Token(token.ID, name, tok.line, tok.column)
+        var_decl.var_expr = as_expr(expr)
+        for parent, attr, rvalue_ok in slots:
+            id_rvalue = ast.IDRvalue()
+            id_rvalue.path = [token.Token(token.ID, name, tok.line, tok.column)]
+            node = id_rvalue if rvalue_ok else as_expr(id_rvalue)
+            if isinstance(attr, str):
+                setattr(parent, attr, node)
+            else:
+                parent[attr] = node
+        return var_decl
+
+    def __new_name(self):
+        while True:
+            self.count += 1
+            name = 'cse' + str(self.count)
+            if name not in self.names:
+                self.names.add(name)
+                return name
+
+
+PASSES = (ConstantFolder, BranchPruner, CommonSubexprEliminator)
+
+def optimize(stmt_list, passes=PASSES):
+    '''Runs the passes over stmt_list in place and returns the number of
+    nodes each one saved, by pass name'''
+    saved = {}
+    for pass_class in passes:
+        before = count_nodes(stmt_list)
+        pass_class().run(stmt_list)
+        saved[pass_class.__name__] = before - count_nodes(stmt_list)
+    return saved
+
+#------------------HELPER FUNCTIONS-----------------
+def constant_value(node):
+    '''Returns the value of a literal, or of an expression that is just one,
+    and NOT_CONSTANT otherwise'''
+    if isinstance(node, ast.SimpleRValue):
+        if node.val.tokentype == token.ID:
+            return NOT_CONSTANT
+        try:
+            return runtime.literal(node.val)
+        except error.MyPLError:
+            return NOT_CONSTANT
+    elif isinstance(node, ast.SimpleExpr):
+        return constant_value(node.term)
+    elif isinstance(node, ast.BoolExpr):
+        if node.bool_rel is None and node.bool_connector is None and not node.negated:
+            return constant_value(node.first_expr)
+    return NOT_CONSTANT
+
+def bool_constant(bool_expr):
+    '''Returns True or False for a constant condition and None otherwise'''
+    value = constant_value(bool_expr)
+    return value if type(value) is bool else None
+
+def compare(rel, a, b):
+    if a is NOT_CONSTANT or b is NOT_CONSTANT:
+        return NOT_CONSTANT
+    if type(a) is not type(b) and a is not None and b is not None:
+        return NOT_CONSTANT
+    try:
+        return runtime.COMPARE[rel.tokentype](a, b)
+    except runtime.FAULTS:
+        return NOT_CONSTANT
+
+def is_identity(tokentype, value, right):
+    '''Tells if value leaves the other operand of tokentype unchanged'''
+    if type(value) is not int:
+        return False
+    if value == 0:
+        return tokentype == token.PLUS or (right and tokentype == token.MINUS)
+    if value == 1:
+        return tokentype == token.MULTIPLY or (right and tokentype == token.DIVIDE)
+    return False
+
+def literal_token(value, tok):
+    '''Returns a literal token for value at the position of tok, or None if
+    the value has no literal form'''
+    if type(value) is bool:
+        tokentype, lexeme = token.BOOLVAL, 'true' if value else 'false'
+    elif type(value) is int and value >= 0:
+        tokentype, lexeme = token.INTVAL, str(value)
+    elif type(value) is float and FLOAT_LITERAL.fullmatch(repr(value)):
+        tokentype, lexeme = token.FLOATVAL, repr(value)
+    elif type(value) is str and '"' not in value and '\n' not in value:
+        tokentype, lexeme = token.STRINGVAL, value
+    else:
+        return None
+    return token.Token(tokentype, lexeme, tok.line, tok.column)
+
+def simple_expr(tok):
+    simple_rvalue = ast.SimpleRValue()
+    simple_rvalue.val = tok
+    expr = ast.SimpleExpr()
+    expr.term = simple_rvalue
+    return expr
+
+def as_expr(node):
+    '''Wraps an RValue in a SimpleExpr'''
+    if isinstance(node, ast.Expr):
+        return node
+    expr = ast.SimpleExpr()
+    expr.term = node
+    return expr
+
+def bool_constant_expr(value, tok):
+    bool_expr = ast.BoolExpr()
+    bool_expr.first_expr = simple_expr(literal_token(value, tok))
+    return bool_expr
+
+def collect(parent, attr):
+    '''Looks at the expression in parent.attr and returns found, safe and
+    has_call. found maps the key of every arithmetic subexpression of
+    literals and plain variables to its size and the slots it sits in, as
+    (parent, attr or index, rvalue_ok), in the order they end; safe tells
+    if the subexpression with a key cannot fault: the type checker found
+    it numeric throughout and it neither divides nor takes a modulo.
+    has_call tells if the expression calls a function. A key numbers each
+    distinct subexpression'''
+    keys = {}           # (tokentype, lexeme) or (op, first key, rest key) -> key
+    found = {}
+    safe = {}
+    has_call = False
+    results = []        # (key, size) of the subexpressions ended so far
+    stack = [(getattr(parent, attr), parent, attr, False, False)]
+    while stack:
+        node, parent, attr, rvalue_ok, ended = stack.pop()
+        if isinstance(node, ast.ComplexExpr):
+            if not ended:
+                stack.append((node, parent, attr, rvalue_ok, True))
+                stack.append((node.rest, node, 'rest', False, False))
+                stack.append((node.first_operand, node, 'first_operand', True, False))
+                continue
+            rest, rest_size = results.pop()
+            first, first_size = results.pop()
+            size = first_size + rest_size + 1
+            if first is None or rest is None:
+                results.append((None, size))
+                continue
+            op = node.math_rel.tokentype
+            key = keys.setdefault((op, first, rest), len(keys))
+            safe[key] = (safe.get(key, True) and node.type in type_checker.NUMERIC and
+                op not in (token.DIVIDE, token.MODULO) and safe[first] and safe[rest])
+            found.setdefault(key, (size, []))[1].append((parent, attr, rvalue_ok))
+            results.append((key, size))
+        elif isinstance(node, ast.SimpleExpr):
+            if not ended:
+                stack.append((node, parent, attr, rvalue_ok, True))
+                stack.append((node.term, node, 'term', True, False))
+                continue
+            key, size = results.pop()
+            results.append((key, size + 1))
+        elif isinstance(node, ast.CallRValue):
+            if not ended:
+                has_call = True
+                stack.append((node, parent, attr, rvalue_ok, True))
+                for i in reversed(range(len(node.args))):
+                    stack.append((node.args[i], node.args, i, False, False))
+                continue
+            start = len(results) - len(node.args)
+            size = 1 + sum(size for key, size in results[start:])
+            del results[start:]
+            results.append((None, size))
+        elif isinstance(node, ast.SimpleRValue):
+            results.append((value_key(keys, safe, node.val), 1))
+        elif isinstance(node, ast.IDRvalue) and len(node.path) == 1:
+            results.append((value_key(keys, safe, node.path[0]), 1))
+        else:
+            results.append((None, 1))
+    return found, safe, has_call
+
+def value_key(keys, safe, tok):
+    '''Returns the key of a literal or plain variable'''
+    key = keys.setdefault((tok.tokentype, tok.lexeme), len(keys))
+    safe[key] = True
+    return key
+
+def nested_lists(stmt):
+    '''Returns the statement lists directly inside stmt'''
+    if isinstance(stmt, (ast.WhileStmt, ast.FunDeclStmt)):
+        return [stmt.stmt_list]
+    elif isinstance(stmt, ast.IfStmt):
+        lists = [basic_if.stmt_list for basic_if in [stmt.if_part] + stmt.elseifs]
+        if stmt.has_else:
+            lists.append(stmt.else_stmts)
+        return lists
+    return []
+
+def count_nodes(stmt_list):
+    return sum(1 for node in ast.nodes(stmt_list))
+
+def identifiers(stmt_list):
+    '''Returns the set of identifier lexemes used anywhere in the program'''
+    names = set()
+    for node in ast.nodes(stmt_list):
+        for name in ast.node_fields(type(node))[1]:
+            value = getattr(node, name, None)
+            if isinstance(value, list):
+                names.update(v.lexeme for v in value if isinstance(v, token.Token) and
+                    v.tokentype == token.ID)
+            elif isinstance(value, token.Token) and value.tokentype == token.ID:
+                names.add(value.lexeme)
+    return names
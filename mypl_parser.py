@@ -9,22 +9,91 @@ import mypl_lexer as lexer
 import mypl_token as token
 import mypl_ast as ast 
 
+# token sets used to pick a rule, built once rather than on every call
+EXPR_START = frozenset([token.STRINGVAL, token.INTVAL, token.BOOLVAL, token.FLOATVAL, 
+    token.NIL, token.NEW, token.LPAREN, token.ID])
+BSTMT_START = EXPR_START | frozenset([token.RETURN, token.VAR, token.SET, token.IF, token.WHILE])
+TYPES = frozenset([token.ID, token.INTTYPE, token.FLOATTYPE, token.BOOLTYPE, token.STRINGTYPE])
+RVALS = frozenset([token.STRINGVAL, token.INTVAL, token.BOOLVAL, token.FLOATVAL, token.NIL])
+MATHRELS = frozenset([token.PLUS, token.MINUS, token.DIVIDE, token.MULTIPLY, token.MODULO])
+BOOLRELS = frozenset([token.EQUAL, token.LESS_THAN, token.LESS_THAN_EQUAL, token.GREATER_THAN, 
+    token.GREATER_THAN_EQUAL, token.NOT_EQUAL])
+# statements closed by an 'end'
+BLOCK_START = frozenset([token.WHILE, token.IF, token.FUN, token.STRUCTTYPE])
+# how tightly each math operator binds when parsing with precedence
+PRECEDENCE = {token.PLUS: 1, token.MINUS: 1, token.MULTIPLY: 2, token.DIVIDE: 2, 
+    token.MODULO: 2}
+# operators whose runs can be regrouped without changing the result
+ASSOCIATIVE = frozenset([token.PLUS, token.MULTIPLY])
+# parser engines: recursive descent, or the LL(1) table in mypl_ll1
+ENGINES = ('descent', 'll1')
+# errors collected in recovery mode before the parser gives up
+MAX_ERRORS = 100
+
+class ErrorLimit(Exception):
+    """Stops a recovering parse once max_errors errors were found"""
+    pass
+
+
 class Parser(object):
+    """Builds the AST of a program. By default a chain of math operators 
+    groups to the right, a * b + c being read as a * (b + c); with 
+    precedence=True, *, / and % bind tighter than + and - (see 
+    precedence_tree). With recover=True errors are collected in errors 
+    instead of raised: each statement that fails becomes an ErrorStmt and 
+    parsing carries on after the next ';', or at the next 'end', 'fun' or 
+    'struct'. Lexer errors skip the bad symbol. After max_errors errors 
+    the statements parsed so far are returned"""
 
-    def __init__(self, lexer): 
+    def __init__(self, lexer, precedence=False, recover=False, max_errors=MAX_ERRORS): 
         self.lexer = lexer 
+        self.precedence = precedence
+        self.recover = recover
+        self.max_errors = max_errors
+        self.errors = []                            # MyPLErrors found when recovering
         self.current_token = None
+        if recover and hasattr(lexer, 'next_token'):
+            stream = self.__skip_lexer_errors(lexer.next_token)
+        elif hasattr(lexer, 'tokens'):
+            stream = lexer.tokens()
+        else:
+            stream = iter(lexer.next_token, None)
+        self.lookahead = token.TokenBuffer(stream)  # tokens after current_token
 
     def parse(self): 
         """succeeds if program is syntactically well-formed""" 
         stmt_list_node = ast.StmtList()
+        stopped = False
+        try:
+            self.__advance() 
+            self.__stmts(stmt_list_node) 
+            self.__eat(token.EOS, 'expecting end of file')
+        except ErrorLimit:
+            stopped = True
+        # lexer errors are found ahead of the parser by the lookahead
+        self.errors.sort(key=lambda e: (e.line, e.column))
+        if stopped:
+            last = self.errors[-1]
+            self.errors.append(error.MyPLError('too many errors, stopped parsing', 
+                last.line, last.column))
+        return stmt_list_node
+
+    def statements(self):
+        """yields each top-level statement as soon as it has been parsed, 
+        checking for the end of file after the last one""" 
+        stmt_list_node = ast.StmtList()
         self.__advance() 
-        self.__stmts(stmt_list_node) 
+        while self.current_token.tokentype != token.EOS: 
+            self.__stmt(stmt_list_node) 
+            yield stmt_list_node.stmts.pop()
         self.__eat(token.EOS, 'expecting end of file')
-        return stmt_list_node
         
+    def peek(self, k=1):
+        """returns the k-th token after the current one without consuming it"""
+        return self.lookahead.peek(k)
+
     def __advance(self): 
-        self.current_token = self.lexer.next_token()
+        self.current_token = self.lookahead.advance()
         
     def __eat(self, tokentype, error_msg): 
         if self.current_token.tokentype == tokentype: 
@@ -38,20 +107,87 @@ class Parser(object):
         c = self.current_token.column 
         raise error.MyPLError(s, l, c)
         
+    #------------------ERROR RECOVERY-----------------
+
+    def __skip_lexer_errors(self, next_token):
+        '''Yields the tokens of next_token, recording the errors it raises'''
+        while True:
+            try:
+                tok = next_token()
+            except error.MyPLError as e:
+                self.__record(e)
+                continue
+            yield tok
+            if tok.tokentype == token.EOS:
+                return
+
+    def __record(self, e):
+        '''Keeps e, unless an error was already found at the same place'''
+        if self.errors and (self.errors[-1].line, self.errors[-1].column) == (e.line, e.column):
+            return
+        self.errors.append(e)
+        if len(self.errors) >= self.max_errors:
+            raise ErrorLimit()
+
+    def __recovering(self, parse_stmt, stmts, top):
+        '''Calls parse_stmt; if it fails, records the error, puts an ErrorStmt 
+        in stmts (when given) and skips to where the next statement can start'''
+        start = self.current_token
+        try:
+            parse_stmt()
+        except error.MyPLError as e:
+            self.__record(e)
+            if stmts is not None:
+                error_stmt = ast.ErrorStmt()
+                error_stmt.error = e
+                error_stmt.first_token = start
+                stmts.append(error_stmt)
+            self.__synchronize(start, top)
+            if self.current_token is start and start.tokentype != token.EOS:
+                self.__advance()
+
+    def __synchronize(self, start, top):
+        '''Skips past the next ';', or up to the next 'fun', 'struct' or 'end'. 
+        Blocks opened on the way, including one opened by the statement that 
+        failed, are skipped up to their 'end'. At the top level a stray 'end' 
+        is skipped too'''
+        depth = 1 if start.tokentype in BLOCK_START else 0
+        while True:
+            tokentype = self.current_token.tokentype
+            if tokentype == token.EOS or tokentype == token.FUN or tokentype == token.STRUCTTYPE:
+                return
+            if tokentype == token.END and (depth or top):
+                self.__advance()
+                depth = max(depth - 1, 0)
+                if not depth:
+                    return
+            elif tokentype == token.END:
+                return
+            else:
+                if tokentype == token.WHILE or tokentype == token.IF:
+                    depth += 1
+                self.__advance()
+                if tokentype == token.SEMICOLON and not depth:
+                    return
+
     # Beginning of recursive descent functions
     def __stmts(self, stmt_list_node): 
         """<stmts> ::= <stmt> <stmts> | e""" 
-        if self.current_token.tokentype != token.EOS: 
-            self.__stmt(stmt_list_node) 
-            self.__stmts(stmt_list_node)
+        while self.current_token.tokentype != token.EOS: 
+            if self.recover:
+                self.__recovering(lambda: self.__stmt(stmt_list_node), stmt_list_node.stmts, 
+                    True)
+            else:
+                self.__stmt(stmt_list_node) 
             
     def __bstmts(self, stmt_list):
         '''<bstmts> ::= <bstmt> <bstmts> | e '''
-        types = [token.STRINGVAL, token.INTVAL, token.BOOLVAL, token.FLOATVAL, token.NIL, 
-        token.NEW, token.LPAREN, token.ID, token.RETURN, token.VAR,token.SET, token.IF, token.WHILE]
-        if self.current_token.tokentype in types:
-            stmt_list.stmts.append(self.__bstmt())
-            self.__bstmts(stmt_list)
+        while self.current_token.tokentype in BSTMT_START:
+            if self.recover:
+                self.__recovering(lambda: stmt_list.stmts.append(self.__bstmt()), 
+                    stmt_list.stmts, False)
+            else:
+                stmt_list.stmts.append(self.__bstmt())
         
     def __stmt(self, stmt_list_node): 
         """<stmt> ::= <sdecl> | <fdecl> | <bstmt>"""
@@ -64,7 +200,6 @@ class Parser(object):
     
     def __bstmt(self):
         ''' <bstmt>	::=	<vdecl> | <assign> | <cond> | <while> | <expr> SEMICOLON | <exit> '''
-        types = [token.STRINGVAL, token.INTVAL, token.BOOLVAL, token.FLOATVAL, token.NIL, token.NEW, token.LPAREN, token.ID] 
         if self.current_token.tokentype == token.VAR:
             stmt = self.__vdecl()
         elif self.current_token.tokentype == token.SET:
@@ -73,7 +208,7 @@ class Parser(object):
             stmt = self.__cond()
         elif self.current_token.tokentype == token.WHILE: 
             stmt = self.__while()
-        elif self.current_token.tokentype in types:
+        elif self.current_token.tokentype in EXPR_START:
             expr_stmt = ast.ExprStmt()
             expr_stmt.expr = self.__expr()
             stmt = expr_stmt
@@ -89,19 +224,18 @@ class Parser(object):
         struct_decl_stmt = ast.StructDeclStmt()
         struct_decl_stmt.struct_id = self.current_token
         self.__eat(token.ID, "expecting 'ID'")
-        var_decls = []
-        if self.current_token.tokentype == token.VAR:
-            self.__vdecls(var_decls)
-            struct_decl_stmt.var_decls = var_decls
+        self.__vdecls(struct_decl_stmt.var_decls)
         self.__eat(token.END, "expecting 'END'")
         #add to the stmt_list_node
         stmt_list_node.stmts.append(struct_decl_stmt)
     
     def __vdecls(self, var_decls):
         ''' <vdecls> ::= <vdecl> <vdecls> | e '''
-        if self.current_token.tokentype == token.VAR:
-            var_decls.append(self.__vdecl())
-            self.__vdecls(var_decls)
+        while self.current_token.tokentype == token.VAR:
+            if self.recover:
+                self.__recovering(lambda: var_decls.append(self.__vdecl()), None, False)
+            else:
+                var_decls.append(self.__vdecl())
         
     def __fdecl(self, stmt_list_node):
         ''' <fdecl>	::= FUN ( <type> | NIL ) ID LPAREN <params> RPAREN <bstmts> END  '''
@@ -126,9 +260,9 @@ class Parser(object):
     def __params(self):
         ''' <params> ::= ID COLON <type> ( COMMA ID COLON <type>)* | e '''
         fun_param_list = []
-        fun_param = ast.FunParam()
-        fun_param.param_name = self.current_token
         if self.current_token.tokentype == token.ID:
+            fun_param = ast.FunParam()
+            fun_param.param_name = self.current_token
             self.__advance()
             self.__eat(token.COLON, "expecting 'COLON'")
             fun_param.param_type = self.__type()
@@ -145,8 +279,7 @@ class Parser(object):
     
     def __type(self):
         ''' <type>	::= ID | INTTYPE | FLOATTYPE | BOOLTYPE | STRINGTYPE '''
-        type = [token.ID,token.INTTYPE,token.FLOATTYPE,token.BOOLTYPE,token.STRINGTYPE]
-        if self.current_token.tokentype in type:
+        if self.current_token.tokentype in TYPES:
             curr = self.current_token
             self.__advance()
             return curr
@@ -158,8 +291,7 @@ class Parser(object):
         return_stmt = ast.ReturnStmt()
         return_stmt.return_token = self.current_token
         self.__eat(token.RETURN,"expecting 'RETURN'")
-        types = [token.STRINGVAL, token.INTVAL, token.BOOLVAL, token.FLOATVAL, token.NIL, token.NEW, token.LPAREN, token.ID] 
-        if self.current_token.tokentype in types: 
+        if self.current_token.tokentype in EXPR_START: 
             return_stmt.return_expr = self.__expr()
         self.__eat(token.SEMICOLON, "expecting 'SEMICOLON'")
         return return_stmt
@@ -224,7 +356,7 @@ class Parser(object):
     
     def __condt(self, if_stmt):
         ''' <condt>	::= ELIF <bexpr> THEN <bstmts> <condt> | ELSE <bstmts> | e'''
-        if self.current_token.tokentype == token.ELIF:
+        while self.current_token.tokentype == token.ELIF:
             self.__advance()
             #BasicIf declaration
             basic_if = ast.BasicIf()
@@ -235,8 +367,7 @@ class Parser(object):
             self.__bstmts(stmt_list_node)
             basic_if.stmt_list = stmt_list_node
             if_stmt.elseifs.append(basic_if)
-            self.__condt(if_stmt)
-        elif self.current_token.tokentype == token.ELSE:
+        if self.current_token.tokentype == token.ELSE:
             if_stmt.has_else = True
             self.__advance()
             #StmtList for else
@@ -261,25 +392,25 @@ class Parser(object):
     
     def __expr(self):
         ''' <expr> ::= ( <rvalue> | LPAREN <expr> RPAREN ) ( <mathrel> <expr> | e ) '''
-        #ComplexExpr declaration
-        complex_expr = ast.ComplexExpr()    
+        # the operands of a chain are read in a loop and linked into a tree 
+        # afterwards, so long chains do not grow the stack
+        operands = [self.__operand()]
+        math_rels = []
+        while self.current_token.tokentype in MATHRELS: 
+            math_rels.append(self.current_token)
+            self.__advance()
+            operands.append(self.__operand())
+        if self.precedence:
+            return precedence_tree(operands, math_rels)
+        return chain_tree(operands, math_rels)
+
+    def __operand(self):
         if self.current_token.tokentype == token.LPAREN: 
             self.__advance() 
-            complex_expr.first_operand = self.__expr() 
+            operand = self.__expr() 
             self.__eat(token.RPAREN, 'expecting ")"')
-        else: 
-            complex_expr.first_operand = self.__rvalue() 
-        mathrels = [token.PLUS, token.MINUS, token.DIVIDE, token.MULTIPLY, token.MODULO] 
-        if self.current_token.tokentype in mathrels: 
-            complex_expr.math_rel = self.current_token
-            self.__advance()
-            complex_expr.rest = self.__expr()
-            return complex_expr
-        else: 
-            #SimpleExpr declaration
-            simple_expr = ast.SimpleExpr()
-            simple_expr.term = complex_expr.first_operand
-            return simple_expr
+            return operand
+        return self.__rvalue() 
             
     def __mathrel(self):
         ''' <mathrel> ::= PLUS | MINUS | DIVIDE | MULTIPLY | MODULO '''
@@ -298,8 +429,7 @@ class Parser(object):
     
     def __rvalue(self):
         ''' <rvalue> ::= STRINGVAL | INTVAL | BOOLVAL | FLOATVAL | NIL | NEW ID | <idrval> '''
-        rvals = [token.STRINGVAL,token.INTVAL,token.BOOLVAL,token.FLOATVAL,token.NIL]
-        if self.current_token.tokentype in rvals:
+        if self.current_token.tokentype in RVALS:
             #SimpleRValue declaration
             simple_rvalue = ast.SimpleRValue()
             simple_rvalue.val = self.current_token
@@ -317,14 +447,12 @@ class Parser(object):
     
     def __idrval(self):
         ''' <idrval> ::= ID ( DOT ID )* | ID LPAREN <exprlist> RPAREN '''
-        #SimpleRValue declared
-        simple_rvalue = ast.SimpleRValue()
-        simple_rvalue.val = self.current_token
+        id_token = self.current_token
         self.__eat(token.ID, "expecting an 'ID'")
         if self.current_token.tokentype == token.LPAREN:
             #CallRvalue declared
             call_rvalue = ast.CallRValue()
-            call_rvalue.fun = simple_rvalue.val
+            call_rvalue.fun = id_token
             self.__advance()
             call_rvalue.args = self.__exprlist()
             self.__eat(token.RPAREN, "expecting a ')'")
@@ -333,21 +461,22 @@ class Parser(object):
         elif self.current_token.tokentype == token.DOT:
             #IDRvalue declared
             id_rvalue = ast.IDRvalue()
-            id_rvalue.path.append(simple_rvalue.val)
+            id_rvalue.path.append(id_token)
             while self.current_token.tokentype == token.DOT:
                 self.__advance()
                 id_rvalue.path.append(self.current_token)
                 self.__eat(token.ID, "expecting an 'ID'")
             #IDRvalue returned        
             return id_rvalue 
-        #SimpleRValue returned
+        #SimpleRValue declared and returned
+        simple_rvalue = ast.SimpleRValue()
+        simple_rvalue.val = id_token
         return simple_rvalue
         
     def __exprlist (self):
         ''' <exprlist> ::= <expr> ( COMMA <expr> )* | e '''
-        types = [token.STRINGVAL, token.INTVAL, token.BOOLVAL, token.FLOATVAL, token.NIL, token.NEW, token.LPAREN, token.ID] 
         exprlist = []
-        if self.current_token.tokentype in types: 
+        if self.current_token.tokentype in EXPR_START: 
             exprlist.append(self.__expr())
             while self.current_token.tokentype == token.COMMA: 
                 self.__advance() 
@@ -356,46 +485,138 @@ class Parser(object):
     
     def __bexpr(self):
         ''' <bexpr>	::=	<expr> <bexprt> | NOT <bexpr> <bexprt> | LPAREN <bexpr> RPAREN <bconnct> '''
-        bool_expr = ast.BoolExpr()
-        if self.current_token.tokentype == token.NOT:
-            bool_expr.negated = True
-            self.__advance()
-            bool_expr.first_expr = self.__bexpr()
-            self.__bexprt(bool_expr)
-        elif self.current_token.tokentype == token.LPAREN:
-            self.__advance()
-            bool_expr.first_expr = self.__bexpr()
-            self.__eat(token.RPAREN, 'expected ")"')
-            self.__bconnct(bool_expr)
-        else:
-            bool_expr.first_expr = self.__expr()
-            self.__bexprt(bool_expr)
-        return bool_expr
+        # an and/or chain is read in a loop, each BoolExpr becoming the rest 
+        # of the previous one, so long chains do not grow the stack
+        first = None
+        prev = None
+        while True:
+            bool_expr = ast.BoolExpr()
+            if prev is None:
+                first = bool_expr
+            else:
+                prev.rest = bool_expr
+            if self.current_token.tokentype == token.NOT:
+                bool_expr.negated = True
+                self.__advance()
+                bool_expr.first_expr = self.__bexpr()
+                self.__bexprt(bool_expr)
+            elif self.current_token.tokentype == token.LPAREN:
+                self.__advance()
+                bool_expr.first_expr = self.__bexpr()
+                self.__eat(token.RPAREN, 'expected ")"')
+            else:
+                bool_expr.first_expr = self.__expr()
+                self.__bexprt(bool_expr)
+            if not self.__bconnct(bool_expr):
+                return first
+            prev = bool_expr
     
     def __bexprt(self, bool_expr):
         ''' <bexprt> ::= <boolrel> <expr> <bconnct> | <bconnct> '''
-        boolrel = [token.EQUAL, token.LESS_THAN, token.LESS_THAN_EQUAL, token.GREATER_THAN, token.GREATER_THAN_EQUAL, token.NOT_EQUAL]
-        if self.current_token.tokentype in boolrel:
+        if self.current_token.tokentype in BOOLRELS:
             self.__boolrel(bool_expr)
             bool_expr.second_expr = self.__expr()
-        self.__bconnct(bool_expr)
         
     def __bconnct(self, bool_expr):
         ''' <bconnct> ::= AND <bexpr> | OR <bexpr> | e '''
-        if self.current_token.tokentype == token.AND:
+        # records the connector and returns True; __bexpr parses the <bexpr> 
+        if self.current_token.tokentype == token.AND or self.current_token.tokentype == token.OR:
             bool_expr.bool_connector = self.current_token
             self.__advance()
-            bool_expr.rest = self.__bexpr()
-        elif self.current_token.tokentype == token.OR:
-            bool_expr.bool_connector = self.current_token
-            self.__advance()
-            bool_expr.rest = self.__bexpr()
+            return True
+        return False
             
     def __boolrel(self, bool_expr):
         ''' <boolrel> ::= EQUAL | LESS_THAN | GREATER_THAN | LESS_THAN_EQUAL | GREATER_THAN_EQUAL | NOT_EQUAL '''
-        boolrel = [token.EQUAL,token.LESS_THAN, token.LESS_THAN_EQUAL, token.GREATER_THAN, token.GREATER_THAN_EQUAL, token.NOT_EQUAL]
-        if self.current_token.tokentype in boolrel:
+        if self.current_token.tokentype in BOOLRELS:
             bool_expr.bool_rel = self.current_token
             self.__advance()
         else:
-            self.__error("expecting comparison boolean")
\ No newline at end of file
+            self.__error("expecting comparison boolean")
+
+
+def make_parser(lexer, engine='descent', precedence=False, recover=False):
+    '''Creates a parser over lexer using the named engine from ENGINES. Only 
+    the recursive descent parser can recover from errors'''
+    if engine == 'descent':
+        return Parser(lexer, precedence, recover)
+    if recover:
+        raise ValueError('the %s parser cannot recover from errors' % engine)
+    if engine == 'll1':
+        import mypl_ll1 as ll1     # imported here as it builds on this module
+        return ll1.LL1Parser(lexer, precedence)
+    raise ValueError('unknown parser engine %r' % engine)
+
+
+#------------------EXPRESSION TREES-----------------
+
+def chain_tree(operands, math_rels):
+    '''Links the operands of a chain right to left, each operator taking 
+    everything after it as its right side'''
+    expr = ast.SimpleExpr()
+    expr.term = operands[-1]
+    for i in range(len(math_rels) - 1, -1, -1):
+        expr = complex_expr(operands[i], math_rels[i], expr)
+    return expr
+
+def precedence_tree(operands, math_rels):
+    '''Links the operands of a chain so that *, / and % bind tighter than + 
+    and -, operators of the same level grouping left to right. A run of the 
+    same associative operator is grouped as a balanced tree instead, so a 
+    sum of n terms is log n levels deep rather than n'''
+    terms = []
+    term_rels = []
+    start = 0
+    for i in range(len(math_rels)):
+        if PRECEDENCE[math_rels[i].tokentype] == 1:
+            terms.append(group(operands[start:i + 1], math_rels[start:i]))
+            term_rels.append(math_rels[i])
+            start = i + 1
+    terms.append(group(operands[start:], math_rels[start:]))
+    node = group(terms, term_rels)
+    if isinstance(node, ast.Expr):
+        return node
+    expr = ast.SimpleExpr()
+    expr.term = node
+    return expr
+
+def group(operands, math_rels):
+    '''Links operands joined by operators of one precedence level'''
+    node = operands[0]
+    i = 0
+    while i < len(math_rels):
+        j = i + 1
+        if math_rels[i].tokentype in ASSOCIATIVE:
+            while j < len(math_rels) and math_rels[j].tokentype == math_rels[i].tokentype:
+                j += 1
+        node = balance([node] + operands[i + 1:j + 1], math_rels[i:j])
+        i = j
+    return node
+
+def balance(operands, math_rels):
+    '''Joins neighbouring pairs of operands until one node is left'''
+    while math_rels:
+        pairs = []
+        pair_rels = []
+        for k in range(0, len(operands) - 1, 2):
+            pairs.append(complex_expr(operands[k], math_rels[k], operands[k + 1]))
+            if k + 2 < len(operands):
+                pair_rels.append(math_rels[k + 1])
+        if len(operands) % 2:
+            pairs.append(operands[-1])
+        operands = pairs
+        math_rels = pair_rels
+    return operands[0]
+
+def complex_expr(first_operand, math_rel, rest):
+    '''Returns a ComplexExpr, putting an RValue on the right side in a 
+    SimpleExpr'''
+    if not isinstance(rest, ast.Expr):
+        expr = ast.SimpleExpr()
+        expr.term = rest
+        rest = expr
+    node = ast.ComplexExpr()
+    node.first_operand = first_operand
+    node.math_rel = math_rel
+    node.rest = rest
+    return node
@@ -7,24 +7,49 @@
 import mypl_token as token 
 import mypl_ast as ast
 
+FLUSH_THRESHOLD = 4096      # buffered fragments before a write, about 20KB
+
 class PrintVisitor(ast.Visitor): 
-    """An AST pretty printer"""
+    """An AST pretty printer. Output is collected in a buffer and written
+    to output_stream in large blocks, once flush_threshold fragments are
+    waiting at the end of a statement and when the outermost statement
+    list is done. With no output_stream it is all kept for to_string()"""
 
-    def __init__(self, output_stream): 
+    def __init__(self, output_stream=None, flush_threshold=FLUSH_THRESHOLD): 
         self.indent = 0                             # to increase/decrease indent level 
         self.output_stream = output_stream          # where printing to
+        self.flush_threshold = flush_threshold      # fragments to buffer before writing
+        self.__chunks = []                          # fragments not yet written
+        self.__write = self.__chunks.append
+        self.__depth = 0                            # statement lists being visited
 
     def __indent(self): 
         """Get default indent of four spaces""" 
         return '    ' * self.indent
 
-    def __write(self, msg): 
-        self.output_stream.write(msg)
+    def flush(self):
+        """Writes the buffered output to output_stream"""
+        if self.output_stream is not None and self.__chunks:
+            self.output_stream.write(''.join(self.__chunks))
+            self.__chunks.clear()
+
+    def to_string(self):
+        """Returns the output printed so far that was not written out"""
+        return ''.join(self.__chunks)
 
     def visit_stmt_list(self, stmt_list): 
-        """Accepts the list of statements in the statement list""" 
-        for stmt in stmt_list.stmts: 
-            stmt.accept(self)
+        """Accepts the list of statements in the statement list, writing out 
+        the buffer when it is full and when the outermost list is done""" 
+        self.__depth += 1
+        try:
+            for stmt in stmt_list.stmts: 
+                stmt.accept(self)
+                if len(self.__chunks) >= self.flush_threshold:
+                    self.flush()
+        finally:
+            self.__depth -= 1
+            if self.__depth == 0:
+                self.flush()
 
     def visit_expr_stmt(self, expr_stmt):
         """Accepts an expression then writes a newline"""
@@ -97,7 +122,7 @@ class PrintVisitor(ast.Visitor):
     def visit_return_stmt(self, return_stmt):
         '''Indents, writes return_token, accepts return_expr, writes ';', writes newline'''
         self.printIndent()
-        self.__write(str(return_stmt.return_token.lexeme))
+        self.__write(return_stmt.return_token.lexeme)
         if return_stmt.return_expr != None:
             self.__write(' ')
             self.checkIfNoneAccept(return_stmt.return_expr)
@@ -188,10 +213,10 @@ class PrintVisitor(ast.Visitor):
         '''Writes lval path'''
         i = 0 
         while lval.path[i] != lval.path[-1]:
-            self.__write(str(lval.path[i].lexeme))
+            self.__write(lval.path[i].lexeme)
             self.__write('.')
             i += 1
-        self.__write(str(lval.path[i].lexeme))
+        self.__write(lval.path[i].lexeme)
     
     def visit_fun_param(self, fun_param):
         '''Writes param_name, ':', and param_type'''
@@ -233,18 +258,21 @@ class PrintVisitor(ast.Visitor):
             i += 1
         self.checkIfNoneWrite(id_rvalue.path[i])
 
+    def visit_error_stmt(self, error_stmt):
+        '''Indents and writes the error as a comment'''
+        self.printIndent()
+        self.__write('# ' + str(error_stmt.error) + '\n')
+
     '''HELPER FUNCTIONS'''
         
     def checkIfNoneWrite(self, visitingNode):
         '''if the visitingNode is not None type then, if the visitingNode is a string 
         prints quotes before and after the lexeme else just prints the lexeme'''
-        if visitingNode != None:
-            if str(visitingNode.tokentype) == "STRINGVAL":
-                self.__write('"')
-                self.__write(str(visitingNode.lexeme))
-                self.__write('"')
+        if visitingNode is not None:
+            if visitingNode.tokentype == token.STRINGVAL:
+                self.__write('"' + visitingNode.lexeme + '"')
             else:
-                self.__write(str(visitingNode.lexeme))
+                self.__write(visitingNode.lexeme)
             
     def checkIfNoneAccept(self, visitingNode):
         '''if the visitingNode is not None type then accepts it'''
@@ -252,5 +280,295 @@ class PrintVisitor(ast.Visitor):
             visitingNode.accept(self) 
 
     def printIndent(self):
-        '''sends the output_stream the proper indent'''
-        self.output_stream.write('    ' * self.indent)
\ No newline at end of file
+        '''buffers the proper indent'''
+        if self.indent:
+            self.__write('    ' * self.indent)
+
+
+class PrintWalker(ast.Walker): 
+    """PrintVisitor's output from a Walker, for ast.walk(). Each hook writes
+    what comes before a node's children and returns the rest as a plan,
+    with the text between the children as (write, text) steps, so nesting
+    of any depth prints without recursion. Buffering is as in PrintVisitor"""
+
+    def __init__(self, output_stream=None, flush_threshold=FLUSH_THRESHOLD): 
+        self.indent = 0                             # to increase/decrease indent level 
+        self.output_stream = output_stream          # where printing to
+        self.flush_threshold = flush_threshold      # fragments to buffer before writing
+        self.__chunks = []                          # fragments not yet written
+        self.__write = self.__chunks.append
+        self.__depth = 0                            # statement lists being visited
+        self.__check = (self.__flush_if_full, None) # plan step after each statement
+
+    def __indent(self): 
+        """Get default indent of four spaces""" 
+        return '    ' * self.indent
+
+    def flush(self):
+        """Writes the buffered output to output_stream"""
+        if self.output_stream is not None and self.__chunks:
+            self.output_stream.write(''.join(self.__chunks))
+            self.__chunks.clear()
+
+    def to_string(self):
+        """Returns the output printed so far that was not written out"""
+        return ''.join(self.__chunks)
+
+    def visit_stmt_list(self, stmt_list): 
+        """Visits the statements in the statement list, writing out the 
+        buffer after a statement when it is full""" 
+        self.__depth += 1
+        plan = []
+        for stmt in stmt_list.stmts: 
+            plan.append(stmt)
+            plan.append(self.__check)
+        return plan
+
+    def leave_stmt_list(self, stmt_list):
+        """Writes out the buffer when the outermost list is done"""
+        self.__depth -= 1
+        if self.__depth == 0:
+            self.flush()
+
+    def leave_expr_stmt(self, expr_stmt):
+        """Writes a newline after the expression"""
+        self.__write(';\n')
+    
+    def visit_var_decl_stmt(self, var_decl):
+        """Indents, writes 'var', writes var_id, if var type doesnt equal 
+        none writes ':' and the var_type, writes '=' and visits the 
+        expression"""
+        self.printIndent()
+        self.__write("var " )
+        self.checkIfNoneWrite(var_decl.var_id)
+        if var_decl.var_type != None:
+            self.__write(": ")
+            self.checkIfNoneWrite(var_decl.var_type)
+        self.__write(" = ")
+
+    def leave_var_decl_stmt(self, var_decl):
+        """Writes ';' and a newline"""
+        self.__write(';\n')
+
+    def visit_assign_stmt(self, assign_stmt):
+        '''Indents, writes 'set', visits the lhs, writes '=' and visits rhs'''
+        self.printIndent()
+        self.__write('set ')
+        return [assign_stmt.lhs, (self.__write, ' = '), assign_stmt.rhs]
+
+    def leave_assign_stmt(self, assign_stmt):
+        '''Writes ';' and a newline'''
+        self.__write(';\n')
+    
+    def visit_struct_decl_stmt(self, struct_decl):
+        '''Indents, writes newline, writes struct, writes struct_id, writes newline,
+        and indents the var_decls'''
+        self.printIndent()
+        self.__write('\nstruct ')
+        self.checkIfNoneWrite(struct_decl.struct_id)
+        self.__write('\n')
+        self.indent += 1
+
+    def leave_struct_decl_stmt(self, struct_decl):
+        '''Indents, writes 'end', and two newlines'''
+        self.indent -= 1
+        self.printIndent()
+        self.__write('end\n\n')
+    
+    def visit_fun_decl_stmt(self, fun_decl):
+        '''Indents, writes:(newline, 'fun', return_type, ' ', fun_decl name, '('), 
+        visits fun_decl params, writes ')' and a newline, and visits stmt_list'''
+        self.printIndent()
+        self.__write('\nfun ')
+        self.checkIfNoneWrite(fun_decl.return_type)
+        self.__write(' ')
+        self.checkIfNoneWrite(fun_decl.fun_name)
+        self.__write('(')
+        self.indent += 1
+        plan = []
+        for param in fun_decl.params:
+            if plan:
+                plan.append((self.__write, ', '))
+            plan.append(param)
+        plan.append((self.__shift, -1))
+        plan.append((self.__write, ')\n'))
+        plan.append((self.__shift, 1))
+        plan.append(fun_decl.stmt_list)
+        return plan
+
+    def leave_fun_decl_stmt(self, fun_decl):
+        '''Writes 'end', and two newlines'''
+        self.indent -= 1
+        self.__write('end\n\n')
+    
+    def visit_return_stmt(self, return_stmt):
+        '''Indents, writes return_token and visits return_expr'''
+        self.printIndent()
+        self.__write(return_stmt.return_token.lexeme)
+        if return_stmt.return_expr != None:
+            self.__write(' ')
+
+    def leave_return_stmt(self, return_stmt):
+        '''Writes ';' and a newline'''
+        self.__write(';\n')
+        
+    def visit_while_stmt(self, while_stmt):
+        '''Indents, writes 'while', visits bool_expr, writes do and newline and
+        visits stmt_list'''
+        self.printIndent()
+        self.__write('while ')
+        return [while_stmt.bool_expr, (self.__write, ' do\n'), (self.__shift, 1),
+            while_stmt.stmt_list]
+
+    def leave_while_stmt(self, while_stmt):
+        '''Indents, writes 'end' and newline'''
+        self.indent -= 1
+        self.printIndent()
+        self.__write('end\n')
+        
+    def visit_if_stmt(self, if_stmt):
+        '''Indents, writes 'if', visits if_part.bool_expr, writes 'then', visits 
+        if_part.stmt_list, goes through if_stmt.elseifs, if else indents, write 'else' and 
+        newline, and visits else_stmts'''
+        self.printIndent()
+        self.__write('if ')
+        plan = [if_stmt.if_part.bool_expr, (self.__write, ' then \n'), (self.__shift, 1),
+            if_stmt.if_part.stmt_list]
+        for elseif in if_stmt.elseifs:
+            plan.append((self.__shift, -1))
+            plan.append((self.__line, 'elif '))
+            plan.append(elseif.bool_expr)
+            plan.append((self.__write, ' then\n'))
+            plan.append((self.__shift, 1))
+            plan.append(elseif.stmt_list)
+        if if_stmt.has_else:
+            plan.append((self.__shift, -1))
+            plan.append((self.__line, 'else\n'))
+            plan.append((self.__shift, 1))
+            plan.append(if_stmt.else_stmts)
+        return plan
+
+    def leave_if_stmt(self, if_stmt):
+        '''Indents, and writes 'end' and newline'''
+        self.indent -= 1
+        self.printIndent()
+        self.__write('end\n')
+        
+    def visit_complex_expr(self, complex_expr):
+        '''Writes '(', visits first_operand, write ' ', writes math_rel, writes ' ',
+        and visits complex_expr rest'''
+        self.__write('(')
+        return [complex_expr.first_operand,
+            (self.__write, ' ' + self.__text(complex_expr.math_rel) + ' '), complex_expr.rest]
+
+    def leave_complex_expr(self, complex_expr):
+        '''Writes ')' '''
+        self.__write(')')
+        
+    def visit_bool_expr(self, bool_expr):
+        '''if the bool_expr is negated writes 'not', if second_expr is None write '(', if 
+        bool_connector write '(', visits first_expr, if second_expr is not equal to None then
+        [writes:(' ',bool_rel,' '), visits second_expr, writes ')'], if bool_connector then 
+        [writes:( ' ',bool_connector, ' '), visits rest, and writes ')' ]'''
+        if bool_expr.negated:
+            self.__write("not ")
+        if bool_expr.second_expr != None:
+            self.__write('(')
+        if bool_expr.bool_connector != None:
+            self.__write('(')
+        plan = [bool_expr.first_expr]
+        if bool_expr.second_expr != None:
+            plan.append((self.__write, ' ' + self.__text(bool_expr.bool_rel) + ' '))
+            plan.append(bool_expr.second_expr)
+            plan.append((self.__write, ')'))
+        if bool_expr.bool_connector:
+            plan.append((self.__write, ' ' + self.__text(bool_expr.bool_connector) + ' '))
+            plan.append(bool_expr.rest)
+            plan.append((self.__write, ')'))
+        return plan
+    
+    def visit_lvalue(self, lval):
+        '''Writes lval path'''
+        i = 0 
+        while lval.path[i] != lval.path[-1]:
+            self.__write(lval.path[i].lexeme)
+            self.__write('.')
+            i += 1
+        self.__write(lval.path[i].lexeme)
+    
+    def visit_fun_param(self, fun_param):
+        '''Writes param_name, ':', and param_type'''
+        self.checkIfNoneWrite(fun_param.param_name)
+        self.__write(': ')
+        self.checkIfNoneWrite(fun_param.param_type)
+    
+    def visit_simple_rvalue(self, simple_rvalue):
+        '''Writes simple_rvalue val'''
+        self.checkIfNoneWrite(simple_rvalue.val)
+        
+    def visit_new_rvalue(self, new_rvalue):
+        '''Indents, writes 'new', and writes struct_type'''
+        self.printIndent()
+        self.__write('new ')
+        self.checkIfNoneWrite(new_rvalue.struct_type)
+        
+    def visit_call_rvalue(self, call_rvalue):
+        '''Indents, writes fun, writes '(', visits args without indent, writes ')' ''' 
+        self.printIndent()
+        self.checkIfNoneWrite(call_rvalue.fun)
+        self.__write('(')
+        plan = [(self.__set_indent, 0)]
+        plan.extend(call_rvalue.args)
+        plan.append((self.__write, ')'))
+        plan.append((self.__set_indent, self.indent))
+        return plan
+        
+    def visit_id_rvalue(self, id_rvalue):
+        '''Writes the path'''
+        i = 0 
+        while id_rvalue.path[i] != id_rvalue.path[-1]:
+            self.checkIfNoneWrite(id_rvalue.path[i])
+            self.__write('.')
+            i += 1
+        self.checkIfNoneWrite(id_rvalue.path[i])
+
+    def visit_error_stmt(self, error_stmt):
+        '''Indents and writes the error as a comment'''
+        self.printIndent()
+        self.__write('# ' + str(error_stmt.error) + '\n')
+
+    '''HELPER FUNCTIONS'''
+        
+    def checkIfNoneWrite(self, visitingNode):
+        '''if the visitingNode is not None type then, if the visitingNode is a string 
+        prints quotes before and after the lexeme else just prints the lexeme'''
+        if visitingNode is not None:
+            self.__write(self.__text(visitingNode))
+
+    def printIndent(self):
+        '''buffers the proper indent'''
+        if self.indent:
+            self.__write('    ' * self.indent)
+
+    def __text(self, visitingNode):
+        '''Returns what checkIfNoneWrite writes for a token'''
+        if visitingNode is None:
+            return ''
+        if visitingNode.tokentype == token.STRINGVAL:
+            return '"' + visitingNode.lexeme + '"'
+        return visitingNode.lexeme
+
+    def __line(self, text):
+        '''Indents and writes text'''
+        self.printIndent()
+        self.__write(text)
+
+    def __shift(self, levels):
+        self.indent += levels
+
+    def __set_indent(self, indent):
+        self.indent = indent
+
+    def __flush_if_full(self, unused):
+        if len(self.__chunks) >= self.flush_threshold:
+            self.flush()
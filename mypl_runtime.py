@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Values, operators and built-in functions shared by the MyPL
+#   execution backends
+#----------------------------------------------------------------------
+import operator
+import sys
+
+import mypl_error as error
+import mypl_token as token
+
+def literal(tok):
+    '''Returns the value of a literal token (INTVAL, FLOATVAL, BOOLVAL,
+    STRINGVAL or NIL)'''
+    try:
+        if tok.tokentype == token.INTVAL:
+            return int(tok.lexeme)
+        elif tok.tokentype == token.FLOATVAL:
+            return float(tok.lexeme)
+    except ValueError:
+        raise error.MyPLError("invalid number '" + tok.lexeme + "'", tok.line, tok.column)
+    if tok.tokentype == token.BOOLVAL:
+        return tok.lexeme == 'true'
+    elif tok.tokentype == token.STRINGVAL:
+        return tok.lexeme
+    return None
+
+def to_string(value):
+    '''Returns the text MyPL prints for a value'''
+    if value is None:
+        return 'nil'
+    elif value is True:
+        return 'true'
+    elif value is False:
+        return 'false'
+    return str(value)
+
+def divide(a, b):
+    '''Integer division truncates toward zero as in C; floats divide exactly'''
+    if type(a) is int and type(b) is int:
+        q = abs(a) // abs(b)
+        return q if (a < 0) == (b < 0) else -q
+    return a / b
+
+def modulo(a, b):
+    '''The remainder takes the sign of the dividend as in C'''
+    if type(a) is int and type(b) is int:
+        r = abs(a) % abs(b)
+        return -r if a < 0 else r
+    raise TypeError('modulo needs int operands')
+
+MATH = {
+    token.PLUS: operator.add,
+    token.MINUS: operator.sub,
+    token.MULTIPLY: operator.mul,
+    token.DIVIDE: divide,
+    token.MODULO: modulo,
+}
+
+COMPARE = {
+    token.EQUAL: operator.eq,
+    token.NOT_EQUAL: operator.ne,
+    token.LESS_THAN: operator.lt,
+    token.LESS_THAN_EQUAL: operator.le,
+    token.GREATER_THAN: operator.gt,
+    token.GREATER_THAN_EQUAL: operator.ge,
+}
+
+# chains of operators longer than this are compiled to run in a loop, as
+# nested code would recurse once per operator
+LONG_CHAIN = 16
+
+# errors a backend turns into a MyPLError at the position of the operation
+FAULTS = (TypeError, ValueError, IndexError, ZeroDivisionError, KeyError)
+
+def fault_message(exc):
+    '''Returns the MyPL error message for a Python exception in FAULTS'''
+    if isinstance(exc, ZeroDivisionError):
+        return 'division by zero'
+    elif isinstance(exc, TypeError):
+        return 'invalid operand types'
+    return str(exc)
+
+#------------------BUILT-IN FUNCTIONS-----------------
+def mypl_print(value):
+    sys.stdout.write(to_string(value).replace('\\n', '\n'))
+
+def mypl_length(s):
+    return len(s)
+
+def mypl_get(i, s):
+    if not 0 <= i < len(s):
+        raise IndexError('index %i out of range' % i)
+    return s[i]
+
+def mypl_reads():
+    return sys.stdin.readline().rstrip('\n')
+
+def mypl_readi():
+    return int(mypl_reads())
+
+def mypl_readf():
+    return float(mypl_reads())
+
+def mypl_itos(i):
+    return str(i)
+
+def mypl_itof(i):
+    return float(i)
+
+def mypl_ftos(f):
+    return str(f)
+
+def mypl_stoi(s):
+    return int(s)
+
+def mypl_stof(s):
+    return float(s)
+
+# name -> (function, number of arguments, return type)
+BUILTINS = {
+    'print': (mypl_print, 1, 'nil'),
+    'length': (mypl_length, 1, 'int'),
+    'get': (mypl_get, 2, 'string'),
+    'reads': (mypl_reads, 0, 'string'),
+    'readi': (mypl_readi, 0, 'int'),
+    'readf': (mypl_readf, 0, 'float'),
+    'itos': (mypl_itos, 1, 'string'),
+    'itof': (mypl_itof, 1, 'float'),
+    'ftos': (mypl_ftos, 1, 'string'),
+    'stoi': (mypl_stoi, 1, 'int'),
+    'stof': (mypl_stof, 1, 'float'),
+}
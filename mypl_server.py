@@ -0,0 +1,415 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Serves tokens, ASTs, pretty printing and diagnostics from one
+#   long-running process over a Unix socket or stdio, so editors and
+#   hooks skip interpreter startup and imports on every call
+#----------------------------------------------------------------------
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import io
+import json
+import os
+import stat
+import sys
+
+import mypl_ast as ast
+import mypl_binary_ast as binary_ast
+import mypl_error as error
+import mypl_lexer as lexer
+import mypl_parser as parser
+import mypl_print_visitor as ast_printer
+import mypl_token as token
+import mypl_type_checker as type_checker
+
+METHODS = ('tokens', 'ast', 'format', 'diagnostics', 'shutdown')
+CACHE_SIZE = 64                     # parsed documents kept
+OFFLOAD_SIZE = 32 * 1024            # characters above which work leaves the event loop
+MAX_REQUEST = 256 * 1024 * 1024     # longest request line, in bytes
+ANNOTATIONS = ('type', 'symbol')    # slots set by the type checker, not sent
+
+_sent_fields = {}   # AST class -> (class name, fields sent)
+
+class RequestError(Exception):
+    """A request the server cannot act on, e.g. an unknown method"""
+
+
+class Document(object):
+    """A parsed document: its tree, or the errors that kept it from one"""
+    __slots__ = ('stmt_list', 'errors', 'type_errors', 'size')
+
+    def __init__(self, stmt_list, errors, size):
+        self.stmt_list = stmt_list      # StmtList, None if there were errors
+        self.errors = errors            # [MyPLError] from lexing and parsing
+        self.type_errors = None         # [MyPLError] once type checked
+        self.size = size                # characters in the text
+
+    def tree(self):
+        '''Returns the tree, raising the first error if there is none'''
+        if self.errors:
+            raise self.errors[0]
+        return self.stmt_list
+
+
+class Server(object):
+    """Answers requests of one JSON object per line:
+
+        {"id": 1, "method": "format", "params": {"uri": "a.mypl",
+         "version": 3, "text": "...", "precedence": false, "parser": "descent"}}
+
+    with {"id": 1, "result": ...} or {"id": 1, "error": {"message": ...}},
+    the error giving line and column for MyPL errors. Replies may come out
+    of order. Parsed documents are kept by (uri, version) in an LRU, so
+    the text may be left out once a version was sent. The event loop only
+    reads and writes lines: work on texts longer than offload_size runs
+    elsewhere. Lexing and parsing go to a pool of jobs processes (one per
+    CPU by default; 1 for none), and everything else, such as printing a
+    tree, to a thread that handles one request at a time, so a tree is
+    never walked by two threads at once"""
+
+    def __init__(self, jobs=None, cache_size=CACHE_SIZE, offload_size=OFFLOAD_SIZE):
+        self.documents = collections.OrderedDict()  # key -> Document, oldest first
+        self.pending = {}       # key -> Future of the parse in progress
+        self.connections = {}   # Task serving a connection -> its StreamReader
+        self.cache_size = cache_size
+        self.offload_size = offload_size
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+        self.pool = concurrent.futures.ProcessPoolExecutor(jobs) if jobs > 1 else None
+        self.thread = concurrent.futures.ThreadPoolExecutor(1)
+        self.stopped = None     # asyncio.Event, set by a shutdown request
+
+    async def serve_unix(self, path):
+        '''Serves every connection to the Unix socket at path until shut down'''
+        self.stopped = asyncio.Event()
+        remove_socket(path)
+        server = await asyncio.start_unix_server(self.__serve_connection, path,
+            limit=MAX_REQUEST)
+        try:
+            await self.stopped.wait()
+        finally:
+            server.close()
+            await self.__close_connections()
+            await server.wait_closed()
+            remove_socket(path)
+
+    async def serve_stdio(self):
+        '''Serves requests from stdin until it ends or a shutdown request'''
+        self.stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=MAX_REQUEST)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        out = sys.stdout.buffer
+        async def write(data):
+            out.write(data)
+            out.flush()
+        connection = asyncio.ensure_future(self.__serve_lines(reader, write))
+        stopped = asyncio.ensure_future(self.stopped.wait())
+        await asyncio.wait((connection, stopped), return_when=asyncio.FIRST_COMPLETED)
+        stopped.cancel()
+        await self.__close_connections()
+
+    async def handle(self, line):
+        '''Returns the reply to one request line, as a line of JSON'''
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                raise RequestError('invalid JSON: %s' % e)
+            if not isinstance(request, dict):
+                raise RequestError('a request must be a JSON object')
+            request_id = request.get('id')
+            method = request.get('method')
+            params = request.get('params') or {}
+            if method not in METHODS:
+                raise RequestError('unknown method %r' % (method,))
+            if not isinstance(params, dict):
+                raise RequestError('params must be a JSON object')
+            result = await getattr(self, 'method_' + method)(params)
+        except error.MyPLError as e:
+            return reply(request_id, error=error_json(e))
+        except RequestError as e:
+            return reply(request_id, error={'message': str(e)})
+        except Exception as e:
+            return reply(request_id, error={'message': 'internal error: %r' % e})
+        return reply(request_id, result)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+        self.thread.shutdown()
+
+    #------------------METHODS-----------------
+    async def method_tokens(self, params):
+        text = params.get('text')
+        if not isinstance(text, str):
+            raise RequestError('missing text')
+        return await self.__run(len(text), lex_text, text)
+
+    async def method_ast(self, params):
+        document = await self.__document(params)
+        return await self.__run_here(document.size, tree_json, document.tree())
+
+    async def method_format(self, params):
+        document = await self.__document(params)
+        return await self.__run_here(document.size, format_json, document.tree())
+
+    async def method_diagnostics(self, params):
+        '''Lists the errors of a document: every syntax error the parser
+        recovered from, or else the first type error'''
+        document = await self.__document(params)
+        errors = document.errors
+        if not errors:
+            if document.type_errors is None:
+                document.type_errors = await self.__run_here(document.size, 
+                    type_errors, document.stmt_list)
+            errors = document.type_errors
+        return json.dumps([error_json(e) for e in errors])
+
+    async def method_shutdown(self, params):
+        self.stopped.set()
+        return 'null'
+
+    #------------------HELPER FUNCTIONS-----------------
+    async def __serve_connection(self, reader, writer):
+        async def write(data):
+            writer.write(data)
+            await writer.drain()
+        try:
+            await self.__serve_lines(reader, write)
+        finally:
+            writer.close()
+
+    async def __serve_lines(self, reader, write):
+        '''Answers each line from reader in its own task, so a slow request
+        does not hold up the ones after it, until the input ends or the
+        server is shut down; then waits for the replies in progress'''
+        self.connections[asyncio.current_task()] = reader
+        tasks = set()
+        try:
+            while not self.stopped.is_set():
+                try:
+                    line = await reader.readline()
+                except ValueError:      # longer than MAX_REQUEST
+                    await write(reply(None, error={'message': 'request too long'}).encode())
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.ensure_future(self.__respond(line, write))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(set(tasks))
+        finally:
+            del self.connections[asyncio.current_task()]
+
+    async def __respond(self, line, write):
+        await write((await self.handle(line)).encode('utf-8'))
+
+    async def __close_connections(self):
+        '''Ends every connection once its replies in progress are written'''
+        for reader in self.connections.values():
+            reader.feed_eof()
+        if self.connections:
+            await asyncio.wait(list(self.connections))
+
+    async def __run(self, size, function, *args):
+        '''Calls function(*args) for a text of size characters: in the pool
+        when it is long, or in the thread if there is no pool'''
+        if size <= self.offload_size:
+            return function(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool or self.thread, function, *args)
+
+    async def __run_here(self, size, function, *args):
+        '''Calls function(*args) on a tree of this process, in the thread
+        when its text was long'''
+        if size <= self.offload_size:
+            return function(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.thread, function, *args)
+
+    async def __document(self, params):
+        '''Returns the Document the params name, parsing it unless the LRU
+        has it or another request is already parsing it'''
+        text = params.get('text')
+        if text is not None and not isinstance(text, str):
+            raise RequestError('text must be a string')
+        precedence = bool(params.get('precedence', False))
+        engine = params.get('parser', 'descent')
+        if engine not in parser.ENGINES:
+            raise RequestError('unknown parser %r' % (engine,))
+        uri, version = params.get('uri'), params.get('version')
+        if uri is None or version is None:
+            if text is None:
+                raise RequestError('missing text')
+            return await self.__parse(text, precedence, engine)
+        key = (str(uri), json.dumps(version), precedence, engine)
+        document = self.documents.get(key)
+        if document is not None:
+            self.documents.move_to_end(key)
+            return document
+        if key not in self.pending:
+            if text is None:
+                raise RequestError('unknown document %s version %s' % (uri, version))
+            self.pending[key] = asyncio.ensure_future(self.__parse(text, precedence, engine))
+            self.pending[key].add_done_callback(lambda future: self.__store(key, future))
+        return await asyncio.shield(self.pending[key])
+
+    def __store(self, key, future):
+        del self.pending[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.documents[key] = future.result()
+        while len(self.documents) > self.cache_size:
+            self.documents.popitem(last=False)
+
+    async def __parse(self, text, precedence, engine):
+        '''Parses text into a Document. A worker process sends the tree
+        back in binary form, which is decoded lazily'''
+        if self.pool is None or len(text) <= self.offload_size:
+            stmt_list, errors = await self.__run(len(text), parse_text, text, precedence,
+                engine)
+            return Document(stmt_list, errors, len(text))
+        data, errors = await self.__run(len(text), parse_binary, text, precedence, engine)
+        return Document(binary_ast.loads(data) if data is not None else None,
+            [error.MyPLError(*e) for e in errors], len(text))
+
+
+def parse_text(text, precedence=False, engine='descent'):
+    '''Parses text, recovering from errors when the engine can, and returns
+    the tree (None if there were errors) and the list of errors. Text
+    nested too deeply for recursive descent is parsed with the LL(1)
+    table, which builds the same tree without recursion'''
+    the_parser = parser.make_parser(lexer.make_lexer(io.StringIO(text)), engine,
+        precedence, recover=engine == 'descent')
+    try:
+        try:
+            stmt_list = the_parser.parse()
+        except RecursionError:
+            if engine == 'll1':
+                raise
+            the_parser = parser.make_parser(lexer.make_lexer(io.StringIO(text)), 'll1',
+                precedence)
+            stmt_list = the_parser.parse()
+    except error.MyPLError as e:
+        return None, [e]
+    errors = getattr(the_parser, 'errors', [])
+    return (None if errors else stmt_list), errors
+
+def parse_binary(text, precedence=False, engine='descent'):
+    '''Does what parse_text does, returning the tree in binary form and the
+    errors as (message, line, column), which can leave a worker process'''
+    stmt_list, errors = parse_text(text, precedence, engine)
+    data = binary_ast.dumps(stmt_list) if stmt_list is not None else None
+    return data, [(e.message, e.line, e.column) for e in errors]
+
+def lex_text(text):
+    '''Returns the tokens of text as a JSON list'''
+    the_lexer = lexer.make_lexer(io.StringIO(text))
+    return json.dumps([token_json(tok) for tok in the_lexer.tokens()])
+
+def tree_json(stmt_list):
+    '''Returns the JSON text of a tree: nodes become objects naming their
+    class, tokens [type, lexeme, line, column] lists. The text is written
+    from an explicit stack, as json.dumps would recurse on nesting'''
+    pieces = []
+    stack = [(False, stmt_list)]     # (is text, text or value), next last
+    while stack:
+        is_text, value = stack.pop()
+        if is_text:
+            pieces.append(value)
+        elif isinstance(value, list):
+            items = [(True, '[')]
+            for i, item in enumerate(value):
+                if i:
+                    items.append((True, ', '))
+                items.append((False, item))
+            items.append((True, ']'))
+            stack.extend(reversed(items))
+        elif isinstance(value, (ast.ASTNode, ast.BasicIf)):
+            name, fields = sent_fields(type(value))
+            items = [(True, '{"node": ' + json.dumps(name))]
+            for field in fields:
+                items.append((True, ', %s: ' % json.dumps(field)))
+                items.append((False, getattr(value, field)))
+            items.append((True, '}'))
+            stack.extend(reversed(items))
+        elif isinstance(value, token.Token):
+            pieces.append(json.dumps(token_json(value)))
+        else:
+            pieces.append(json.dumps(value))
+    return ''.join(pieces)
+
+def format_json(stmt_list):
+    printer = ast_printer.PrintWalker()
+    ast.walk(stmt_list, printer)
+    return json.dumps(printer.to_string())
+
+def type_errors(stmt_list):
+    '''Type checks the tree and returns the list of its first error'''
+    try:
+        type_checker.check(stmt_list)
+    except error.MyPLError as e:
+        return [e]
+    return []
+
+def sent_fields(cls):
+    '''Returns the class name and the fields sent for an AST class; lazily
+    loaded nodes go by the class they stand for'''
+    if cls not in _sent_fields:
+        base, fields = ast.node_fields(cls)
+        _sent_fields[cls] = (base.__name__, tuple(f for f in fields if f not in ANNOTATIONS))
+    return _sent_fields[cls]
+
+def token_json(tok):
+    return [str(tok.tokentype), tok.lexeme, tok.line, tok.column]
+
+def error_json(e):
+    return {'message': e.message, 'line': e.line, 'column': e.column}
+
+def reply(request_id, result=None, error=None):
+    '''Returns a reply line; result is already JSON text'''
+    if error is not None:
+        return '{"id": %s, "error": %s}\n' % (json.dumps(request_id), json.dumps(error))
+    return '{"id": %s, "result": %s}\n' % (json.dumps(request_id), result)
+
+def remove_socket(path):
+    '''Removes a socket left behind at path, leaving anything else alone'''
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description='Serve MyPL tokens, ASTs, formatting and diagnostics as JSON lines')
+    arg_parser.add_argument('--socket', metavar='PATH',
+        help='listen on this Unix socket (default: stdin and stdout)')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=None,
+        help='worker processes for long documents (default: one per CPU, 1: none)')
+    arg_parser.add_argument('--cache-size', type=int, default=CACHE_SIZE,
+        help='parsed documents to keep')
+    arg_parser.add_argument('--offload-size', type=int, default=OFFLOAD_SIZE,
+        help='characters above which a document is handled in a worker')
+    args = arg_parser.parse_args(argv)
+    server = Server(args.jobs, args.cache_size, args.offload_size)
+    try:
+        if args.socket is not None:
+            asyncio.run(server.serve_unix(args.socket))
+        else:
+            asyncio.run(server.serve_stdio())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
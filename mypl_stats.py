@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Records where the time and memory of a run go: wall and CPU time
+#   and peak memory per phase, tokens by type, AST nodes by class and
+#   the bytes written. Nothing here runs unless a Stats is created
+#----------------------------------------------------------------------
+import collections
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:     # not on Windows
+    resource = None
+
+import mypl_ast as ast
+
+class TokenList(object):
+    """Hands a Parser tokens that were already lexed"""
+
+    def __init__(self, token_list):
+        self.token_list = token_list
+
+    def tokens(self):
+        return iter(self.token_list)
+
+
+class CountingStream(object):
+    """Writes through to a stream, counting the bytes written"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes = 0
+
+    def write(self, s):
+        self.bytes += len(s.encode('utf-8'))
+        return self.stream.write(s)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class Stats(object):
+    """Measurements of one run. Each phase() block records its wall time,
+    CPU time and, when memory is traced, its peak of traced memory above
+    what was allocated before it. Tracing memory slows allocation-heavy
+    phases such as lexing by up to ten times, so it is off by default and
+    only the peak resident size of the process is reported"""
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.phases = collections.OrderedDict()     # name -> measurements
+        self.token_counts = collections.Counter()   # token type name -> count
+        self.node_counts = collections.Counter()    # AST class name -> count
+        self.output = None                          # CountingStream
+        self.extra = {}                             # other facts, e.g. cache use
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        '''Measures the enclosed block as the named phase'''
+        if self.memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            record = {
+                'wall_seconds': round(time.perf_counter() - wall, 6),
+                'cpu_seconds': round(time.process_time() - cpu, 6),
+            }
+            if self.memory:
+                record['peak_bytes'] = tracemalloc.get_traced_memory()[1] - base
+            self.phases[name] = record
+
+    def count_tokens(self, tokens):
+        '''Returns the tokens as a list, counting them by type'''
+        token_list = list(tokens)
+        self.token_counts.update(str(tok.tokentype) for tok in token_list)
+        return token_list
+
+    def count_nodes(self, stmt_list):
+        # by AST class, so nodes loaded lazily from the cache count as theirs
+        self.node_counts.update(ast.node_fields(type(node))[0].__name__
+            for node in ast.nodes(stmt_list))
+
+    def counting_stream(self, stream):
+        self.output = CountingStream(stream)
+        return self.output
+
+    def to_dict(self):
+        return {
+            'phases': self.phases,
+            'tokens': sum(self.token_counts.values()),
+            'tokens_by_type': dict(self.token_counts.most_common()),
+            'nodes': sum(self.node_counts.values()),
+            'nodes_by_class': dict(self.node_counts.most_common()),
+            'output_bytes': self.output.bytes if self.output is not None else 0,
+            'max_rss_kb': max_rss_kb(),
+            'extra': self.extra,
+        }
+
+    def write_json(self, path):
+        with open(path, 'w') as out:
+            json.dump(self.to_dict(), out, indent=2)
+
+    def write_summary(self, stream=None):
+        stream = stream or sys.stderr
+        for name, record in self.phases.items():
+            line = '%-8s %10.4f s wall %10.4f s cpu' % (name, record['wall_seconds'],
+                record['cpu_seconds'])
+            if 'peak_bytes' in record:
+                line += ' %12i bytes peak' % record['peak_bytes']
+            stream.write(line + '\n')
+        data = self.to_dict()
+        stream.write('tokens   %10i  %s\n' % (data['tokens'], top(self.token_counts)))
+        stream.write('nodes    %10i  %s\n' % (data['nodes'], top(self.node_counts)))
+        stream.write('output   %10i bytes\n' % data['output_bytes'])
+        if data['max_rss_kb'] is not None:
+            stream.write('max rss  %10i KB\n' % data['max_rss_kb'])
+        for name, value in self.extra.items():
+            stream.write('%-8s %10s\n' % (name, value))
+
+
+def max_rss_kb():
+    '''Returns the peak resident size of the process in KB, if known'''
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+def top(counter, n=5):
+    '''Formats the n most common entries of a Counter'''
+    return ', '.join('%s %i' % item for item in counter.most_common(n))
@@ -4,52 +4,113 @@
 # Description:
 #   Can produce a printed output of the token's qualities
 #----------------------------------------------------------------------
-AND = 'AND'	
-ASSIGN = 'ASSIGN'
-BOOLTYPE = 'BOOLTYPE'	
-BOOLVAL = 'BOOLVAL'	
-COLON = 'COLON'
-COMMA = 'COMMA'
-DIVIDE = 'DIVIDE'
-DO = 'DO'
-DOT = 'DOT'
-ELIF = 'ELIF'	
-ELSE = 'ELSE'	
-END = 'END'	
-EOS = 'EOS'
-EQUAL = 'EQUAL' 
-FLOATTYPE = 'FLOATTYPE' 
-FLOATVAL = 'FLOATVAL'	
-FUN = 'FUN'	
-GREATER_THAN = 'GREATER_THAN'
-GREATER_THAN_EQUAL = 'GREATER_THAN_EQUAL'
-ID = 'ID'
-IF = 'IF'	
-INTTYPE = 'INTTYPE'
-INTVAL = 'INTVAL'	
-LESS_THAN = 'LESS_THAN'
-LESS_THAN_EQUAL = 'LESS_THAN_EQUAL'
-LPAREN = 'LPAREN'
-MINUS = 'MINUS'
-MODULO = 'MODULO'
-MULTIPLY = 'MULTIPLY'
-NEW	 = 'NEW'
-NIL = 'NIL'	
-NOT = 'NOT'	
-NOT_EQUAL = 'NOT_EQUAL'
-OR = 'OR'
-PLUS = 'PLUS'
-RETURN = 'RETURN'	
-RPAREN = 'RPAREN'
-SEMICOLON = 'SEMICOLON'	
-SET = 'SET'	
-STRINGTYPE = 'STRINGTYPE'	
-STRINGVAL = 'STRINGVAL' 
-STRUCTTYPE = 'STRUCTTYPE'	
-THEN = 'THEN'
-VAR = 'VAR'
-WHILE = 'WHILE'	
+import collections
+import enum
+
+class TokenType(enum.IntEnum):
+    """Token kinds as small integers. The names are only used for display, 
+    so str() and format() give the name instead of the number"""
+    AND = 0
+    ASSIGN = 1
+    BOOLTYPE = 2
+    BOOLVAL = 3
+    COLON = 4
+    COMMA = 5
+    DIVIDE = 6
+    DO = 7
+    DOT = 8
+    ELIF = 9
+    ELSE = 10
+    END = 11
+    EOS = 12
+    EQUAL = 13
+    FLOATTYPE = 14
+    FLOATVAL = 15
+    FUN = 16
+    GREATER_THAN = 17
+    GREATER_THAN_EQUAL = 18
+    ID = 19
+    IF = 20
+    INTTYPE = 21
+    INTVAL = 22
+    LESS_THAN = 23
+    LESS_THAN_EQUAL = 24
+    LPAREN = 25
+    MINUS = 26
+    MODULO = 27
+    MULTIPLY = 28
+    NEW = 29
+    NIL = 30
+    NOT = 31
+    NOT_EQUAL = 32
+    OR = 33
+    PLUS = 34
+    RETURN = 35
+    RPAREN = 36
+    SEMICOLON = 37
+    SET = 38
+    STRINGTYPE = 39
+    STRINGVAL = 40
+    STRUCTTYPE = 41
+    THEN = 42
+    VAR = 43
+    WHILE = 44
+
+    def __str__(self):
+        return self.name
+
+    def __format__(self, spec):
+        return format(self.name, spec)
+
+AND = TokenType.AND
+ASSIGN = TokenType.ASSIGN
+BOOLTYPE = TokenType.BOOLTYPE
+BOOLVAL = TokenType.BOOLVAL
+COLON = TokenType.COLON
+COMMA = TokenType.COMMA
+DIVIDE = TokenType.DIVIDE
+DO = TokenType.DO
+DOT = TokenType.DOT
+ELIF = TokenType.ELIF
+ELSE = TokenType.ELSE
+END = TokenType.END
+EOS = TokenType.EOS
+EQUAL = TokenType.EQUAL
+FLOATTYPE = TokenType.FLOATTYPE
+FLOATVAL = TokenType.FLOATVAL
+FUN = TokenType.FUN
+GREATER_THAN = TokenType.GREATER_THAN
+GREATER_THAN_EQUAL = TokenType.GREATER_THAN_EQUAL
+ID = TokenType.ID
+IF = TokenType.IF
+INTTYPE = TokenType.INTTYPE
+INTVAL = TokenType.INTVAL
+LESS_THAN = TokenType.LESS_THAN
+LESS_THAN_EQUAL = TokenType.LESS_THAN_EQUAL
+LPAREN = TokenType.LPAREN
+MINUS = TokenType.MINUS
+MODULO = TokenType.MODULO
+MULTIPLY = TokenType.MULTIPLY
+NEW = TokenType.NEW
+NIL = TokenType.NIL
+NOT = TokenType.NOT
+NOT_EQUAL = TokenType.NOT_EQUAL
+OR = TokenType.OR
+PLUS = TokenType.PLUS
+RETURN = TokenType.RETURN
+RPAREN = TokenType.RPAREN
+SEMICOLON = TokenType.SEMICOLON
+SET = TokenType.SET
+STRINGTYPE = TokenType.STRINGTYPE
+STRINGVAL = TokenType.STRINGVAL
+STRUCTTYPE = TokenType.STRUCTTYPE
+THEN = TokenType.THEN
+VAR = TokenType.VAR
+WHILE = TokenType.WHILE
+
 class Token(object):
+    __slots__ = ('tokentype', 'lexeme', 'line', 'column')
+
     def __init__(self, tokentype, lexeme, line, column):
         self.tokentype = tokentype 
         self.lexeme = lexeme 
@@ -59,4 +120,52 @@ class Token(object):
     def __str__(self):
         """ Returns the string to be printed if all goes well """
         s = str(self.tokentype) + " '" + str(self.lexeme)+ "' " + str(self.line) + ':' + str(self.column)
-        return s
\ No newline at end of file
+        return s
+
+class TokenBuffer(object):
+    """Bounded lookahead over a stream of tokens, such as Lexer.tokens(). 
+    At most size tokens are held in a ring buffer. Once the EOS token has 
+    been reached, advance() and peek() keep returning it"""
+
+    def __init__(self, tokens, size=4):
+        self.tokens = iter(tokens)
+        self.size = size
+        self.ring = collections.deque()
+        self.eos = None                 # the EOS token once it was read
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        '''Iterates up to and including the EOS token'''
+        if self.eos is not None and not self.ring:
+            raise StopIteration
+        return self.advance()
+    
+    def advance(self):
+        '''Consumes and returns the next token'''
+        if self.ring:
+            return self.ring.popleft()
+        return self.__fill()
+    
+    def peek(self, k=1):
+        '''Returns the k-th upcoming token (1 is the next) without consuming it'''
+        if not 0 < k <= self.size:
+            raise IndexError('lookahead %i outside 1..%i' % (k, self.size))
+        ring = self.ring
+        while len(ring) < k and self.eos is None:
+            ring.append(self.__fill())
+        if len(ring) < k:   # past the end: EOS is held once, not repeated
+            return self.eos
+        return ring[k - 1]
+    
+    def __fill(self):
+        '''Reads one token from the underlying stream'''
+        if self.eos is not None:
+            return self.eos
+        tok = next(self.tokens, None)
+        if tok is None:
+            raise ValueError('token stream ended without an EOS token')
+        if tok.tokentype == EOS:
+            self.eos = tok
+        return tok
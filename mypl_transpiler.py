@@ -0,0 +1,436 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Translates a MyPL AST into a Python ast.Module and runs it with
+#   compile() and exec(). Every generated node carries the line and
+#   column of its MyPL token, so runtime errors report MyPL positions
+#----------------------------------------------------------------------
+import ast as pyast
+
+import mypl_ast as ast
+import mypl_error as error
+import mypl_runtime as runtime
+import mypl_token as token
+
+# file name of the generated code, to find its frames in tracebacks
+FILENAME = '<mypl>'
+
+MATH_OPS = {
+    token.PLUS: pyast.Add,
+    token.MINUS: pyast.Sub,
+    token.MULTIPLY: pyast.Mult,
+}
+
+# operators without a Python equivalent call these runtime helpers
+MATH_HELPERS = {
+    token.DIVIDE: '_divide',
+    token.MODULO: '_modulo',
+}
+
+COMPARE_OPS = {
+    token.EQUAL: pyast.Eq,
+    token.NOT_EQUAL: pyast.NotEq,
+    token.LESS_THAN: pyast.Lt,
+    token.LESS_THAN_EQUAL: pyast.LtE,
+    token.GREATER_THAN: pyast.Gt,
+    token.GREATER_THAN_EQUAL: pyast.GtE,
+}
+
+class Transpiler(ast.Visitor):
+    """Builds a Python module from a StmtList. Functions become f_<name>,
+    structs a slotted class S_<name> with a new_<name> function running
+    the field initializers, and the main program becomes mypl_main().
+    Every MyPL variable gets its own v_<name> local, numbered when a
+    name is declared again in an inner block"""
+
+    def __init__(self):
+        self.functions = {}     # name -> number of parameters
+        self.structs = set()
+        self.scopes = []        # [{name: python name}] innermost last
+        self.used = set()       # python names of the current function
+        self.temps = 0          # temporaries _t<n> made for long chains
+        self.node = None        # python node of the MyPL node just visited
+
+    def module(self, stmt_list):
+        '''Returns the Python ast.Module for stmt_list'''
+        self.__declare_globals(stmt_list)
+        body = []
+        main = []
+        for stmt in stmt_list.stmts:
+            if isinstance(stmt, (ast.FunDeclStmt, ast.StructDeclStmt)):
+                stmt.accept(self)
+                body.extend(self.node)
+            else:
+                main.append(stmt)
+        main_list = ast.StmtList()
+        main_list.stmts = main
+        self.__new_function()
+        body.append(self.__function_def('mypl_main', [], self.__block(main_list), None))
+        module = pyast.Module(body=body, type_ignores=[])
+        return pyast.fix_missing_locations(module)
+
+    #------------------STATEMENTS-----------------
+    def visit_stmt_list(self, stmt_list):
+        self.node = self.__block(stmt_list)
+
+    def visit_expr_stmt(self, expr_stmt):
+        value = self.__expr(expr_stmt.expr)
+        self.node = [located(pyast.Expr(value=value), ast.first_token(expr_stmt.expr))]
+
+    def visit_var_decl_stmt(self, var_decl):
+        value = self.__expr(var_decl.var_expr)
+        name = self.__declare(var_decl.var_id)
+        target = located(pyast.Name(id=name, ctx=pyast.Store()), var_decl.var_id)
+        self.node = [located(pyast.Assign(targets=[target], value=value), var_decl.var_id)]
+
+    def visit_assign_stmt(self, assign_stmt):
+        value = self.__expr(assign_stmt.rhs)
+        path = assign_stmt.lhs.path
+        target = self.__path(path, pyast.Store())
+        self.node = [located(pyast.Assign(targets=[target], value=value), path[0])]
+
+    def visit_struct_decl_stmt(self, struct_decl):
+        name = struct_decl.struct_id.lexeme
+        struct_id = struct_decl.struct_id
+        fields = list(dict.fromkeys(var_decl.var_id.lexeme
+            for var_decl in struct_decl.var_decls))
+        slots = pyast.Tuple(elts=[pyast.Constant(value=field) for field in fields],
+            ctx=pyast.Load())
+        class_def = pyast.ClassDef(name='S_' + name, bases=[], keywords=[],
+            body=[pyast.Assign(targets=[pyast.Name(id='__slots__', ctx=pyast.Store())],
+                value=slots)], decorator_list=[])
+        # the initializers run as locals, so later fields can read earlier ones
+        self.__new_function()
+        self.scopes.append({})
+        body = []
+        for var_decl in struct_decl.var_decls:
+            var_decl.accept(self)
+            body.extend(self.node)
+        body.append(located(pyast.Assign(targets=[pyast.Name(id='obj', ctx=pyast.Store())],
+            value=pyast.Call(func=pyast.Name(id='S_' + name, ctx=pyast.Load()), args=[],
+            keywords=[])), struct_id))
+        for field in fields:
+            target = pyast.Attribute(value=pyast.Name(id='obj', ctx=pyast.Load()),
+                attr=field, ctx=pyast.Store())
+            value = pyast.Name(id=self.scopes[-1][field], ctx=pyast.Load())
+            body.append(located(pyast.Assign(targets=[target], value=value), struct_id))
+        body.append(located(pyast.Return(value=pyast.Name(id='obj', ctx=pyast.Load())),
+            struct_id))
+        self.node = [located(class_def, struct_id),
+            self.__function_def('new_' + name, [], body, struct_id)]
+
+    def visit_fun_decl_stmt(self, fun_decl):
+        self.__new_function()
+        params = [pyast.arg(arg=self.__declare(param.param_name))
+            for param in fun_decl.params]
+        body = self.__block(fun_decl.stmt_list)
+        self.node = [self.__function_def('f_' + fun_decl.fun_name.lexeme, params, body,
+            fun_decl.fun_name)]
+
+    def visit_return_stmt(self, return_stmt):
+        value = None
+        if return_stmt.return_expr is not None:
+            value = self.__expr(return_stmt.return_expr)
+        self.node = [located(pyast.Return(value=value), return_stmt.return_token)]
+
+    def visit_while_stmt(self, while_stmt):
+        test = self.__expr(while_stmt.bool_expr)
+        body = self.__block(while_stmt.stmt_list)
+        self.node = [located(pyast.While(test=test, body=body, orelse=[]),
+            ast.first_token(while_stmt.bool_expr))]
+
+    def visit_if_stmt(self, if_stmt):
+        orelse = []
+        if if_stmt.has_else:
+            orelse = self.__block(if_stmt.else_stmts)
+        # elifs nest as the else part of the branch before them
+        branches = [if_stmt.if_part] + if_stmt.elseifs
+        tests = [self.__expr(basic_if.bool_expr) for basic_if in branches]
+        bodies = [self.__block(basic_if.stmt_list) for basic_if in branches]
+        for basic_if, test, body in reversed(list(zip(branches, tests, bodies))):
+            orelse = [located(pyast.If(test=test, body=body, orelse=orelse),
+                ast.first_token(basic_if.bool_expr))]
+        self.node = orelse
+
+    #------------------EXPRESSIONS-----------------
+    def visit_simple_expr(self, simple_expr):
+        simple_expr.term.accept(self)
+
+    def visit_complex_expr(self, complex_expr):
+        if isinstance(complex_expr.rest, ast.ComplexExpr):
+            links = ast.right_chain(complex_expr)
+            if len(links) > runtime.LONG_CHAIN:
+                self.node = self.__right_chain(links)
+                return
+        elif isinstance(complex_expr.first_operand, ast.ComplexExpr):
+            links = ast.left_chain(complex_expr)
+            if len(links) > runtime.LONG_CHAIN:
+                self.node = self.__left_chain(links)
+                return
+        left = self.__expr(complex_expr.first_operand)
+        right = self.__expr(complex_expr.rest)
+        self.node = math(complex_expr.math_rel, left, right)
+
+    def visit_bool_expr(self, bool_expr):
+        # the links of a chain of and/or are translated in order, then joined
+        links = []
+        connectors = []
+        while True:
+            links.append(self.__bool_link(bool_expr))
+            if bool_expr.bool_connector is None:
+                break
+            connectors.append(bool_expr.bool_connector)
+            bool_expr = bool_expr.rest
+        if len(links) > runtime.LONG_CHAIN:
+            # nested BoolOps this deep would overflow Python's compiler
+            lambdas = [pyast.Lambda(args=no_arguments(), body=link) for link in links]
+            kinds = [connector.tokentype == token.AND for connector in connectors] + [None]
+            self.node = located(pyast.Call(func=pyast.Name(id='_bool_chain',
+                ctx=pyast.Load()), args=[pyast.Tuple(elts=lambdas, ctx=pyast.Load()),
+                pyast.Constant(value=tuple(kinds))], keywords=[]), connectors[0])
+            return
+        value = links.pop()
+        while links:
+            connector = connectors.pop()
+            op = pyast.And() if connector.tokentype == token.AND else pyast.Or()
+            value = located(pyast.BoolOp(op=op, values=[links.pop(), value]), connector)
+        self.node = value
+
+    def visit_simple_rvalue(self, simple_rvalue):
+        tok = simple_rvalue.val
+        if tok.tokentype == token.ID:
+            self.node = self.__path([tok], pyast.Load())
+        else:
+            self.node = located(pyast.Constant(value=runtime.literal(tok)), tok)
+
+    def visit_new_rvalue(self, new_rvalue):
+        struct_type = new_rvalue.struct_type
+        if struct_type.lexeme not in self.structs:
+            raise error.MyPLError("undefined struct '" + struct_type.lexeme + "'",
+                struct_type.line, struct_type.column)
+        self.node = located(pyast.Call(func=pyast.Name(id='new_' + struct_type.lexeme,
+            ctx=pyast.Load()), args=[], keywords=[]), struct_type)
+
+    def visit_call_rvalue(self, call_rvalue):
+        fun = call_rvalue.fun
+        if fun.lexeme in self.functions:
+            name = 'f_' + fun.lexeme
+            arity = self.functions[fun.lexeme]
+        elif fun.lexeme in runtime.BUILTINS:
+            name = 'b_' + fun.lexeme
+            arity = runtime.BUILTINS[fun.lexeme][1]
+        else:
+            raise error.MyPLError("undefined function '" + fun.lexeme + "'",
+                fun.line, fun.column)
+        if arity != len(call_rvalue.args):
+            raise error.MyPLError("'%s' takes %i arguments, %i given" % (fun.lexeme, arity,
+                len(call_rvalue.args)), fun.line, fun.column)
+        args = [self.__expr(arg) for arg in call_rvalue.args]
+        self.node = located(pyast.Call(func=pyast.Name(id=name, ctx=pyast.Load()),
+            args=args, keywords=[]), fun)
+
+    def visit_id_rvalue(self, id_rvalue):
+        self.node = self.__path(id_rvalue.path, pyast.Load())
+
+    #------------------HELPER FUNCTIONS-----------------
+    def __expr(self, node):
+        node.accept(self)
+        return self.node
+
+    def __bool_link(self, bool_expr):
+        '''Returns the Python expression of one link of a chain of and/or: a
+        value or a relation, possibly negated'''
+        value = self.__expr(bool_expr.first_expr)
+        if bool_expr.bool_rel is not None:
+            rel = bool_expr.bool_rel
+            value = located(pyast.Compare(left=value, ops=[COMPARE_OPS[rel.tokentype]()],
+                comparators=[self.__expr(bool_expr.second_expr)]), rel)
+        if bool_expr.negated:
+            value = pyast.UnaryOp(op=pyast.Not(), operand=value)
+        return value
+
+    def __right_chain(self, links):
+        '''Returns a flat tuple expression that stores the operands of a
+        right chain in temporaries, in order, then applies the operators
+        from the right, and whose last item is the value'''
+        temps = [self.__temp() for link in links]
+        items = [assign_temp(temp, self.__expr(operand))
+            for temp, (operand, op) in zip(temps, links)]
+        value = temps[-1]
+        for temp, (operand, op) in reversed(list(zip(temps, links[:-1]))):
+            items.append(assign_temp(value, math(op, load(temp), load(value))))
+        return last_item(items, ast.first_token(links[0][0]))
+
+    def __left_chain(self, links):
+        '''Returns a flat tuple expression applying the operators of a left
+        chain to a temporary as it evaluates the operands'''
+        value = self.__temp()
+        items = [assign_temp(value, self.__expr(links[0][1]))]
+        for op, operand in links[1:]:
+            items.append(assign_temp(value, math(op, load(value), self.__expr(operand))))
+        return last_item(items, ast.first_token(links[0][1]))
+
+    def __temp(self):
+        self.temps += 1
+        return '_t' + str(self.temps)
+
+    def __block(self, stmt_list):
+        '''Returns the Python statements for a statement list in a new scope'''
+        self.scopes.append({})
+        body = []
+        for stmt in stmt_list.stmts:
+            stmt.accept(self)
+            body.extend(self.node)
+        self.scopes.pop()
+        return body or [pyast.Pass()]
+
+    def __function_def(self, name, params, body, tok):
+        arguments = no_arguments()
+        arguments.args = params
+        function_def = pyast.FunctionDef(name=name, args=arguments, body=body,
+            decorator_list=[], returns=None)
+        return located(function_def, tok) if tok is not None else function_def
+
+    def __declare_globals(self, stmt_list):
+        for stmt in stmt_list.stmts:
+            if isinstance(stmt, ast.FunDeclStmt):
+                name = stmt.fun_name
+                defined = name.lexeme in self.functions
+                self.functions[name.lexeme] = len(stmt.params)
+            elif isinstance(stmt, ast.StructDeclStmt):
+                name = stmt.struct_id
+                defined = name.lexeme in self.structs
+                self.structs.add(name.lexeme)
+            else:
+                continue
+            if defined:
+                raise error.MyPLError("redefinition of '" + name.lexeme + "'",
+                    name.line, name.column)
+
+    def __new_function(self):
+        self.scopes = [{}]
+        self.used = set()
+
+    def __declare(self, id_token):
+        '''Returns a new Python local for the variable'''
+        name = 'v_' + id_token.lexeme
+        count = 1
+        while name in self.used:
+            count += 1
+            name = 'v_' + id_token.lexeme + '_' + str(count)
+        self.used.add(name)
+        self.scopes[-1][id_token.lexeme] = name
+        return name
+
+    def __path(self, path, ctx):
+        '''Returns the Python expression for a variable and its fields'''
+        first = path[0]
+        for scope in reversed(self.scopes):
+            if first.lexeme in scope:
+                break
+        else:
+            raise error.MyPLError("undefined variable '" + first.lexeme + "'",
+                first.line, first.column)
+        last_ctx = ctx if len(path) == 1 else pyast.Load()
+        node = located(pyast.Name(id=scope[first.lexeme], ctx=last_ctx), first)
+        for i in range(1, len(path)):
+            last_ctx = ctx if i == len(path) - 1 else pyast.Load()
+            node = located(pyast.Attribute(value=node, attr=path[i].lexeme, ctx=last_ctx),
+                path[i])
+        return node
+
+
+def located(node, tok):
+    '''Gives node the position of tok; Python columns count from 0'''
+    column = max(tok.column - 1, 0)
+    node.lineno = node.end_lineno = max(tok.line, 1)
+    node.col_offset = column
+    node.end_col_offset = column + max(len(str(tok.lexeme)), 1)
+    return node
+
+def math(op, left, right):
+    '''Returns the Python expression for left op right'''
+    if op.tokentype in MATH_OPS:
+        node = pyast.BinOp(left=left, op=MATH_OPS[op.tokentype](), right=right)
+    else:
+        node = pyast.Call(func=pyast.Name(id=MATH_HELPERS[op.tokentype],
+            ctx=pyast.Load()), args=[left, right], keywords=[])
+    return located(node, op)
+
+def load(name):
+    return pyast.Name(id=name, ctx=pyast.Load())
+
+def assign_temp(name, value):
+    return pyast.NamedExpr(target=pyast.Name(id=name, ctx=pyast.Store()), value=value)
+
+def last_item(items, tok):
+    '''Returns (items...)[-1], which evaluates items in order'''
+    return located(pyast.Subscript(value=pyast.Tuple(elts=items, ctx=pyast.Load()),
+        slice=pyast.Constant(value=-1), ctx=pyast.Load()), tok)
+
+def no_arguments():
+    return pyast.arguments(posonlyargs=[], args=[], vararg=None, kwonlyargs=[],
+        kw_defaults=[], kwarg=None, defaults=[])
+
+def bool_chain(links, kinds):
+    '''Runs the links of a long chain of and/or in order until one decides
+    its value; kinds holds True for and, False for or, and None last'''
+    for link, is_and in zip(links, kinds):
+        value = link()
+        if is_and is None or (not value if is_and else value):
+            return value
+
+def namespace():
+    '''Returns the globals the generated code runs with'''
+    names = {'_divide': runtime.divide, '_modulo': runtime.modulo,
+        '_bool_chain': bool_chain}
+    for name, (function, arity, return_type) in runtime.BUILTINS.items():
+        names['b_' + name] = function
+    return names
+
+def to_source(stmt_list):
+    '''Returns the generated Python as source text'''
+    return pyast.unparse(Transpiler().module(stmt_list))
+
+def compile_program(stmt_list):
+    '''Returns the code object of the generated module'''
+    return compile(Transpiler().module(stmt_list), FILENAME, 'exec')
+
+def run(stmt_list):
+    '''Compiles and runs a parsed program, reporting faults in the generated
+    code as MyPLErrors at the MyPL position of the failing operation'''
+    names = namespace()
+    exec(compile_program(stmt_list), names)
+    try:
+        names['mypl_main']()
+    except (AttributeError, RecursionError) + runtime.FAULTS as e:
+        line, column = error_position(e.__traceback__)
+        if isinstance(e, RecursionError):
+            msg = 'call stack overflow'
+        elif isinstance(e, AttributeError):
+            # name is not filled in when setting a missing slot, the text is
+            field = str(e).rsplit(' ', 1)[-1].strip("'")
+            if str(e).startswith("'NoneType'"):
+                msg = "nil reference reading field '" + field + "'"
+            else:
+                msg = "no field '" + field + "'"
+        else:
+            msg = runtime.fault_message(e)
+        raise error.MyPLError(msg, line, column)
+
+def error_position(traceback):
+    '''Returns the MyPL line and column of the innermost generated frame'''
+    line = column = 0
+    while traceback is not None:
+        code = traceback.tb_frame.f_code
+        if code.co_filename == FILENAME:
+            line = traceback.tb_lineno
+            column = 0
+            if hasattr(code, 'co_positions'):
+                positions = list(code.co_positions())
+                index = traceback.tb_lasti // 2
+                if index < len(positions) and positions[index][2] is not None:
+                    column = positions[index][2] + 1
+        traceback = traceback.tb_next
+    return line, column
@@ -0,0 +1,384 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Checks the types of a parsed program in one pass over the AST and
+#   records what it finds on the nodes: every expression and rvalue
+#   gets its type, every name its Symbol, so later passes need no
+#   lookups of their own
+#----------------------------------------------------------------------
+import mypl_ast as ast
+import mypl_error as error
+import mypl_token as token
+
+NUMERIC = ('int', 'float')
+
+# type token -> type name; an ID names a struct
+TYPE_NAMES = {
+    token.INTTYPE: 'int',
+    token.FLOATTYPE: 'float',
+    token.BOOLTYPE: 'bool',
+    token.STRINGTYPE: 'string',
+    token.NIL: 'nil',
+}
+
+# literal token -> type name
+LITERAL_TYPES = {
+    token.INTVAL: 'int',
+    token.FLOATVAL: 'float',
+    token.BOOLVAL: 'bool',
+    token.STRINGVAL: 'string',
+    token.NIL: 'nil',
+}
+
+# built-in name -> (parameter types, return type); None takes any type
+BUILTIN_TYPES = {
+    'print': ((None,), 'nil'),
+    'length': (('string',), 'int'),
+    'get': (('int', 'string'), 'string'),
+    'reads': ((), 'string'),
+    'readi': ((), 'int'),
+    'readf': ((), 'float'),
+    'itos': (('int',), 'string'),
+    'itof': (('int',), 'float'),
+    'ftos': (('float',), 'string'),
+    'stoi': (('string',), 'int'),
+    'stof': (('string',), 'float'),
+}
+
+ORDERING = {token.LESS_THAN, token.LESS_THAN_EQUAL, token.GREATER_THAN,
+    token.GREATER_THAN_EQUAL}
+
+MISSING = object()      # marks a name that had no binding before a declare
+
+class Symbol(object):
+    """What a name was declared as. kind is 'var', 'param', 'field',
+    'fun' or 'struct'; type is the variable's type, the function's return
+    type or the struct's name; decl is the declaring node (None for
+    built-ins); members holds a function's parameter types or a struct's
+    fields as name -> Symbol. A type of None is unknown, which is what a
+    variable initialized to nil without a declared type gets"""
+    __slots__ = ('name', 'kind', 'type', 'decl', 'members')
+
+    def __init__(self, name, kind, type_name, decl, members=None):
+        self.name = name
+        self.kind = kind
+        self.type = type_name
+        self.decl = decl
+        self.members = members
+
+    def __repr__(self):
+        return 'Symbol(%s %s: %s)' % (self.kind, self.name, self.type)
+
+
+class Scopes(object):
+    """Nested variable scopes kept in one flat dict. declare() logs the
+    binding it shadows and pop() undoes the log back to the matching
+    push(), so a lookup is a single dict access however deep the nesting"""
+    __slots__ = ('names', 'undo', 'marks')
+
+    def __init__(self):
+        self.names = {}         # name -> Symbol, innermost binding
+        self.undo = []          # [(name, shadowed Symbol or MISSING)]
+        self.marks = []         # len(undo) at each push
+
+    def push(self):
+        self.marks.append(len(self.undo))
+
+    def pop(self):
+        mark = self.marks.pop()
+        names, undo = self.names, self.undo
+        while len(undo) > mark:
+            name, old = undo.pop()
+            if old is MISSING:
+                del names[name]
+            else:
+                names[name] = old
+
+    def declare(self, symbol):
+        self.undo.append((symbol.name, self.names.get(symbol.name, MISSING)))
+        self.names[symbol.name] = symbol
+
+    def lookup(self, name):
+        return self.names.get(name)
+
+
+class TypeChecker(ast.Walker):
+    """Checks a StmtList and annotates it in place. Expressions, rvalues
+    and lvalues get a type; VarDeclStmt, FunParam, FunDeclStmt and
+    StructDeclStmt get the Symbol they declare; SimpleRValue (IDs),
+    IDRvalue, LValue, CallRValue and NewRValue get the Symbol they refer
+    to, which is a variable or parameter for paths. The first error
+    found is raised as a MyPLError.
+
+    Scoping follows the backends: functions and structs are global and
+    usable before their declaration, a function body sees only its
+    parameters, and a struct's fields see the fields declared before
+    them. Numbers mix as at runtime: an int and a float give a float.
+
+    The tree is walked with ast.walk(), so a node's type is worked out in
+    its leave_ hook from those of its children"""
+
+    def __init__(self):
+        self.functions = {}     # name -> Symbol, built-ins included
+        self.structs = {}       # name -> Symbol
+        self.scopes = Scopes()
+        self.return_type = None # declared return type of the current function
+        self.saved = []         # (scopes, return_type) of enclosing functions
+
+    def check(self, stmt_list):
+        '''Checks and annotates the program'''
+        self.__declare_globals(stmt_list)
+        self.scopes = Scopes()
+        self.return_type = None
+        ast.walk(stmt_list, self)
+        return stmt_list
+
+    #------------------STATEMENTS-----------------
+    def visit_stmt_list(self, stmt_list):
+        self.scopes.push()
+
+    def leave_stmt_list(self, stmt_list):
+        self.scopes.pop()
+
+    def leave_var_decl_stmt(self, var_decl):
+        expr_type = var_decl.var_expr.type
+        if var_decl.var_type is not None:
+            var_type = self.__type_name(var_decl.var_type)
+            self.__expect(var_type, expr_type, var_decl.var_id)
+        else:
+            var_type = None if expr_type == 'nil' else expr_type
+        var_decl.symbol = Symbol(var_decl.var_id.lexeme, 'var', var_type, var_decl)
+        self.scopes.declare(var_decl.symbol)
+
+    def visit_assign_stmt(self, assign_stmt):
+        return [assign_stmt.rhs, assign_stmt.lhs]
+
+    def leave_assign_stmt(self, assign_stmt):
+        lhs = assign_stmt.lhs
+        self.__expect(lhs.type, assign_stmt.rhs.type, lhs.path[-1])
+
+    def visit_lvalue(self, lval):
+        lval.symbol = self.__lookup(lval.path[0])
+        lval.type = self.__path_type(lval.symbol.type, lval.path)
+
+    def visit_struct_decl_stmt(self, struct_decl):
+        symbol = self.structs[struct_decl.struct_id.lexeme]
+        struct_decl.symbol = symbol
+        self.__fields(symbol)
+        return ast.PRUNE
+
+    def visit_fun_decl_stmt(self, fun_decl):
+        symbol = self.functions[fun_decl.fun_name.lexeme]
+        fun_decl.symbol = symbol
+        self.saved.append((self.scopes, self.return_type))
+        self.scopes = Scopes()
+        self.scopes.push()
+        self.return_type = symbol.type
+
+    def leave_fun_decl_stmt(self, fun_decl):
+        self.scopes, self.return_type = self.saved.pop()
+
+    def visit_fun_param(self, fun_param):
+        fun_param.symbol = Symbol(fun_param.param_name.lexeme, 'param',
+            self.__type_name(fun_param.param_type), fun_param)
+        self.scopes.declare(fun_param.symbol)
+
+    def leave_return_stmt(self, return_stmt):
+        if return_stmt.return_expr is None:
+            expr_type = 'nil'
+        else:
+            expr_type = return_stmt.return_expr.type
+        if self.return_type is not None:
+            self.__expect(self.return_type, expr_type, return_stmt.return_token)
+
+    #------------------EXPRESSIONS-----------------
+    def leave_simple_expr(self, simple_expr):
+        simple_expr.type = simple_expr.term.type
+
+    def leave_complex_expr(self, complex_expr):
+        complex_expr.type = math_type(complex_expr.math_rel,
+            complex_expr.first_operand.type, complex_expr.rest.type)
+
+    def visit_bool_expr(self, bool_expr):
+        # the relation is checked before the rest of the expression
+        plan = [bool_expr.first_expr]
+        if bool_expr.bool_rel is not None:
+            plan.append(bool_expr.second_expr)
+        plan.append((self.__check_relation, bool_expr))
+        if bool_expr.rest is not None:
+            plan.append(bool_expr.rest)
+        return plan
+
+    def leave_bool_expr(self, bool_expr):
+        bool_expr.type = 'bool'
+
+    def visit_simple_rvalue(self, simple_rvalue):
+        tok = simple_rvalue.val
+        if tok.tokentype == token.ID:
+            simple_rvalue.symbol = self.__lookup(tok)
+            simple_rvalue.type = simple_rvalue.symbol.type
+        else:
+            simple_rvalue.type = LITERAL_TYPES[tok.tokentype]
+
+    def visit_new_rvalue(self, new_rvalue):
+        new_rvalue.symbol = self.__struct(new_rvalue.struct_type)
+        new_rvalue.type = new_rvalue.symbol.type
+
+    def visit_call_rvalue(self, call_rvalue):
+        fun = call_rvalue.fun
+        symbol = self.functions.get(fun.lexeme)
+        if symbol is None:
+            raise error.MyPLError("undefined function '" + fun.lexeme + "'",
+                fun.line, fun.column)
+        params = symbol.members
+        if len(params) != len(call_rvalue.args):
+            raise error.MyPLError("'%s' takes %i arguments, %i given" % (fun.lexeme,
+                len(params), len(call_rvalue.args)), fun.line, fun.column)
+        call_rvalue.symbol = symbol
+        plan = []
+        for param_type, arg in zip(params, call_rvalue.args):
+            plan.append(arg)
+            plan.append((self.__check_arg, (param_type, arg)))
+        return plan
+
+    def leave_call_rvalue(self, call_rvalue):
+        call_rvalue.type = call_rvalue.symbol.type
+
+    def visit_id_rvalue(self, id_rvalue):
+        id_rvalue.symbol = self.__lookup(id_rvalue.path[0])
+        id_rvalue.type = self.__path_type(id_rvalue.symbol.type, id_rvalue.path)
+
+    #------------------HELPER FUNCTIONS-----------------
+    def __check_relation(self, bool_expr):
+        '''Checks the operands of a relation, or that a lone operand is a
+        bool, once their types are known'''
+        first = bool_expr.first_expr.type
+        rel = bool_expr.bool_rel
+        if rel is not None:
+            second = bool_expr.second_expr.type
+            if rel.tokentype in ORDERING and not orderable(first, second):
+                raise operand_error(rel, first, second)
+        elif first not in ('bool', None):
+            tok = ast.first_token(bool_expr.first_expr)
+            raise error.MyPLError('expecting bool, found ' + first, tok.line, tok.column)
+
+    def __check_arg(self, param_arg):
+        param_type, arg = param_arg
+        self.__expect(param_type, arg.type, ast.first_token(arg))
+
+    def __declare_globals(self, stmt_list):
+        '''Registers built-ins, then every function and struct before any
+        body is checked, so they can be used before their declaration'''
+        for name, (params, return_type) in BUILTIN_TYPES.items():
+            self.functions[name] = Symbol(name, 'fun', return_type, None, params)
+        for stmt in stmt_list.stmts:
+            if isinstance(stmt, ast.StructDeclStmt):
+                name = stmt.struct_id
+                if name.lexeme in self.structs:
+                    raise redefinition_error(name)
+                self.structs[name.lexeme] = Symbol(name.lexeme, 'struct', name.lexeme, stmt)
+        for stmt in stmt_list.stmts:
+            if isinstance(stmt, ast.FunDeclStmt):
+                name = stmt.fun_name
+                if name.lexeme in self.functions and self.functions[name.lexeme].decl is not None:
+                    raise redefinition_error(name)
+                params = tuple(self.__type_name(param.param_type) for param in stmt.params)
+                self.functions[name.lexeme] = Symbol(name.lexeme, 'fun',
+                    self.__type_name(stmt.return_type), stmt, params)
+
+    def __type_name(self, type_token):
+        '''Returns the type a type token names, checking that structs exist'''
+        if type_token.tokentype == token.ID:
+            return self.__struct(type_token).type
+        return TYPE_NAMES[type_token.tokentype]
+
+    def __struct(self, id_token):
+        symbol = self.structs.get(id_token.lexeme)
+        if symbol is None:
+            raise error.MyPLError("undefined struct '" + id_token.lexeme + "'",
+                id_token.line, id_token.column)
+        return symbol
+
+    def __fields(self, symbol):
+        '''Returns the struct's fields as name -> Symbol, checking its
+        declaration the first time. A struct whose initializers read its
+        own fields sees only those checked so far'''
+        if symbol.members is not None:
+            return symbol.members
+        symbol.members = {}
+        saved = (self.scopes, self.return_type)
+        self.scopes = Scopes()
+        self.scopes.push()
+        self.return_type = None
+        for var_decl in symbol.decl.var_decls:
+            ast.walk(var_decl, self)
+            var_decl.symbol.kind = 'field'
+            symbol.members[var_decl.var_id.lexeme] = var_decl.symbol
+        self.scopes, self.return_type = saved
+        return symbol.members
+
+    def __lookup(self, id_token):
+        '''Returns the Symbol of the variable visible under id_token's name'''
+        symbol = self.scopes.lookup(id_token.lexeme)
+        if symbol is None:
+            raise error.MyPLError("undefined variable '" + id_token.lexeme + "'",
+                id_token.line, id_token.column)
+        return symbol
+
+    def __path_type(self, type_name, path):
+        '''Returns the type of the fields path[1:] read from a value of
+        type_name; unknown once a step's type is unknown'''
+        for field in path[1:]:
+            if type_name is None:
+                return None
+            symbol = self.structs.get(type_name)
+            if symbol is None:
+                raise error.MyPLError("no field '" + field.lexeme + "' in " + type_name,
+                    field.line, field.column)
+            member = self.__fields(symbol).get(field.lexeme)
+            if member is None:
+                raise error.MyPLError("no field '" + field.lexeme + "' in " + type_name,
+                    field.line, field.column)
+            type_name = member.type
+        return type_name
+
+    def __expect(self, expected, found, tok):
+        if not compatible(expected, found):
+            raise error.MyPLError('expecting %s, found %s' % (expected, found),
+                tok.line, tok.column)
+
+
+def compatible(expected, found):
+    '''True if a value of type found can go where expected is wanted; an
+    unknown type fits anything and nil fits every type'''
+    return expected is None or found is None or found == 'nil' or expected == found
+
+def orderable(first, second):
+    if first is None or second is None:
+        return True
+    return (first in NUMERIC and second in NUMERIC) or first == second == 'string'
+
+def math_type(op, left, right):
+    '''Returns the type of left op right'''
+    if left is None or right is None:
+        return None
+    if op.tokentype == token.MODULO:
+        if left == right == 'int':
+            return 'int'
+    elif left in NUMERIC and right in NUMERIC:
+        return 'float' if 'float' in (left, right) else 'int'
+    elif op.tokentype == token.PLUS and left == right == 'string':
+        return 'string'
+    raise operand_error(op, left, right)
+
+def redefinition_error(name):
+    return error.MyPLError("redefinition of '" + name.lexeme + "'", name.line, name.column)
+
+def operand_error(op, left, right):
+    return error.MyPLError("invalid operand types %s and %s for '%s'" % (left, right,
+        op.lexeme), op.line, op.column)
+
+def check(stmt_list):
+    '''Type checks and annotates a parsed program'''
+    return TypeChecker().check(stmt_list)
@@ -0,0 +1,590 @@
+#!/usr/bin/python3
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Compiles a MyPL AST to bytecode and runs it on a stack virtual
+#   machine with its own call stack and a struct arena
+#----------------------------------------------------------------------
+import array
+import sys
+
+import mypl_ast as ast
+import mypl_error as error
+import mypl_runtime as runtime
+import mypl_token as token
+
+# opcodes; every instruction is an (opcode, argument) pair of ints
+(CONST, LOAD, STORE, POP, ADD, SUB, MUL, DIV, MOD, EQ, NE, LT, LE, GT, GE, NOT,
+ JUMP, JUMP_IF_FALSE, JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP, GETFIELD,
+ SETFIELD, NEW, PACK, CALL, BUILTIN, RETURN, RETURN_NIL, HALT) = range(29)
+
+OPNAMES = ('CONST', 'LOAD', 'STORE', 'POP', 'ADD', 'SUB', 'MUL', 'DIV', 'MOD',
+    'EQ', 'NE', 'LT', 'LE', 'GT', 'GE', 'NOT', 'JUMP', 'JUMP_IF_FALSE',
+    'JUMP_IF_FALSE_OR_POP', 'JUMP_IF_TRUE_OR_POP', 'GETFIELD', 'SETFIELD', 'NEW',
+    'PACK', 'CALL', 'BUILTIN', 'RETURN', 'RETURN_NIL', 'HALT')
+
+MATH_OPS = {
+    token.PLUS: ADD,
+    token.MINUS: SUB,
+    token.MULTIPLY: MUL,
+    token.DIVIDE: DIV,
+    token.MODULO: MOD,
+}
+
+COMPARE_OPS = {
+    token.EQUAL: EQ,
+    token.NOT_EQUAL: NE,
+    token.LESS_THAN: LT,
+    token.LESS_THAN_EQUAL: LE,
+    token.GREATER_THAN: GT,
+    token.GREATER_THAN_EQUAL: GE,
+}
+
+BUILTIN_NAMES = tuple(sorted(runtime.BUILTINS))
+
+# deepest MyPL call nesting before the VM reports a stack overflow
+MAX_FRAMES = 200000
+
+class Function(object):
+    """A compiled function: parameters are locals 0 to nparams-1"""
+    __slots__ = ('name', 'entry', 'nparams', 'nlocals')
+
+    def __init__(self, name, nparams):
+        self.name = name
+        self.entry = -1
+        self.nparams = nparams
+        self.nlocals = nparams
+
+
+class Struct(object):
+    """A compiled struct: its initializer runs like a function with the
+    fields as locals and ends with PACK"""
+    __slots__ = ('name', 'fields', 'layout', 'entry')
+
+    def __init__(self, name):
+        self.name = name
+        self.fields = []
+        self.layout = {}        # field name -> offset from the instance ref
+        self.entry = -1
+
+
+class Ref(object):
+    """A struct instance: a handle on its block in the VM heap. Refs are
+    not numbers, so arithmetic on one is an invalid operand and equality
+    is identity. When the last copy of a Ref goes away its block joins
+    the free list of its struct, for the next instance to reuse"""
+    __slots__ = ('index', 'free')
+
+    def __init__(self, index, free):
+        self.index = index      # heap index of the header
+        self.free = free        # free list of the struct's blocks
+
+    def __del__(self):
+        # the fields are overwritten on reuse, not here, so freeing a
+        # long chain of instances does not cascade
+        self.free.append(self.index)
+
+    def __str__(self):
+        return 'ref@%i' % self.index
+
+    __repr__ = __str__
+
+
+class Program(object):
+    """Bytecode with its constant pool and function and struct tables"""
+
+    def __init__(self):
+        self.code = array.array('i')        # opcode, argument, opcode, ...
+        self.positions = array.array('i')   # line, column of each instruction
+        self.consts = []
+        self.functions = []                 # [Function]
+        self.structs = []                   # [Struct]
+        self.nlocals = 0                    # locals of the main program
+
+
+class Compiler(ast.Walker):
+    """Compiles a StmtList into a Program. The main program comes first and
+    ends with HALT; function bodies and struct initializers follow. The
+    tree is walked with ast.walk(), so code for an operation is emitted in
+    its leave_ hook, after that of its operands, and plans put the jumps
+    of conditions and loops between the parts they join"""
+
+    def __init__(self):
+        self.program = Program()
+        self.const_index = {}
+        self.function_index = {}
+        self.struct_index = {}
+        self.scopes = []        # [{name: local}] innermost last
+        self.saved_slots = []   # next_slot when each open scope began
+        self.next_slot = 0
+        self.max_slots = 0
+        self.in_function = False
+        self.line = 0           # position recorded for emitted instructions
+        self.column = 0
+
+    def compile(self, stmt_list):
+        '''Returns the Program for stmt_list'''
+        decls = self.__declare_globals(stmt_list)
+        ast.walk(stmt_list, self)
+        self.__emit(HALT)
+        self.program.nlocals = self.max_slots
+        self.in_function = True
+        for decl in decls:
+            if isinstance(decl, ast.FunDeclStmt):
+                self.__function(decl)
+            else:
+                self.__struct(decl)
+        return self.program
+
+    #------------------STATEMENTS-----------------
+    def visit_stmt_list(self, stmt_list):
+        # a statement list is a scope
+        self.scopes.append({})
+        self.saved_slots.append(self.next_slot)
+
+    def leave_stmt_list(self, stmt_list):
+        self.scopes.pop()
+        self.next_slot = self.saved_slots.pop()
+
+    def leave_expr_stmt(self, expr_stmt):
+        self.__emit(POP)
+
+    def leave_var_decl_stmt(self, var_decl):
+        self.__at(var_decl.var_id)
+        self.__emit(STORE, self.__declare(var_decl.var_id))
+
+    def visit_assign_stmt(self, assign_stmt):
+        return [assign_stmt.rhs]
+
+    def leave_assign_stmt(self, assign_stmt):
+        path = assign_stmt.lhs.path
+        slot = self.__lookup(path[0])
+        if len(path) == 1:
+            self.__emit(STORE, slot)
+            return
+        self.__emit(LOAD, slot)
+        for field in path[1:-1]:
+            self.__at(field)
+            self.__emit(GETFIELD, self.__const(field.lexeme))
+        self.__at(path[-1])
+        self.__emit(SETFIELD, self.__const(path[-1].lexeme))
+
+    def visit_struct_decl_stmt(self, struct_decl):
+        return ast.PRUNE        # compiled after the main program
+
+    def visit_fun_decl_stmt(self, fun_decl):
+        return ast.PRUNE        # compiled after the main program
+
+    def visit_return_stmt(self, return_stmt):
+        self.__at(return_stmt.return_token)
+
+    def leave_return_stmt(self, return_stmt):
+        if return_stmt.return_expr is None:
+            self.__emit(RETURN_NIL if self.in_function else HALT)
+        else:
+            self.__emit(RETURN if self.in_function else HALT)
+
+    def visit_while_stmt(self, while_stmt):
+        jumps = [len(self.program.code)]        # the start, then the exit jump
+        return [while_stmt.bool_expr, (self.__jump_if_false, jumps), while_stmt.stmt_list,
+            (self.__loop, jumps)]
+
+    def visit_if_stmt(self, if_stmt):
+        jumps = []              # the pending jump past a branch, then those to the end
+        plan = []
+        for basic_if in [if_stmt.if_part] + if_stmt.elseifs:
+            plan.extend((basic_if.bool_expr, (self.__jump_if_false, jumps),
+                basic_if.stmt_list, (self.__end_branch, jumps)))
+        if if_stmt.has_else:
+            plan.append(if_stmt.else_stmts)
+        plan.append((self.__patch_all, jumps))
+        return plan
+
+    #------------------EXPRESSIONS-----------------
+    def leave_complex_expr(self, complex_expr):
+        self.__at(complex_expr.math_rel)
+        self.__emit(MATH_OPS[complex_expr.math_rel.tokentype])
+
+    def visit_bool_expr(self, bool_expr):
+        plan = [bool_expr.first_expr]
+        if bool_expr.bool_rel is not None:
+            plan.append(bool_expr.second_expr)
+        jumps = []
+        plan.append((self.__bool_ops, (bool_expr, jumps)))
+        if bool_expr.bool_connector is not None:
+            plan.append(bool_expr.rest)
+            plan.append((self.__patch_all, jumps))
+        return plan
+
+    def visit_simple_rvalue(self, simple_rvalue):
+        tok = simple_rvalue.val
+        self.__at(tok)
+        if tok.tokentype == token.ID:
+            self.__emit(LOAD, self.__lookup(tok))
+        else:
+            self.__emit(CONST, self.__const(runtime.literal(tok)))
+
+    def visit_new_rvalue(self, new_rvalue):
+        struct_type = new_rvalue.struct_type
+        if struct_type.lexeme not in self.struct_index:
+            raise error.MyPLError("undefined struct '" + struct_type.lexeme + "'",
+                struct_type.line, struct_type.column)
+        self.__at(struct_type)
+        self.__emit(NEW, self.struct_index[struct_type.lexeme])
+
+    def leave_call_rvalue(self, call_rvalue):
+        fun = call_rvalue.fun
+        self.__at(fun)
+        if fun.lexeme in self.function_index:
+            index = self.function_index[fun.lexeme]
+            check_arity(fun, self.program.functions[index].nparams, len(call_rvalue.args))
+            self.__emit(CALL, index)
+        elif fun.lexeme in runtime.BUILTINS:
+            check_arity(fun, runtime.BUILTINS[fun.lexeme][1], len(call_rvalue.args))
+            self.__emit(BUILTIN, BUILTIN_NAMES.index(fun.lexeme))
+        else:
+            raise error.MyPLError("undefined function '" + fun.lexeme + "'",
+                fun.line, fun.column)
+
+    def visit_id_rvalue(self, id_rvalue):
+        path = id_rvalue.path
+        self.__at(path[0])
+        self.__emit(LOAD, self.__lookup(path[0]))
+        for field in path[1:]:
+            self.__at(field)
+            self.__emit(GETFIELD, self.__const(field.lexeme))
+
+    #------------------PLAN STEPS-----------------
+    def __jump_if_false(self, jumps):
+        jumps.append(self.__emit(JUMP_IF_FALSE))
+
+    def __loop(self, jumps):
+        start, exit_jump = jumps
+        self.__emit(JUMP, start)
+        self.__patch(exit_jump)
+
+    def __end_branch(self, jumps):
+        '''Jumps from the end of a branch to the end of the if, and points
+        the branch's condition at what follows'''
+        next_jump = jumps.pop()
+        jumps.append(self.__emit(JUMP))
+        self.__patch(next_jump)
+
+    def __patch_all(self, jumps):
+        for jump in jumps:
+            self.__patch(jump)
+
+    def __bool_ops(self, bool_expr_jumps):
+        '''Compares, negates, then short-circuits into the rest'''
+        bool_expr, jumps = bool_expr_jumps
+        if bool_expr.bool_rel is not None:
+            self.__at(bool_expr.bool_rel)
+            self.__emit(COMPARE_OPS[bool_expr.bool_rel.tokentype])
+        if bool_expr.negated:
+            self.__emit(NOT)
+        if bool_expr.bool_connector is not None:
+            if bool_expr.bool_connector.tokentype == token.AND:
+                jumps.append(self.__emit(JUMP_IF_FALSE_OR_POP))
+            else:
+                jumps.append(self.__emit(JUMP_IF_TRUE_OR_POP))
+
+    #------------------HELPER FUNCTIONS-----------------
+    def __emit(self, op, arg=0):
+        '''Appends an instruction and returns its address'''
+        code = self.program.code
+        code.append(op)
+        code.append(arg)
+        self.program.positions.append(self.line)
+        self.program.positions.append(self.column)
+        return len(code) - 2
+
+    def __patch(self, address):
+        '''Points the jump at address to the next instruction'''
+        self.program.code[address + 1] = len(self.program.code)
+
+    def __at(self, tok):
+        if tok is not None:
+            self.line = tok.line
+            self.column = tok.column
+
+    def __const(self, value):
+        '''Returns the constant pool index of value'''
+        key = (type(value), value)
+        if key not in self.const_index:
+            self.const_index[key] = len(self.program.consts)
+            self.program.consts.append(value)
+        return self.const_index[key]
+
+    def __declare_globals(self, stmt_list):
+        '''Gives every function and struct its index before any code is
+        compiled and returns their declarations'''
+        decls = []
+        for stmt in stmt_list.stmts:
+            if isinstance(stmt, ast.FunDeclStmt):
+                name = stmt.fun_name
+                index, table = self.function_index, self.program.functions
+                table_entry = Function(name.lexeme, len(stmt.params))
+            elif isinstance(stmt, ast.StructDeclStmt):
+                name = stmt.struct_id
+                index, table = self.struct_index, self.program.structs
+                table_entry = Struct(name.lexeme)
+            else:
+                continue
+            if name.lexeme in index:
+                raise error.MyPLError("redefinition of '" + name.lexeme + "'",
+                    name.line, name.column)
+            index[name.lexeme] = len(table)
+            table.append(table_entry)
+            decls.append(stmt)
+        return decls
+
+    def __function(self, fun_decl):
+        function = self.program.functions[self.function_index[fun_decl.fun_name.lexeme]]
+        function.entry = len(self.program.code)
+        self.__new_frame()
+        for param in fun_decl.params:
+            self.__declare(param.param_name)
+        ast.walk(fun_decl.stmt_list, self)
+        self.__at(fun_decl.fun_name)
+        self.__emit(RETURN_NIL)
+        function.nlocals = self.max_slots
+
+    def __struct(self, struct_decl):
+        index = self.struct_index[struct_decl.struct_id.lexeme]
+        struct = self.program.structs[index]
+        struct.entry = len(self.program.code)
+        self.__new_frame()
+        for var_decl in struct_decl.var_decls:
+            ast.walk(var_decl, self)
+            struct.layout[var_decl.var_id.lexeme] = len(struct.fields) + 1
+            struct.fields.append(var_decl.var_id.lexeme)
+        self.__at(struct_decl.struct_id)
+        self.__emit(PACK, index)
+
+    def __new_frame(self):
+        self.scopes = [{}]
+        self.next_slot = self.max_slots = 0
+
+    def __declare(self, id_token):
+        slot = self.next_slot
+        self.scopes[-1][id_token.lexeme] = slot
+        self.next_slot += 1
+        if self.next_slot > self.max_slots:
+            self.max_slots = self.next_slot
+        return slot
+
+    def __lookup(self, id_token):
+        name = id_token.lexeme
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        raise error.MyPLError("undefined variable '" + name + "'",
+            id_token.line, id_token.column)
+
+
+class VM(object):
+    """Runs a Program. Struct instances live in one flat heap list: a Ref
+    points at a header holding the struct index, followed by the fields.
+    The blocks of unreachable instances are reused; those of instances
+    that reach each other in a cycle are kept until the VM goes away"""
+
+    def __init__(self, program):
+        self.program = program
+        self.heap = []
+        self.free = [[] for struct in program.structs]  # reusable blocks by struct
+
+    def run(self):
+        program = self.program
+        code = program.code.tolist()
+        consts = program.consts
+        functions = program.functions
+        structs = program.structs
+        builtins = [runtime.BUILTINS[name][:2] for name in BUILTIN_NAMES]
+        divide = runtime.divide
+        modulo = runtime.modulo
+        heap = self.heap
+        free = self.free
+        stack = [None] * program.nlocals
+        frames = []             # (return address, base) of each caller
+        base = 0
+        pc = 0
+        try:
+            while True:
+                op = code[pc]
+                arg = code[pc + 1]
+                pc += 2
+                if op == LOAD:
+                    stack.append(stack[base + arg])
+                elif op == CONST:
+                    stack.append(consts[arg])
+                elif op == STORE:
+                    stack[base + arg] = stack.pop()
+                elif op == JUMP_IF_FALSE:
+                    if not stack.pop():
+                        pc = arg
+                elif op == JUMP:
+                    pc = arg
+                elif op == ADD:
+                    b = stack.pop()
+                    stack[-1] = stack[-1] + b
+                elif op == SUB:
+                    b = stack.pop()
+                    stack[-1] = stack[-1] - b
+                elif op == MUL:
+                    b = stack.pop()
+                    stack[-1] = stack[-1] * b
+                elif op == LT:
+                    b = stack.pop()
+                    stack[-1] = stack[-1] < b
+                elif op == LE:
+                    b = stack.pop()
+                    stack[-1] = stack[-1] <= b
+                elif op == GT:
+                    b = stack.pop()
+                    stack[-1] = stack[-1] > b
+                elif op == GE:
+                    b = stack.pop()
+                    stack[-1] = stack[-1] >= b
+                elif op == EQ:
+                    b = stack.pop()
+                    stack[-1] = stack[-1] == b
+                elif op == NE:
+                    b = stack.pop()
+                    stack[-1] = stack[-1] != b
+                elif op == GETFIELD:
+                    ref = stack[-1]
+                    if type(ref) is not Ref:
+                        raise self.__field_error(ref, consts[arg], pc - 2)
+                    index = ref.index
+                    offset = structs[heap[index]].layout.get(consts[arg])
+                    if offset is None:
+                        raise self.__field_error(ref, consts[arg], pc - 2)
+                    stack[-1] = heap[index + offset]
+                elif op == SETFIELD:
+                    ref = stack.pop()
+                    if type(ref) is not Ref:
+                        raise self.__field_error(ref, consts[arg], pc - 2)
+                    index = ref.index
+                    offset = structs[heap[index]].layout.get(consts[arg])
+                    if offset is None:
+                        raise self.__field_error(ref, consts[arg], pc - 2)
+                    heap[index + offset] = stack.pop()
+                elif op == CALL or op == NEW:
+                    if len(frames) == MAX_FRAMES:
+                        raise self.__error('call stack overflow', pc - 2)
+                    frames.append((pc, base))
+                    if op == CALL:
+                        function = functions[arg]
+                        base = len(stack) - function.nparams
+                        stack.extend([None] * (function.nlocals - function.nparams))
+                    else:
+                        function = structs[arg]
+                        base = len(stack)
+                        stack.extend([None] * len(function.fields))
+                    pc = function.entry
+                elif op == RETURN:
+                    value = stack.pop()
+                    del stack[base:]
+                    stack.append(value)
+                    pc, base = frames.pop()
+                elif op == RETURN_NIL:
+                    del stack[base:]
+                    stack.append(None)
+                    pc, base = frames.pop()
+                elif op == POP:
+                    stack.pop()
+                elif op == NOT:
+                    stack[-1] = not stack[-1]
+                elif op == JUMP_IF_FALSE_OR_POP:
+                    if stack[-1]:
+                        stack.pop()
+                    else:
+                        pc = arg
+                elif op == JUMP_IF_TRUE_OR_POP:
+                    if stack[-1]:
+                        pc = arg
+                    else:
+                        stack.pop()
+                elif op == DIV:
+                    b = stack.pop()
+                    stack[-1] = divide(stack[-1], b)
+                elif op == MOD:
+                    b = stack.pop()
+                    stack[-1] = modulo(stack[-1], b)
+                elif op == BUILTIN:
+                    function, arity = builtins[arg]
+                    if arity:
+                        args = stack[-arity:]
+                        del stack[-arity:]
+                        stack.append(function(*args))
+                    else:
+                        stack.append(function())
+                elif op == PACK:
+                    blocks = free[arg]
+                    if blocks:
+                        index = blocks.pop()
+                        heap[index + 1:index + 1 + len(stack) - base] = stack[base:]
+                    else:
+                        index = len(heap)
+                        heap.append(arg)
+                        heap.extend(stack[base:])
+                    ref = Ref(index, blocks)
+                    del stack[base:]
+                    stack.append(ref)
+                    pc, base = frames.pop()
+                elif op == HALT:
+                    return
+        except runtime.FAULTS as e:
+            raise self.__error(runtime.fault_message(e), pc - 2)
+
+    def __error(self, msg, address):
+        positions = self.program.positions
+        return error.MyPLError(msg, positions[address], positions[address + 1])
+
+    def __field_error(self, ref, name, address):
+        if ref is None:
+            return self.__error("nil reference reading field '" + name + "'", address)
+        return self.__error("no field '" + name + "'", address)
+
+
+def check_arity(fun, arity, count):
+    if arity != count:
+        raise error.MyPLError("'%s' takes %i arguments, %i given" % (fun.lexeme, arity,
+            count), fun.line, fun.column)
+
+def compile_program(stmt_list):
+    return Compiler().compile(stmt_list)
+
+def run(stmt_list):
+    '''Compiles and runs a parsed program'''
+    VM(compile_program(stmt_list)).run()
+
+def disassemble(program, output_stream=sys.stdout):
+    '''Writes a listing of the program's code, one instruction per line'''
+    labels = {0: '<main>'}
+    for function in program.functions:
+        labels[function.entry] = function.name
+    for struct in program.structs:
+        labels[struct.entry] = 'new ' + struct.name
+    code = program.code
+    positions = program.positions
+    for address in range(0, len(code), 2):
+        if address in labels:
+            output_stream.write('\n' + labels[address] + ':\n')
+        op = code[address]
+        arg = code[address + 1]
+        if op in (CONST, GETFIELD, SETFIELD):
+            note = repr(program.consts[arg])
+        elif op == CALL:
+            note = program.functions[arg].name
+        elif op in (NEW, PACK):
+            note = program.structs[arg].name
+        elif op == BUILTIN:
+            note = BUILTIN_NAMES[arg]
+        elif op in (LOAD, STORE, JUMP, JUMP_IF_FALSE, JUMP_IF_FALSE_OR_POP,
+                JUMP_IF_TRUE_OR_POP):
+            note = str(arg)
+        else:
+            note = ''
+        output_stream.write('%6i %5i:%-4i %-21s%s\n' % (address, positions[address],
+            positions[address + 1], OPNAMES[op], note))
@@ -0,0 +1,56 @@
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Shared helpers for the tests: the repository root on sys.path, the
+#   sample programs, parsing from a string and a comparable form of ASTs
+#----------------------------------------------------------------------
+import glob
+import io
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import mypl_ast as ast
+import mypl_lexer as lexer
+import mypl_parser as parser
+import mypl_token as token
+
+PROGRAMS = sorted(glob.glob(os.path.join(ROOT, 'tests', 'programs', '*.mypl')))
+
+def parse(source, engine='descent', precedence=False):
+    '''Returns the StmtList of source'''
+    the_lexer = lexer.Lexer(io.StringIO(source), True)
+    return parser.make_parser(the_lexer, engine, precedence).parse()
+
+def shape(node):
+    '''Returns the nodes under node in source order, each as its class name
+    and the values of its fields that are not nodes, for comparing trees'''
+    result = []
+    for each in ast.nodes(node):
+        cls, names = ast.node_fields(type(each))
+        values = []
+        for name in names:
+            value = getattr(each, name)
+            if isinstance(value, list):
+                value = tuple(fact(item) for item in value)
+            values.append(fact(value))
+        result.append((cls.__name__, tuple(values)))
+    return result
+
+def fact(value):
+    if isinstance(value, token.Token):
+        return (value.tokentype, value.lexeme, value.line, value.column)
+    if isinstance(value, (ast.ASTNode, ast.BasicIf)):
+        return ast.node_fields(type(value))[0].__name__  # compared in its own entry
+    if isinstance(value, Exception):
+        return str(value)
+    return value
+
+@pytest.fixture(params=PROGRAMS, ids=os.path.basename)
+def program(request):
+    '''The path of each sample program in turn'''
+    return request.param
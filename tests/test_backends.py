@@ -0,0 +1,99 @@
+#
+# Author: Caterina Valdovinos
+# Description:
+#   The closure compiler, the bytecode VM and the Python transpiler run
+#   programs to the same output and the same errors, also for operator
+#   chains long enough to be run without nesting, and after optimizing
+#----------------------------------------------------------------------
+import contextlib
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+import mypl_closure_compiler
+import mypl_error as error
+import mypl_optimizer as optimizer
+import mypl_runtime as runtime
+import mypl_transpiler
+import mypl_type_checker as type_checker
+import mypl_vm
+from conftest import ROOT, parse
+
+BACKENDS = {'closure': mypl_closure_compiler, 'vm': mypl_vm, 'python': mypl_transpiler}
+RUNTIME = os.path.join(ROOT, 'tests', 'programs', 'runtime.mypl')
+OPERATORS = [['+'], ['-'], ['*', '/'], ['+', '-', '*'], ['+', '-', '*', '/', '%']]
+
+def run(backend, text, precedence=False, optimized=False):
+    '''Returns what the program prints, followed by its error if any'''
+    stmt_list = parse(text, precedence=precedence)
+    if optimized:
+        type_checker.check(stmt_list)
+        optimizer.optimize(stmt_list)
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        try:
+            BACKENDS[backend].run(stmt_list)
+        except error.MyPLError as e:
+            print(e)
+    return out.getvalue()
+
+def chain(n, ops, literal=str):
+    terms = [literal(1)]
+    for i in range(1, n):
+        terms.append(ops[i % len(ops)])
+        terms.append(literal(i % 7 + 1))
+    return ' '.join(terms)
+
+def same_everywhere(text, precedence=False, optimized=False):
+    outputs = {name: run(name, text, precedence, optimized) for name in BACKENDS}
+    assert outputs['vm'] == outputs['closure'] == outputs['python']
+    return outputs['vm']
+
+def test_runtime_program():
+    with open(RUNTIME) as source_file:
+        output = same_everywhere(source_file.read())
+    assert output.startswith('0 3\n')
+    assert output.endswith('error: division by zero at line 38 column 11\n')
+
+def test_grouping():
+    assert same_everywhere('print(itos(10 - 4 - 3));') == '9'
+    assert same_everywhere('print(itos(10 - 4 - 3));', precedence=True) == '3'
+
+@pytest.mark.parametrize('precedence', [False, True])
+@pytest.mark.parametrize('n', [5, runtime.LONG_CHAIN, runtime.LONG_CHAIN + 1, 1000])
+@pytest.mark.parametrize('ops', OPERATORS, ids=''.join)
+def test_math_chains(n, ops, precedence):
+    same_everywhere('print(itos(%s));' % chain(n, ops), precedence)
+    same_everywhere('print(ftos(%s));' % chain(n, ops, lambda value: '%i.5' % value),
+        precedence)
+
+@pytest.mark.parametrize('n', [5, runtime.LONG_CHAIN + 1, 1000])
+def test_chain_errors(n):
+    same_everywhere('var z = 0; var x = %s / z;' % ' + '.join(['1'] * n))
+    same_everywhere('var x = "a"' + ' + "b"' * n + ' - 1;')
+
+@pytest.mark.parametrize('n', [5, runtime.LONG_CHAIN + 1, 1000])
+def test_bool_chains(n):
+    assert same_everywhere('if ' + ' and '.join(['1 < 2'] * n) + 
+        ' or false then print("y"); else print("n"); end') == 'y'
+    assert same_everywhere('if ' + ' or '.join(['1 > 2'] * n) + 
+        ' and not true then print("y"); else print("n"); end') == 'n'
+    same_everywhere('if ' + ' and '.join(['1 < 2'] * n) + ' and 1 < "x" then end')
+
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_optimized_runtime_program(backend):
+    with open(RUNTIME) as source_file:
+        text = source_file.read()
+    assert run(backend, text, optimized=True) == run(backend, text)
+
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_main_run(backend):
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'main.py'), '--run', 
+        backend, RUNTIME], capture_output=True, text=True)
+    assert result.returncode == 1
+    with open(RUNTIME) as source_file:
+        expected = run(backend, source_file.read())
+    assert result.stdout + result.stderr == expected
@@ -0,0 +1,102 @@
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Batch mode prints every file in order, in this process or a pool,
+#   and reports each failing file without stopping the others
+#----------------------------------------------------------------------
+import io
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import mypl_batch as batch
+from conftest import PROGRAMS, ROOT
+
+def expected(program):
+    with open(os.path.splitext(program)[0] + '.out') as out:
+        return out.read()
+
+@pytest.fixture
+def tree(tmp_path):
+    '''A directory of the sample programs, a broken one and one that is
+    not UTF-8'''
+    for program in PROGRAMS:
+        shutil.copy(program, str(tmp_path))
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'broken.mypl').write_text('var = 1;\n')
+    (tmp_path / 'sub' / 'latin1.mypl').write_bytes(b'var s = "\xe9";\n')
+    return tmp_path
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_outputs_and_errors(tree, jobs):
+    out = io.StringIO()
+    err = io.StringIO()
+    results = batch.run_batch([str(tree)], jobs, output_stream=out, error_stream=err)
+    names = [os.path.relpath(result.path, str(tree)) for result in results]
+    assert names == sorted(os.path.basename(p) for p in PROGRAMS) + [
+        os.path.join('sub', 'broken.mypl'), os.path.join('sub', 'latin1.mypl')]
+    printed = ''.join('# %s\n%s' % (os.path.join(str(tree), os.path.basename(p)), 
+        expected(p)) for p in sorted(PROGRAMS, key=os.path.basename))
+    assert out.getvalue() == printed
+    errors = err.getvalue().splitlines()
+    assert 'expecting' in errors[0] and 'broken.mypl' in errors[0]
+    assert 'cannot decode' in errors[1]
+    assert errors[-1] == '%i files, 2 errors' % len(results)
+
+def test_output_dir(tree, tmp_path_factory):
+    output_dir = tmp_path_factory.mktemp('out')
+    batch.run_batch([str(tree / '*.mypl')], 1, output_dir=str(output_dir), 
+        error_stream=io.StringIO())
+    for program in PROGRAMS:
+        written = output_dir / os.path.basename(program)
+        assert written.read_text() == expected(program)
+
+def test_output_dir_collisions(tree, tmp_path_factory, monkeypatch):
+    # outside the current directory only the name is kept, so two x.mypl clash
+    monkeypatch.chdir(str(tmp_path_factory.mktemp('cwd')))
+    for name in ['a', 'b']:
+        (tree / name).mkdir()
+        (tree / name / 'x.mypl').write_text('var %s = 1;\n' % name)
+    output_dir = tmp_path_factory.mktemp('out')
+    err = io.StringIO()
+    results = batch.run_batch([str(tree / 'a' / 'x.mypl'), str(tree / 'b' / 'x.mypl')], 1,
+        output_dir=str(output_dir), error_stream=err)
+    assert results[0].error is None
+    assert 'would overwrite' in results[1].error and str(tree / 'a') in results[1].error
+    assert (output_dir / 'x.mypl').read_text() == 'var a = 1;\n'
+    assert err.getvalue().splitlines()[-1] == '2 files, 1 errors'
+
+def test_output_path_parent_prefix(tmp_path, monkeypatch):
+    monkeypatch.chdir(str(tmp_path))
+    assert batch.output_path('..x.mypl', 'out') == os.path.join('out', '..x.mypl')
+    assert batch.output_path(os.path.join('..d', 'x.mypl'), 'out') == (
+        os.path.join('out', '..d', 'x.mypl'))
+    assert batch.output_path(os.path.join(os.pardir, 'x.mypl'), 'out') == (
+        os.path.join('out', 'x.mypl'))
+
+def test_internal_error_kept(tree, monkeypatch):
+    def fail(*args):
+        raise RuntimeError('boom')
+    monkeypatch.setattr(batch.parser, 'make_parser', fail)
+    results = batch.run_batch([str(tree)], 1, output_stream=io.StringIO(), 
+        error_stream=io.StringIO())
+    assert len(results) == len(PROGRAMS) + 2
+    assert [r.error for r in results if 'boom' in r.error] == (
+        ['internal error: RuntimeError: boom'] * (len(PROGRAMS) + 1))
+
+def test_counts_must_be_positive(tree):
+    with pytest.raises(ValueError):
+        batch.run_batch([str(tree)], 0)
+    with pytest.raises(ValueError):
+        batch.run_batch([str(tree)], 2, chunksize=0)
+
+@pytest.mark.parametrize('option', ['-j', '--chunksize'])
+@pytest.mark.parametrize('value', ['0', '-1', 'x'])
+def test_main_rejects_counts(tree, option, value):
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'main.py'), option, value,
+        str(tree)], capture_output=True, text=True)
+    assert result.returncode == 2
+    assert 'usage:' in result.stderr
@@ -0,0 +1,79 @@
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Trees written in the binary AST format read back the same, from
+#   bytes or a mapped file, including ErrorStmts from a recovering parse
+#----------------------------------------------------------------------
+import io
+import os
+
+import pytest
+
+import mypl_ast as ast
+import mypl_binary_ast as binary_ast
+import mypl_lexer as lexer
+import mypl_parser as parser
+import mypl_print_visitor as ast_printer
+import mypl_type_checker as type_checker
+from conftest import ROOT, parse, shape
+
+def source(program):
+    with open(program) as source_file:
+        return source_file.read()
+
+@pytest.mark.parametrize('precedence', [False, True])
+def test_round_trip(program, precedence):
+    stmt_list = parse(source(program), precedence=precedence)
+    assert shape(binary_ast.loads(binary_ast.dumps(stmt_list))) == shape(stmt_list)
+
+def test_round_trip_file(program, tmp_path):
+    stmt_list = parse(source(program))
+    path = str(tmp_path / 'tree.ast')
+    binary_ast.dump(stmt_list, path)
+    loaded = binary_ast.load(path)
+    assert shape(loaded) == shape(stmt_list)
+    printer = ast_printer.PrintVisitor()
+    ast.walk(loaded, printer)
+    expected = ast_printer.PrintVisitor()
+    ast.walk(stmt_list, expected)
+    assert printer.to_string() == expected.to_string()
+
+def test_error_stmts():
+    text = 'var x = 1;\nvar = 2;\nwhile x do set = 3; end\n'
+    the_parser = parser.Parser(lexer.Lexer(io.StringIO(text), True), recover=True)
+    stmt_list = the_parser.parse()
+    loaded = binary_ast.loads(binary_ast.dumps(stmt_list))
+    assert shape(loaded) == shape(stmt_list)
+    error_stmts = [node for node in ast.nodes(loaded) if isinstance(node, ast.ErrorStmt)]
+    assert [str(error_stmt.error) for error_stmt in error_stmts] == [str(e) for e in 
+        the_parser.errors]
+
+def test_annotations_not_stored():
+    stmt_list = parse(source(os.path.join(ROOT, 'tests', 'programs', 'runtime.mypl')))
+    type_checker.check(stmt_list)
+    assert any(getattr(node, 'type', None) is not None for node in ast.nodes(stmt_list))
+    loaded = binary_ast.loads(binary_ast.dumps(stmt_list))
+    for node in ast.nodes(loaded):
+        for name in ('type', 'symbol'):
+            if name in ast.node_fields(type(node))[1]:
+                assert getattr(node, name) is None
+
+def test_deep_tree():
+    depth = 5000
+    stmt_list = parse('var x = ' + '1 + (' * depth + '1' + ')' * depth + ';', 'll1')
+    assert shape(binary_ast.loads(binary_ast.dumps(stmt_list))) == shape(stmt_list)
+
+def test_bad_data():
+    data = binary_ast.dumps(parse('var x = 1;'))
+    with pytest.raises(binary_ast.FormatError):
+        binary_ast.loads(data[:10])
+    with pytest.raises(binary_ast.FormatError):
+        binary_ast.loads(b'NOTANAST' + data[8:])
+    newer = bytearray(data)
+    newer[8] = binary_ast.FORMAT_VERSION + 1
+    with pytest.raises(binary_ast.FormatError):
+        binary_ast.loads(bytes(newer))
+
+def test_cannot_store():
+    with pytest.raises(binary_ast.FormatError):
+        binary_ast.dumps(object())
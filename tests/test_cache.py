@@ -0,0 +1,76 @@
+#
+# Author: Caterina Valdovinos
+# Description:
+#   ParseCache returns the trees it stored, keeps them in the binary AST
+#   format, treats damaged entries as misses and cleans up after itself
+#----------------------------------------------------------------------
+import os
+import time
+
+import mypl_binary_ast as binary_ast
+import mypl_cache as cache
+from conftest import parse, shape
+
+def source(program):
+    with open(program) as source_file:
+        return source_file.read()
+
+def entries(directory, suffix=cache.EXTENSION):
+    return [os.path.join(root, name) for root, dirs, names in os.walk(directory) 
+        for name in names if name.endswith(suffix)]
+
+def test_hit_and_miss(program, tmp_path):
+    text = source(program)
+    parse_cache = cache.ParseCache(str(tmp_path))
+    first = parse_cache.parse(text)
+    again = cache.ParseCache(str(tmp_path)).parse(text)
+    assert (parse_cache.hits, parse_cache.misses) == (0, 1)
+    assert shape(first) == shape(again) == shape(parse(text))
+
+def test_entries_are_binary_asts(tmp_path):
+    cache.ParseCache(str(tmp_path)).parse('var x = 1;')
+    paths = entries(str(tmp_path))
+    assert len(paths) == 1
+    with open(paths[0], 'rb') as entry:
+        assert entry.read(len(binary_ast.MAGIC)) == binary_ast.MAGIC
+
+def test_keys(tmp_path, monkeypatch):
+    text = b'var x = 1;'
+    plain = cache.ParseCache(str(tmp_path))
+    key = plain.key(text)
+    assert cache.ParseCache(str(tmp_path), precedence=True).key(text) != key
+    monkeypatch.setattr(binary_ast, 'FORMAT_VERSION', binary_ast.FORMAT_VERSION + 1)
+    assert plain.key(text) != key
+
+def test_damaged_entry_is_a_miss(tmp_path):
+    text = 'var x = 1 + 2;\nvar y = x;\n'
+    cache.ParseCache(str(tmp_path)).parse(text)
+    path = entries(str(tmp_path))[0]
+    with open(path, 'rb') as entry:
+        data = entry.read()
+    with open(path, 'wb') as entry:
+        entry.write(data[:len(data) - 12])
+    parse_cache = cache.ParseCache(str(tmp_path))
+    assert shape(parse_cache.parse(text)) == shape(parse(text))
+    assert (parse_cache.hits, parse_cache.misses) == (0, 1)
+
+def test_evict(tmp_path):
+    parse_cache = cache.ParseCache(str(tmp_path))
+    for i in range(20):
+        parse_cache.parse('var x%i = %i;' % (i, i))
+    size = sum(os.path.getsize(path) for path in entries(str(tmp_path)))
+    parse_cache.max_bytes = size // 2
+    parse_cache.evict()
+    assert sum(os.path.getsize(path) for path in entries(str(tmp_path))) <= size * 9 // 20
+
+def test_evict_removes_orphans(tmp_path):
+    parse_cache = cache.ParseCache(str(tmp_path))
+    old = tmp_path / 'old.tmp'
+    new = tmp_path / 'new.tmp'
+    old.write_bytes(b'x')
+    new.write_bytes(b'x')
+    stale = time.time() - cache.ORPHAN_SECONDS - 60
+    os.utime(str(old), (stale, stale))
+    parse_cache.evict()
+    assert not old.exists()
+    assert new.exists()
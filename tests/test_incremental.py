@@ -0,0 +1,93 @@
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Document.apply_edit leaves the same tokens and AST, positions
+#   included, as lexing and parsing the edited source from scratch
+#----------------------------------------------------------------------
+import io
+import random
+
+import pytest
+
+import mypl_error as error
+import mypl_incremental as incremental
+import mypl_lexer as lexer
+from conftest import PROGRAMS, parse, shape
+
+INSERTS = ['x', ' ', '\n', ';', 'end', 'var y = 2;\n', '# c\n', '"', '1', '+ 2', 
+    'while a do\n', 'fun int g(a: int)\n return a;\nend\n', '']
+LINES = ['var y = 2;\n', '# c\n', '\n', 'fun int g(a: int)\n return a;\nend\n', 
+    'while a do\n set a = 1;\nend\n', '  ']
+
+def base_source():
+    sources = []
+    for path in PROGRAMS:
+        with open(path) as source_file:
+            sources.append(source_file.read())
+    return ''.join(sources)
+
+def from_scratch(source):
+    '''Returns the tokens and shape of source, or None where lexing or
+    parsing fails'''
+    try:
+        tokens = list(lexer.Lexer(io.StringIO(source), True).tokens())
+    except error.MyPLError:
+        return None, None
+    try:
+        tree = shape(parse(source))
+    except error.MyPLError:
+        tree = None
+    return [str(tok) for tok in tokens], tree
+
+def document_state(document):
+    tokens = None if document.tokens is None else [str(tok) for tok in document.tokens]
+    tree = None if document.stmt_list is None else shape(document.stmt_list)
+    return tokens, tree
+
+def random_edit(rng, source):
+    '''Returns an offset, a count of deleted characters and inserted text'''
+    if rng.random() < 0.6:
+        starts = [0] + [i + 1 for i, c in enumerate(source) if c == '\n']
+        return rng.choice(starts), 0, rng.choice(LINES)
+    offset = rng.randrange(len(source) + 1)
+    deleted = min(rng.choice([0, 0, 1, 2, 5]), len(source) - offset)
+    return offset, deleted, rng.choice(INSERTS)
+
+@pytest.mark.parametrize('seed', range(3))
+def test_edits_match_full_parse(seed):
+    rng = random.Random(seed)
+    for trial in range(40):
+        document = incremental.Document(base_source())
+        for step in range(rng.randint(1, 4)):
+            offset, deleted, inserted = random_edit(rng, document.source)
+            source = (document.source[:offset] + inserted + 
+                document.source[offset + deleted:])
+            expected = from_scratch(source)
+            try:
+                document.apply_edit(offset, deleted, inserted)
+            except error.MyPLError:
+                assert None in expected
+            assert document.source == source
+            assert document_state(document) == expected
+
+def test_reparses_only_the_edited_statement():
+    source = 'var a = 1;\nvar b = 2;\nvar c = 3;\n'
+    document = incremental.Document(source)
+    first = document.stmt_list.stmts[0]
+    document.apply_edit(source.index('2'), 1, '20 + 1')
+    assert document.reparsed_stmts == 1
+    assert document.stmt_list.stmts[0] is first
+    assert shape(document.stmt_list) == shape(parse(document.source))
+
+def test_error_then_repair():
+    document = incremental.Document('var a = 1;\n')
+    with pytest.raises(error.MyPLError):
+        document.apply_edit(4, 1, '')
+    assert document.stmt_list is None
+    document.apply_edit(4, 0, 'b')
+    assert shape(document.stmt_list) == shape(parse('var b = 1;\n'))
+
+def test_edit_outside_source():
+    document = incremental.Document('var a = 1;')
+    with pytest.raises(ValueError):
+        document.apply_edit(5, 10, '')
@@ -0,0 +1,99 @@
+#
+# Author: Caterina Valdovinos
+# Description:
+#   Every lexer engine gives the same tokens, positions and errors: the
+#   scanning Lexer, read whole or a character at a time, RegexLexer and
+#   PushLexer fed in chunks of any size
+#----------------------------------------------------------------------
+import io
+import random
+
+import pytest
+
+import mypl_error as error
+import mypl_lexer as lexer
+
+PIECES = ['a', 'b', 'x', '_', '1', '0', '9', '.', '=', '<', '>', '!', '+', '-', '*', 
+    '/', '%', ':', ';', ',', '(', ')', ' ', '\t', '\n', '#', '"', "'", '$', 'é', 
+    'and', 'while', 'plus', 'var', '0.0', '1.5', '12a', '0.', '==', '<=', '!=', '>=', 
+    'true', '"str"', "'s t'"]
+
+SOURCES = [
+    '',
+    'var x = 1;',
+    'var s: string = "a b" + \'c\'; # comment\nset x.y = 2.5 % 3;',
+    'if a <= b and not c != d then elif e >= f or g == h then else end',
+    'while x>=0 do set x=x-1; end',
+    'fun int f(a: int, b: float) return a * b / 2; end',
+    'var x = 01;',
+    'var x = 1.;',
+    'var x = 1.2.3;',
+    'var s = "unterminated\n";',
+    'var x = a =< b;',
+    'x $ y',
+    '!x',
+]
+
+def scan(text):
+    return lexer.Lexer(io.StringIO(text), True).tokens()
+
+def scan_unbuffered(text):
+    return lexer.Lexer(io.StringIO(text), False).tokens()
+
+def regex(text):
+    return lexer.RegexLexer(io.StringIO(text)).tokens()
+
+def push(size, encode=False):
+    def lex(text):
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        if encode:
+            chunks = [chunk.encode('utf-8') for chunk in chunks]
+        return lexer.lex_chunks(chunks)
+    return lex
+
+ENGINES = {
+    'scan_unbuffered': scan_unbuffered,
+    'regex': regex,
+    'push_1': push(1),
+    'push_3': push(3),
+    'push_64': push(64),
+    'push_bytes_2': push(2, True),
+}
+
+def lexed(engine, text):
+    '''Returns the tokens as tuples, ending with the error if there is one'''
+    result = []
+    try:
+        for tok in engine(text):
+            result.append((tok.tokentype, tok.lexeme, tok.line, tok.column))
+    except error.MyPLError as e:
+        result.append(('error', e.message, e.line, e.column))
+    return result
+
+def random_sources(count, seed=1):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(PIECES) for i in range(rng.randint(0, 40))) 
+        for j in range(count)]
+
+@pytest.mark.parametrize('name', sorted(ENGINES))
+@pytest.mark.parametrize('text', SOURCES)
+def test_same_tokens(name, text):
+    assert lexed(ENGINES[name], text) == lexed(scan, text)
+
+@pytest.mark.parametrize('name', sorted(ENGINES))
+def test_same_tokens_random(name):
+    for text in random_sources(500):
+        assert lexed(ENGINES[name], text) == lexed(scan, text), repr(text)
+
+@pytest.mark.parametrize('name', sorted(ENGINES))
+def test_same_tokens_programs(name, program):
+    with open(program) as source_file:
+        text = source_file.read()
+    assert lexed(ENGINES[name], text) == lexed(scan, text)
+
+def test_make_lexer_engines():
+    for name in lexer.ENGINES:
+        the_lexer = lexer.make_lexer(io.StringIO('var x = 1;'), name)
+        assert [tok.lexeme for tok in the_lexer.tokens()][:4] == ['var', 'x', '=', '1']
+    with pytest.raises(ValueError):
+        lexer.make_lexer(io.StringIO(''), 'nope')
@@ -0,0 +1,78 @@
+#
+# Author: Caterina Valdovinos
+# Description:
+#   The LL(1) parser builds the same ASTs as recursive descent, from a
+#   grammar table that agrees with the Parser docstrings
+#----------------------------------------------------------------------
+import os
+import subprocess
+import sys
+
+import pytest
+
+import mypl_error as error
+import mypl_ll1 as ll1
+from conftest import ROOT, parse, shape
+
+SOURCES = [
+    'var x = 1 + 2 * 3 - 4 / 5 % 6;',
+    'var s: string = "a" + \'b\';',
+    'set a.b.c = f(g(1), (2), h());',
+    'if not not a and (b or c) == d then x; elif (e) then y; else z; end',
+    'while ((a)) or b and not (c < d) do end',
+    'fun nil f() return; end fun Node g(a: int, b: Node) return new Node; end',
+    'struct S var a = 1.5; var b: bool = true; end',
+    '(((1 + 2) * 3)) - (4) + a.b.c - f(g(1), (2)) % 5;',
+]
+
+BAD_SOURCES = [
+    'var = 1;',
+    'if x then',
+    'set a. = 1;',
+    'while (a and do end',
+    'fun int f(a: int,) end',
+]
+
+@pytest.mark.skipif(sys.flags.optimize >= 2, reason='docstrings are stripped')
+def test_grammar_matches_docstrings():
+    assert ll1.GRAMMAR == ll1.docstring_rules()
+
+def test_ll1_without_docstrings(program):
+    command = [sys.executable, '-OO', os.path.join(ROOT, 'main.py'), '--parser', 'll1',
+        program]
+    table = subprocess.run(command, capture_output=True, text=True)
+    descent = subprocess.run(command[:3] + [program], capture_output=True, text=True)
+    assert table.returncode == descent.returncode == 0, table.stderr
+    assert table.stdout == descent.stdout
+
+def test_grammar_is_ll1():
+    grammar = ll1.grammar()
+    assert grammar.start in grammar.productions
+    assert set(grammar.rules) == {rule.split()[0].strip('<>') for rule in ll1.GRAMMAR}
+
+@pytest.mark.parametrize('precedence', [False, True])
+@pytest.mark.parametrize('source', SOURCES)
+def test_same_ast(source, precedence):
+    assert (shape(parse(source, 'll1', precedence)) == 
+        shape(parse(source, 'descent', precedence)))
+
+@pytest.mark.parametrize('precedence', [False, True])
+def test_same_ast_programs(program, precedence):
+    with open(program) as source_file:
+        source = source_file.read()
+    assert (shape(parse(source, 'll1', precedence)) == 
+        shape(parse(source, 'descent', precedence)))
+
+@pytest.mark.parametrize('source', BAD_SOURCES)
+def test_same_error(source):
+    with pytest.raises(error.MyPLError) as descent:
+        parse(source, 'descent')
+    with pytest.raises(error.MyPLError) as table:
+        parse(source, 'll1')
+    assert (table.value.line, table.value.column) == (descent.value.line, 
+        descent.value.column)
+
+def test_deep_nesting():
+    source = 'var x = ' + '(' * 5000 + '1' + ')' * 5000 + ';'
+    stmt_list = parse(source, 'll1')
+    assert len(shape(stmt_list)) > 5000
@@ -0,0 +1,112 @@
+#
+# Author: Caterina Valdovinos
+# Description:
+#   The optimizer passes fold constants, prune dead branches and share
+#   repeated subexpressions, on inputs of any size
+#----------------------------------------------------------------------
+import contextlib
+import io
+
+import pytest
+
+import mypl_ast as ast
+import mypl_closure_compiler
+import mypl_error as error
+import mypl_optimizer as optimizer
+import mypl_print_visitor as ast_printer
+import mypl_type_checker as type_checker
+from conftest import parse
+
+CASES = [
+    ('var x = 2 * 3 + 4; var y = x + 0; var z = 1 * y;', 
+        'var x = 14;\nvar y = x;\nvar z = y;\n'),
+    ('var s = "a" + "b";', 'var s = "ab";\n'),
+    ('var x = 1 / 0;', 'var x = (1 / 0);\n'),
+    ('if 1 > 2 then print("a"); elif true then print("b"); else print("c"); end '
+        'while false do end', 'print("b");\n'),
+    ('var a = 1; if a > 0 then print("a"); elif false then print("b"); end',
+        'var a = 1;\nif (a > 0) then \n    print("a");\nend\n'),
+    ('if true then var v = 1; end', 'if true then \n    var v = 1;\nend\n'),
+    ('var a = 1; var b = 2; var c = (a + b) * (a + b) * (a + b);',
+        'var a = 1;\nvar b = 2;\nvar cse1 = (a + b);\nvar c = (cse1 * (cse1 * cse1));\n'),
+    ('var cse1 = 1; var c = (cse1 + 2) * (cse1 + 2) * (cse1 + 2);',
+        'var cse1 = 1;\nvar cse2 = (cse1 + 2);\nvar c = (cse2 * (cse2 * cse2));\n'),
+]
+
+CALLS = 'fun int f(x: int) print("side "); return x; end '
+
+def optimized(text, precedence=False):
+    stmt_list = parse(text, precedence=precedence)
+    type_checker.check(stmt_list)
+    optimizer.optimize(stmt_list)
+    printer = ast_printer.PrintVisitor()
+    ast.walk(stmt_list, printer)
+    return printer.to_string()
+
+@pytest.mark.parametrize('text, expected', CASES)
+def test_passes(text, expected):
+    assert optimized(text) == expected
+
+def test_saved_counts():
+    stmt_list = parse('var x = 2 * 3; while false do print("a"); end')
+    type_checker.check(stmt_list)
+    saved = optimizer.optimize(stmt_list)
+    assert set(saved) == {cls.__name__ for cls in optimizer.PASSES}
+    assert saved['ConstantFolder'] > 0 and saved['BranchPruner'] > 0
+
+def test_unchecked_identity_left_alone():
+    # without types x + 0 might be a string, so it is kept
+    stmt_list = parse('var y = x + 0;')
+    optimizer.optimize(stmt_list)
+    printer = ast_printer.PrintVisitor()
+    ast.walk(stmt_list, printer)
+    assert printer.to_string() == 'var y = (x + 0);\n'
+
+@pytest.mark.parametrize('precedence', [False, True])
+def test_long_chain_folds(precedence):
+    n = 20000
+    assert optimized('var x = ' + ' + '.join(['1'] * n) + ';', precedence) == (
+        'var x = %i;\n' % n)
+
+def test_deep_nesting_folds():
+    depth = 5000
+    stmt_list = parse('var x = ' + '1 + (' * depth + '1' + ')' * depth + ';', 'll1')
+    type_checker.check(stmt_list)
+    optimizer.optimize(stmt_list)
+    printer = ast_printer.PrintVisitor()
+    ast.walk(stmt_list, printer)
+    assert printer.to_string() == 'var x = %i;\n' % (depth + 1)
+
+def test_deep_nesting_of_blocks():
+    depth = 2000
+    text = 'if true then ' * depth + 'print("a");' + ' end' * depth
+    stmt_list = parse(text, 'll1')
+    type_checker.check(stmt_list)
+    optimizer.optimize(stmt_list)
+    assert optimizer.count_nodes(stmt_list) < 10
+
+def run(stmt_list):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        try:
+            mypl_closure_compiler.run(stmt_list)
+        except error.MyPLError as e:
+            print(e)
+    return out.getvalue()
+
+def test_unchecked_not_hoisted_ahead_of_call():
+    # s * s faults, and only after f(1) has printed
+    text = CALLS + 'var s = "a"; var y = f(1) + (s * s * s * s) + (s * s * s * s);'
+    expected = run(parse(text))
+    assert expected.startswith('side ')
+    stmt_list = parse(text)
+    optimizer.optimize(stmt_list)
+    printer = ast_printer.PrintVisitor()
+    ast.walk(stmt_list, printer)
+    assert 'cse' not in printer.to_string()
+    assert run(stmt_list) == expected
+
+def test_checked_numeric_hoisted_ahead_of_call():
+    assert optimized(CALLS + 'var a = 1; var y = f(1) + (a * a * a) + (a * a * a);').endswith(
+        'var cse1 = (a * (a * a));\nvar y = (f(1) + (cse1 + cse1));\n')
+    assert 'cse' not in optimized(CALLS + 'var a = 1; var y = f(1) + (a / a / a) + (a / a / a);')
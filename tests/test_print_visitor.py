@@ -0,0 +1,61 @@
+#
+# Author: Caterina Valdovinos
+# Description:
+#   PrintVisitor and PrintWalker print the sample programs byte for byte
+#   as the original recursive printer did; the .out files next to them
+#   are its output
+#----------------------------------------------------------------------
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+import mypl_ast as ast
+import mypl_print_visitor as ast_printer
+from conftest import ROOT, parse
+
+def expected(program):
+    with open(os.path.splitext(program)[0] + '.out') as out:
+        return out.read()
+
+def source(program):
+    with open(program) as source_file:
+        return source_file.read()
+
+PRINTERS = [ast_printer.PrintVisitor, ast_printer.PrintWalker]
+
+@pytest.mark.parametrize('printer_class', PRINTERS)
+@pytest.mark.parametrize('flush_threshold', [1, 7, ast_printer.FLUSH_THRESHOLD])
+def test_stream(program, printer_class, flush_threshold):
+    stream = io.StringIO()
+    printer = printer_class(stream, flush_threshold)
+    ast.walk(parse(source(program)), printer)
+    assert stream.getvalue() == expected(program)
+    assert printer.to_string() == ''
+
+@pytest.mark.parametrize('printer_class', PRINTERS)
+def test_to_string(program, printer_class):
+    printer = printer_class()
+    ast.walk(parse(source(program)), printer)
+    assert printer.to_string() == expected(program)
+
+def test_accept(program):
+    stream = io.StringIO()
+    parse(source(program)).accept(ast_printer.PrintVisitor(stream))
+    assert stream.getvalue() == expected(program)
+
+def test_main(program):
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'main.py'), program],
+        capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == expected(program)
+
+def test_deep_nesting():
+    # printed as the original printer prints 1 + (1 + (1 + (1)))
+    depth = 5000
+    text = 'var x = ' + '1 + (' * depth + '1' + ')' * depth + ';'
+    printer = ast_printer.PrintWalker()
+    ast.walk(parse(text, 'll1'), printer)
+    assert printer.to_string() == 'var x = ' + '(1 + ' * depth + '1' + ')' * depth + ';\n'
@@ -0,0 +1,88 @@
+#
+# Author: Caterina Valdovinos
+# Description:
+#   The recovering Parser builds the usual AST for a valid program, and
+#   for one with errors reports each of them and keeps the statements
+#   around them
+#----------------------------------------------------------------------
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+import mypl_ast as ast
+import mypl_error as error
+import mypl_lexer as lexer
+import mypl_parser as parser
+import mypl_print_visitor as ast_printer
+from conftest import ROOT, parse, shape
+
+BROKEN = ('var x = 1;\n'
+    'var = 2;\n'
+    'set y = 3;\n'
+    'while x do set z = ; end\n'
+    'var w = 4;\n')
+
+BROKEN_PRINTED = ('var x = 1;\n'
+    '# error: expecting \'ID\', found "=" in parser at line 2 column 5\n'
+    'set y = 3;\n'
+    'while x do\n'
+    '    # error: expecting an \'ID\', found ";" in parser at line 4 column 20\n'
+    'end\n'
+    'var w = 4;\n')
+
+def recovering(text, max_errors=parser.MAX_ERRORS):
+    the_parser = parser.Parser(lexer.Lexer(io.StringIO(text), True), recover=True,
+        max_errors=max_errors)
+    return the_parser, the_parser.parse()
+
+def test_valid_program(program):
+    with open(program) as source_file:
+        text = source_file.read()
+    the_parser, stmt_list = recovering(text)
+    assert the_parser.errors == []
+    assert shape(stmt_list) == shape(parse(text))
+
+def test_errors_and_statements_kept():
+    the_parser, stmt_list = recovering(BROKEN)
+    assert [(e.line, e.column) for e in the_parser.errors] == [(2, 5), (4, 20)]
+    with pytest.raises(error.MyPLError) as first:
+        parse(BROKEN)
+    assert str(the_parser.errors[0]) == str(first.value)
+    kinds = [type(stmt).__name__ for stmt in stmt_list.stmts]
+    assert kinds == ['VarDeclStmt', 'ErrorStmt', 'AssignStmt', 'WhileStmt', 'VarDeclStmt']
+    error_stmt = stmt_list.stmts[1]
+    assert error_stmt.error is the_parser.errors[0]
+    assert (error_stmt.first_token.line, error_stmt.first_token.column) == (2, 1)
+
+def test_printed():
+    the_parser, stmt_list = recovering(BROKEN)
+    printer = ast_printer.PrintVisitor()
+    ast.walk(stmt_list, printer)
+    assert printer.to_string() == BROKEN_PRINTED
+
+def test_lexer_errors_skipped():
+    the_parser, stmt_list = recovering('var x = 1 $ 2;\nvar y = 3;\n')
+    assert the_parser.errors
+    assert isinstance(stmt_list.stmts[-1], ast.VarDeclStmt)
+    assert stmt_list.stmts[-1].var_id.lexeme == 'y'
+
+def test_max_errors():
+    the_parser, stmt_list = recovering('var = 1;\n' * 10, max_errors=3)
+    assert [e.line for e in the_parser.errors] == [1, 2, 3, 3]
+    assert the_parser.errors[-1].message == 'too many errors, stopped parsing'
+
+def test_ll1_cannot_recover():
+    with pytest.raises(ValueError):
+        parser.make_parser(lexer.Lexer(io.StringIO(''), True), 'll1', recover=True)
+
+def test_main(tmp_path):
+    path = tmp_path / 'broken.mypl'
+    path.write_text(BROKEN)
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'main.py'), '--recover',
+        str(path)], capture_output=True, text=True)
+    assert result.returncode == 1
+    assert result.stdout == BROKEN_PRINTED
+    assert result.stderr.splitlines() == [str(e) for e in recovering(BROKEN)[0].errors]
@@ -0,0 +1,66 @@
+#
+# Author: Caterina Valdovinos
+# Description:
+#   The server answers the same whether a document is handled on the
+#   event loop, in its thread or in worker processes, for any depth
+#----------------------------------------------------------------------
+import asyncio
+import json
+
+import pytest
+
+import mypl_server as server
+from conftest import PROGRAMS
+
+def ask(the_server, *requests, decode=json.loads):
+    '''Returns the replies to requests, by id'''
+    async def go():
+        lines = [json.dumps(dict(request, id=i)) for i, request in enumerate(requests)]
+        return await asyncio.gather(*(the_server.handle(line) for line in lines))
+    return [decode(line) for line in asyncio.run(go())]
+
+def requests_for(text):
+    return [{'method': method, 'params': {'text': text}} for method in
+        ('tokens', 'ast', 'format', 'diagnostics')]
+
+@pytest.fixture(params=[(1, 10 ** 9), (1, 0), (2, 0)], ids=['loop', 'thread', 'pool'])
+def the_server(request):
+    jobs, offload_size = request.param
+    the_server = server.Server(jobs, offload_size=offload_size)
+    yield the_server
+    the_server.close()
+
+def test_same_replies(the_server, program):
+    with open(program) as source_file:
+        text = source_file.read()
+    reference = server.Server(1)
+    try:
+        assert ask(the_server, *requests_for(text)) == ask(reference, *requests_for(text))
+    finally:
+        reference.close()
+
+def test_deep_document(the_server):
+    # json.loads would recurse too deeply on the tree, so its text is checked
+    depth = 5000
+    text = 'var x = ' + '1 + (' * depth + '1' + ')' * depth + ';'
+    tokens, tree, printed, diagnostics = ask(the_server, *requests_for(text), 
+        decode=lambda line: line)
+    assert json.loads(printed)['result'] == ('var x = ' + '(1 + ' * depth + '1' + 
+        ')' * depth + ';\n')
+    assert json.loads(diagnostics)['result'] == []
+    assert tree.startswith('{"id": 1, "result": {"node": "StmtList", "stmts": [')
+    assert tree.count('"node": "ComplexExpr"') == depth
+    assert tree.count('{') == tree.count('}') and tree.endswith(']}}\n')
+
+def test_errors(the_server):
+    replies = ask(the_server, *requests_for('var x = 1;\nvar = 2;\nvar y = 1 + "a";'))
+    assert replies[1]['error']['line'] == 2
+    assert [e['line'] for e in replies[3]['result']] == [2]
+    type_error = ask(the_server, {'method': 'diagnostics', 'params': {'text': 
+        'var y = 1 + "a";'}})[0]
+    assert type_error['result'][0]['message'].startswith('invalid operand types')
+
+def test_bad_requests(the_server):
+    replies = ask(the_server, {'method': 'nope'}, {'method': 'format', 'params': {}})
+    assert replies[0]['error']['message'] == "unknown method 'nope'"
+    assert replies[1]['error']['message'] == 'missing text'
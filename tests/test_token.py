@@ -0,0 +1,41 @@
+#
+# Author: Caterina Valdovinos
+# Description:
+#   TokenBuffer looks ahead a bounded number of tokens and holds the EOS
+#   token once, however far past it is peeked
+#----------------------------------------------------------------------
+import io
+
+import pytest
+
+import mypl_lexer as lexer
+import mypl_token as token
+
+def buffer(text, size=4):
+    return token.TokenBuffer(lexer.Lexer(io.StringIO(text)).tokens(), size)
+
+def types(tokens):
+    return [tok.tokentype for tok in tokens]
+
+def test_peek_and_advance():
+    b = buffer('var x = 1;')
+    assert b.peek(2).lexeme == 'x'
+    assert b.peek(1).lexeme == 'var'
+    assert b.advance().lexeme == 'var'
+    assert b.peek(4).lexeme == ';'
+    assert [tok.lexeme for tok in b][:-1] == ['x', '=', '1', ';']
+
+def test_peek_past_eos():
+    b = buffer('x')
+    assert types([b.peek(k) for k in range(1, 5)]) == [token.ID] + [token.EOS] * 3
+    assert types(b) == [token.ID, token.EOS]
+    assert b.peek(4).tokentype == token.EOS
+    assert b.advance().tokentype == token.EOS
+    assert list(b) == []
+
+def test_peek_outside_size():
+    b = buffer('x', size=2)
+    with pytest.raises(IndexError):
+        b.peek(3)
+    with pytest.raises(IndexError):
+        b.peek(0)
@@ -0,0 +1,64 @@
+#
+# Author: Caterina Valdovinos
+# Description:
+#   The type checker accepts well-typed programs, annotates them, stops
+#   at the first type error, and handles inputs of any depth
+#----------------------------------------------------------------------
+import os
+
+import pytest
+
+import mypl_ast as ast
+import mypl_error as error
+import mypl_type_checker as type_checker
+from conftest import ROOT, parse
+
+ERRORS = [
+    ('var x = 1 + "a";', "invalid operand types int and string for '+'", 1, 11),
+    ('var x: int = 1.5;', 'expecting int, found float', 1, 5),
+    ('print(y);', "undefined variable 'y'", 1, 7),
+    ('fun int f(a: int) return a; end var x = f(1, 2);', 
+        "'f' takes 1 arguments, 2 given", 1, 41),
+    ('struct S var a = 1; end var s = new S; set s.b = 2;', "no field 'b' in S", 1, 46),
+]
+
+def check(text):
+    stmt_list = parse(text)
+    type_checker.check(stmt_list)
+    return stmt_list
+
+def test_runtime_program():
+    with open(os.path.join(ROOT, 'tests', 'programs', 'runtime.mypl')) as source_file:
+        stmt_list = check(source_file.read())
+    exprs = [node for node in ast.nodes(stmt_list) if isinstance(node, ast.Expr)]
+    assert exprs and all(expr.type is not None for expr in exprs)
+
+@pytest.mark.parametrize('text, message, line, column', ERRORS)
+def test_errors(text, message, line, column):
+    with pytest.raises(error.MyPLError) as e:
+        check(text)
+    assert (e.value.message, e.value.line, e.value.column) == (message, line, column)
+
+def test_scopes():
+    check('var x = 1; while x < 2 do var x = "a"; end set x = 2;')
+    with pytest.raises(error.MyPLError):
+        check('while true do var y = 1; end set y = 2;')
+
+def test_long_chains():
+    n = 20000
+    stmt_list = check('var x = ' + ' + '.join(['1'] * n) + ';\n'
+        'if ' + ' and '.join(['x > 0'] * n) + ' then end')
+    assert stmt_list.stmts[0].var_expr.type == 'int'
+    with pytest.raises(error.MyPLError) as e:
+        check('var x = ' + ' + '.join(['1'] * n) + ' + "a";')
+    assert e.value.message == "invalid operand types int and string for '+'"
+
+def test_deep_nesting():
+    depth = 5000
+    stmt_list = parse('var x = ' + '1 + (' * depth + '"a"' + ')' * depth + ';', 'll1')
+    with pytest.raises(error.MyPLError):
+        type_checker.check(stmt_list)
+    text = 'var x = ' + '(' * depth + '2.5' + ')' * depth + ';'
+    stmt_list = parse(text, 'll1')
+    type_checker.check(stmt_list)
+    assert stmt_list.stmts[0].var_expr.type == 'float'